@@ -0,0 +1,4 @@
+import sys
+from twtPyCurl.bench.runner import main
+
+sys.exit(main())
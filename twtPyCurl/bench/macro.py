@@ -0,0 +1,174 @@
+'''
+:module: macro
+
+macro benchmarks, stream and REST clients against local simulators (see :mod:`~.simulate` and
+:mod:`~.simulate_rest`) so results include curl, http, gzip and client's processing end to end.
+A simulator runs in a forked process so it doesn't compete with the client for the GIL (python 3.6+),
+see :mod:`~.bench.runner`
+'''
+import multiprocessing
+from twtPyCurl.bench.runner import benchmark, ErrorBench
+from twtPyCurl.bench.micro import CREDENTIALS
+from twtPyCurl.py.requests import Credentials
+from twtPyCurl.twt.clients import ClientTwtRest, ClientTwtStream
+from twtPyCurl.twt.simulate import Simulator, Corpus
+from twtPyCurl.twt.simulate_rest import SimulatorRest, Payloads
+
+STREAM_N = 50000                # messages per stream benchmark round
+REQUESTS_N = 200                # requests per REST benchmark round
+_CORPUS = {}                    # {simulator class: corpus} built once, shared by forked simulators
+
+
+class SimulatorProcess(object):
+    """runs a simulator in a forked process
+
+    :param simulator_class: :class:`~.Simulator` or a descendant
+    :param dict options: simulator's options
+    """
+    def __init__(self, simulator_class, options={}):
+        corpus = _CORPUS.get(simulator_class)
+        if corpus is None:
+            corpus = _CORPUS[simulator_class] = Payloads() if simulator_class is SimulatorRest else Corpus()
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        self.process = context.Process(
+            target=lambda: simulator_class(port=0, corpus=corpus, options=options).run(queue.put))
+        self.process.daemon = True
+        self.process.start()
+        self.port = queue.get(timeout=60)
+
+    @property
+    def url_api(self):
+        return 'http://127.0.0.1:{}/1.1/{{}}.json'.format(self.port)
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+
+
+class ClientStreamBench(ClientTwtStream):
+    """a stream client that treats simulator's streams as statuses streams and counts tweets"""
+    def _before_perform(self):
+        self._last_req.subdomain = 'stream'
+        super(ClientStreamBench, self)._before_perform()
+
+    def on_twitter_data(self, data):
+        pass
+
+
+def _stream(gzip, messages=1):
+    simulator = SimulatorProcess(Simulator)
+    client = ClientStreamBench(stats_every=0, allow_retries=False)
+    url = 'http://127.0.0.1:{}/1.1/statuses/sample.json'.format(simulator.port)
+    parms = {'max_n': STREAM_N, 'gzip': int(gzip), 'messages': messages}
+
+    def fun():
+        client.request(url, 'GET', parms)
+        if client.counters.t_data != STREAM_N:
+            raise ErrorBench("stream delivered {} of {} tweets".format(client.counters.t_data, STREAM_N))
+
+    def close():
+        client.handle_close()
+        simulator.close()
+    return fun, STREAM_N, close
+
+
+@benchmark('macro', 'tweets')
+def stream_sample():
+    """ClientTwtStream receiving a sample stream (a tweet per http chunk)"""
+    return _stream(False)
+
+
+@benchmark('macro', 'tweets')
+def stream_sample_gzip():
+    """ClientTwtStream receiving a gzip compressed sample stream (a tweet per http chunk)"""
+    return _stream(True)
+
+
+@benchmark('macro', 'tweets')
+def stream_sample_batched():
+    """ClientTwtStream receiving a sample stream of 50 tweets per http chunk (as a busy stream)"""
+    return _stream(False, 50)
+
+
+def _rest(options={}):
+    simulator = SimulatorProcess(SimulatorRest, dict({'rate_limits': False}, **options))
+    client = ClientTwtRest(Credentials(**CREDENTIALS), url_api=simulator.url_api, allow_retries=False)
+
+    def close():
+        client.handle_close()
+        simulator.close()
+    return client, close
+
+
+@benchmark('macro', 'requests')
+def rest_request():
+    """ClientTwtRest.request_ep users/show sequentially (signing, request, gzip, decoding)"""
+    client, close = _rest()
+
+    def fun():
+        for user_id in range(REQUESTS_N):
+            client.request_ep('users/show', parms={'user_id': user_id})
+    return fun, REQUESTS_N, close
+
+
+@benchmark('macro', 'requests')
+def rest_request_many():
+    """ClientTwtRest.request_many users/show 10 requests in flight"""
+    client, close = _rest()
+    requests = [('users/show', 'GET', {'user_id': user_id}) for user_id in range(REQUESTS_N)]
+
+    def fun():
+        for _, rt in client.request_many(requests, concurrency=10):
+            if isinstance(rt, Exception):
+                raise rt
+    return fun, REQUESTS_N, close
+
+
+@benchmark('macro', 'requests')
+def rest_request_many_latency():
+    """ClientTwtRest.request_many users/show 20 requests in flight with 20ms server latency"""
+    client, close = _rest({'latency': 20, 'latency_dist': 'fixed'})
+    requests = [('users/show', 'GET', {'user_id': user_id}) for user_id in range(REQUESTS_N)]
+
+    def fun():
+        for _, rt in client.request_many(requests, concurrency=20):
+            if isinstance(rt, Exception):
+                raise rt
+    return fun, REQUESTS_N, close
+
+
+@benchmark('macro', 'users')
+def rest_lookup_batched():
+    """ClientTwtRest.lookup users/lookup of 1000 ids coalesced in batched requests"""
+    client, close = _rest()
+
+    def fun():
+        futures = [client.lookup('users/lookup', str(user_id)) for user_id in range(1000)]
+        for future in futures:
+            future.result(60)
+    return fun, 1000, close
+
+
+@benchmark('macro', 'ids')
+def rest_pages_cursor():
+    """ClientTwtRest.iter_ep followers/ids, 20000 ids in cursored pages of 5000"""
+    client, close = _rest()
+
+    def fun():
+        ids_n = sum(1 for _ in client.iter_ep('followers/ids', {'screen_name': 'bench', 'count': 5000}))
+        if ids_n != 20000:
+            raise ErrorBench("got {} of 20000 ids".format(ids_n))
+    return fun, 20000, close
+
+
+@benchmark('macro', 'tweets')
+def rest_pages_max_id():
+    """ClientTwtRest.iter_ep statuses/user_timeline, 3200 tweets in max_id pages of 200"""
+    client, close = _rest()
+
+    def fun():
+        tweets_n = sum(1 for _ in client.iter_ep('statuses/user_timeline', {'screen_name': 'bench', 'count': 200}))
+        if tweets_n != 3200:
+            raise ErrorBench("got {} of 3200 tweets".format(tweets_n))
+    return fun, 3200, close
@@ -0,0 +1,172 @@
+'''
+:module: micro
+
+micro benchmarks of library's hot paths, measured in isolation (no network or credentials needed)
+on sample tweets (see :func:`~.tweets_sample`), runs on python 2 and 3 see :mod:`~.bench.runner`
+'''
+from twtPyCurl.bench.runner import benchmark
+from twtPyCurl.py.requests import Client, Credentials
+from twtPyCurl.py.utilities import DotDot
+from twtPyCurl.twt.clients import ClientTwtRest, ClientTwtStream
+from twtPyCurl.twt.endpoints import EndPointsRest
+from twtPyCurl.twt.ratelimits import endpoint_family
+from twtPyCurl.twt.replay import CHUNK_SIZE_MAX
+from twtPyCurl.twt.samples import tweets_sample_encoded
+
+FRAMES_N = 2000
+DELETES_EVERY = 20              # a delete notice every N frames (~5% as in a sample stream)
+FRMT_DELETE = '{{"delete":{{"status":{{"id":{0},"id_str":"{0}","user_id":{0},"user_id_str":"{0}"}}}}}}'
+CREDENTIALS = {                 # twitter's documentation example keys (signing only, never sent anywhere)
+    'id_appl': 'bench', 'id_user': 'bench', 'consumer_key': 'xvz1evFS4wEEPTGEFPHBog',
+    'consumer_secret': 'kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw',
+    'access_token_key': '370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb',
+    'access_token_secret': 'LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE'}
+URL_SEARCH = 'https://api.twitter.com/1.1/search/tweets.json'
+PARMS_SEARCH = {'q': 'USA OR France', 'count': 100, 'result_type': 'recent', 'include_entities': 'true'}
+_FRAMES = []
+
+
+def frames():
+    """:returns: a list of encoded tweets with delete notices between them (built once)"""
+    if not _FRAMES:
+        for cnt, frame in enumerate(tweets_sample_encoded(FRAMES_N)):
+            if cnt % DELETES_EVERY == 0:
+                _FRAMES.append(FRMT_DELETE.format(cnt).encode('ascii'))
+            _FRAMES.append(frame)
+    return _FRAMES
+
+
+def chunks(data, size=CHUNK_SIZE_MAX):
+    """:returns: data cut in chunks of size as curl's write call back gets it from a busy stream"""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def length_prefixed(frame):
+    """:returns: frame preceded by its length as in twitter's delimited=length streams"""
+    return str(len(frame) + 2).encode('ascii') + b'\r\n' + frame + b'\r\n'
+
+
+def client_stream(**kwargs):
+    """:returns: a stream client ready to receive data as if it was connected to a statuses stream"""
+    client = ClientTwtStream(stats_every=0, **kwargs)
+    client.request_abort_set(None)
+    client._last_req.subdomain = 'stream'
+    client.on_request_start()
+    return client
+
+
+def _framing(length_delimited):
+    data = [length_prefixed(i) for i in frames()] if length_delimited else [i + b'\r\n' for i in frames()]
+    data_chunks = chunks(b''.join(data))
+    client = client_stream(length_delimited=length_delimited, on_data_cb=lambda frame: None)
+    handle_on_write = client.handle_on_write
+
+    def fun():
+        client.framer.reset()
+        for chunk in data_chunks:
+            handle_on_write(chunk)
+    return fun, len(data), None
+
+
+@benchmark(unit='frames')
+def framing_delimited():
+    """ClientStream.handle_on_write of 16KB chunks of a \\r\\n delimited stream (framing only)"""
+    return _framing(False)
+
+
+@benchmark(unit='frames')
+def framing_length():
+    """ClientStream.handle_on_write of 16KB chunks of a delimited=length stream (framing only)"""
+    return _framing(True)
+
+
+@benchmark(unit='frames')
+def decode_stream():
+    """ClientTwtStream.on_data_default, classifies and decodes frames of a statuses stream"""
+    data = frames()
+    client = client_stream()
+    client.on_twitter_data = lambda doc: None
+    on_data = client.on_data
+
+    def fun():
+        for frame in data:
+            on_data(frame)
+    return fun, len(data), None
+
+
+@benchmark(unit='frames')
+def stream_end_to_end():
+    """ClientTwtStream.handle_on_write of 16KB chunks through framing to decoded tweets"""
+    data_chunks = chunks(b''.join([i + b'\r\n' for i in frames()]))
+    client = client_stream()
+    client.on_twitter_data = lambda doc: None
+    handle_on_write = client.handle_on_write
+
+    def fun():
+        client.framer.reset()
+        for chunk in data_chunks:
+            handle_on_write(chunk)
+    return fun, len(frames()), None
+
+
+def _oauth_header(native):
+    oauth = Credentials(**CREDENTIALS).OAuth
+    if not native:
+        oauth.signer = None
+
+    def fun():
+        for _ in range(100):
+            oauth.get_oath_header(URL_SEARCH, 'GET', PARMS_SEARCH)
+    return fun, 100, None
+
+
+@benchmark(unit='headers')
+def oauth_header_native():
+    """OAuth1.get_oath_header with the native HMAC-SHA1 signer"""
+    return _oauth_header(True)
+
+
+@benchmark(unit='headers')
+def oauth_header_oauthlib():
+    """OAuth1.get_oath_header with oauthlib's signer"""
+    return _oauth_header(False)
+
+
+@benchmark(unit='requests')
+def handle_set():
+    """Client.handle_set of a signed GET request (url encoding, headers and curl options)"""
+    client = Client(credentials=Credentials(**CREDENTIALS))
+    client._last_req.credentials = client.credentials
+
+    def fun():
+        for _ in range(100):
+            client.handle_set(URL_SEARCH, 'GET', PARMS_SEARCH)
+    return fun, 100, client.handle_close
+
+
+@benchmark(unit='accesses')
+def dotdot_access():
+    """DotDot attribute get, set and nested (dict to DotDot cast) access as counters and parsed JSON use it"""
+    counters = DotDot({'chunks': 0, 'data': 0, 't_data': 0, 'user': {'id': 1, 'screen_name': 'bench'}})
+
+    def fun():
+        for _ in range(100):
+            counters.chunks += 1
+            counters.data = counters.t_data
+            counters.user.id
+    return fun, 600, None
+
+
+@benchmark(unit='lookups')
+def endpoint_resolve():
+    """end point validation, dot notation, url and rate limit family of a REST end point"""
+    client = ClientTwtRest(None)
+    endpoints = EndPointsRest()
+    request_ep_url = client.request_ep_url
+
+    def fun():
+        for _ in range(25):
+            endpoints.get_value_validate(['users', 'show'])
+            str(client.api.users.show)
+            endpoint_family(request_ep_url('statuses/show/606974401493073920'))
+    return fun, 100, client.handle_close
@@ -0,0 +1,285 @@
+'''
+:module: runner
+
+runs benchmarks registered (see :func:`benchmark`) by :mod:`~.bench.micro` (hot paths of the library measured
+in isolation, no network) and :mod:`~.bench.macro` (stream and REST clients against local simulators, python 3),
+writes results as JSON together with environment metadata and compares a result against a stored baseline
+flagging regressions, so any performance work can be verified repeatably.
+
+Each benchmark is repeated (samples), a micro benchmark sample runs as many rounds as needed to last at least
+min_seconds, its result is the median (less noisy than the mean) time per operation. compare flags a change only
+if it exceeds both the threshold and the spread of samples ((max - min) / median) of either result.
+
+:Usage:
+    $ python -m twtPyCurl.bench run -o baseline.json
+    $ python -m twtPyCurl.bench run -o current.json -groups micro -filter framing
+    $ python -m twtPyCurl.bench compare baseline.json current.json -threshold 0.1  # exit status 1 on regressions
+    $ python -m twtPyCurl.bench list
+
+    >>> from twtPyCurl.bench.runner import run
+    >>> results = run(names=['oauth_header_native'])
+    >>> results['results']['oauth_header_native']['ops_per_sec']
+    98421.3
+'''
+import gc
+import sys
+import json
+import socket
+import platform
+import argparse
+import subprocess
+import multiprocessing
+from os import path
+from datetime import datetime
+from collections import OrderedDict
+from timeit import default_timer as timer
+from twtPyCurl import __version__, _IS_PY3
+from twtPyCurl.py.requests import pycurl
+from twtPyCurl.py.codec import CODEC, codecs_available
+from twtPyCurl.py.utilities import DotDot, format_header
+
+GROUPS = ('micro', 'macro')
+BENCHMARKS = OrderedDict()      # {name: DotDot} in registration order see :func:`benchmark`
+REPEAT = {'micro': 5, 'macro': 3}
+MIN_SECONDS = 0.2               # minimum duration of a micro benchmark sample
+THRESHOLD = 0.1                 # minimum relative change of median time compare reports as regression or improvement
+FORMAT_RUN = "|{name:28s}|{group:6s}|{ops_per_sec:14,.0f}|{unit:10s}|{usec_op:12.3f}|{spread_pct:10.1f}|"
+FORMAT_COMPARE = ("|{name:28s}|{baseline:14,.0f}|{current:14,.0f}|{change_pct:10.1f}|{threshold_pct:13.1f}|"
+                  "{verdict:12s}|")
+
+
+class ErrorBench(Exception):
+    """Exceptions base"""
+
+
+def benchmark(group='micro', unit='ops'):
+    """decorator that registers a benchmark, decorated function prepares it and returns a (fun, ops, close) tuple
+    fun runs a round of ops operations (unit) and close (a callable or None) releases resources after measuring,
+    function's name is benchmark's name and its docstring the description
+    """
+    if group not in GROUPS:
+        raise ErrorBench("group must be one of {}".format(", ".join(GROUPS)))
+
+    def register(setup):
+        BENCHMARKS[setup.__name__] = DotDot({'name': setup.__name__, 'group': group, 'unit': unit,
+                                             'setup': setup, 'doc': (setup.__doc__ or '').strip()})
+        return setup
+    return register
+
+
+def benchmarks_load():
+    """imports modules with benchmarks (macro benchmarks need python 3)
+
+    :returns: registered benchmarks
+    """
+    from twtPyCurl.bench import micro
+    if _IS_PY3:
+        from twtPyCurl.bench import macro
+    return BENCHMARKS
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2.0
+
+
+def _time(fun, loops):
+    t_start = timer()
+    for _ in range(loops):
+        fun()
+    return timer() - t_start
+
+
+def measure(fun, ops, repeat=5, min_seconds=MIN_SECONDS, loops=None, gc_off=True):
+    """times fun
+
+    :param fun: a callable that runs a round of ops operations
+    :param int repeat: number of samples
+    :param float min_seconds: if loops is None rounds per sample are doubled (calibration also warms up)
+        until a sample lasts that long
+    :param int loops: rounds per sample
+    :param bool gc_off: disable garbage collection while timing (as timeit does)
+    :returns: a dictionary of timings (seconds are per operation)
+    """
+    gc_was_on = gc.isenabled()
+    if gc_off:
+        gc.disable()
+    try:
+        if loops is None:
+            loops = 1
+            while _time(fun, loops) < min_seconds:
+                loops *= 2
+        samples = [_time(fun, loops) / (loops * ops) for _ in range(repeat)]
+    finally:
+        if gc_was_on:
+            gc.enable()
+    seconds_median = median(samples)
+    return {'ops': ops, 'loops': loops, 'repeat': repeat, 'seconds': samples,
+            'seconds_min': min(samples), 'seconds_median': seconds_median,
+            'spread': (max(samples) - min(samples)) / seconds_median if seconds_median else 0.0,
+            'ops_per_sec': 1.0 / seconds_median if seconds_median else 0.0}
+
+
+def git_commit():
+    """:returns: commit (with a + suffix if working tree has changes) of source tree or None"""
+    cwd = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=cwd, stderr=subprocess.STDOUT)
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '-uno'], cwd=cwd, stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.decode('ascii').strip() + ('+' if dirty.strip() else '')
+
+
+def environment():
+    """:returns: a dictionary describing where benchmarks run, results are comparable only on same environment"""
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'machine': platform.machine(), 'processor': platform.processor(),
+            'cpu_count': multiprocessing.cpu_count(), 'hostname': socket.gethostname(), 'pycurl': pycurl.version,
+            'codec': CODEC.name, 'codecs': codecs_available(), 'twtPyCurl': __version__, 'git_commit': git_commit(),
+            'date': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+
+def select(names=None, groups=GROUPS, filter_str=None):
+    """:returns: registered benchmarks in names (all if None) and groups whose name contains filter_str"""
+    benchmarks = benchmarks_load()
+    unknown = set(names or []) - set(benchmarks)
+    if unknown:
+        raise ErrorBench("unknown benchmark(s): {}".format(", ".join(sorted(unknown))))
+    return [bench for bench in benchmarks.values() if (names is None or bench.name in names) and
+            bench.group in groups and (filter_str is None or filter_str in bench.name)]
+
+
+def run(names=None, groups=GROUPS, filter_str=None, repeat=None, min_seconds=MIN_SECONDS, verbose=True):
+    """runs benchmarks see :func:`select`, a benchmark that fails is reported with its error and skipped
+
+    :param int repeat: samples per benchmark defaults to :data:`REPEAT` of its group
+    :param float min_seconds: minimum duration of a micro benchmark sample (macro ones run a round per sample)
+    :param bool verbose: print a row per benchmark
+    :returns: a dictionary {'environment': {}, 'options': {}, 'results': {name: timings}}
+    """
+    rt = {'environment': environment(),
+          'options': {'repeat': repeat, 'min_seconds': min_seconds, 'argv': sys.argv[1:]},
+          'results': OrderedDict()}
+    if verbose:
+        print (format_header(FORMAT_RUN))
+    for bench in select(names, groups, filter_str):
+        micro = bench.group == 'micro'
+        try:
+            fun, ops, close = bench.setup()
+            try:
+                timings = measure(fun, ops, repeat or REPEAT[bench.group], min_seconds,
+                                  loops=None if micro else 1, gc_off=micro)
+            finally:
+                if close is not None:
+                    close()
+        except Exception as err:
+            rt['results'][bench.name] = {'group': bench.group, 'unit': bench.unit, 'error': repr(err)}
+            if verbose:
+                print ("|{:28s}| error: {!r}".format(bench.name, err))
+            continue
+        timings.update({'group': bench.group, 'unit': bench.unit})
+        rt['results'][bench.name] = timings
+        if verbose:
+            print (FORMAT_RUN.format(name=bench.name, usec_op=timings['seconds_median'] * 1e6,
+                                     spread_pct=timings['spread'] * 100, **timings))
+    return rt
+
+
+def results_load(file_path):
+    with open(file_path, 'r') as fin:
+        return json.load(fin)
+
+
+def results_save(results, file_path):
+    with open(file_path, 'w') as fout:
+        json.dump(results, fout, indent=1, sort_keys=True)
+
+
+def compare(baseline, current, threshold=THRESHOLD):
+    """compares median time per operation of benchmarks in both results, a change is significant if it exceeds
+    both threshold and the spread of samples in either result (noisy benchmarks need a bigger change)
+
+    :param dict baseline: results of :func:`run` (or loaded by :func:`results_load`)
+    :param dict current: results to check
+    :param float threshold: minimum relative change (0.1 for 10%) regarded as significant
+    :returns: a list of dictionaries (name, baseline, current (ops per second), change (of ops per second),
+        threshold (applied to this benchmark), verdict one of 'ok' 'regression' 'improvement' 'new' 'missing'
+        or 'error')
+    """
+    rt = []
+    results_b, results_c = baseline['results'], current['results']
+    for name in list(results_b) + [i for i in results_c if i not in results_b]:
+        res_b, res_c = results_b.get(name, {}), results_c.get(name, {})
+        ops_b, ops_c = res_b.get('ops_per_sec', 0.0), res_c.get('ops_per_sec', 0.0)
+        change = ops_c / ops_b - 1 if ops_b and ops_c else 0.0
+        significant = max(threshold, res_b.get('spread', 0.0), res_c.get('spread', 0.0))
+        if 'error' in res_c:
+            verdict = 'error'
+        elif not res_c:
+            verdict = 'missing'
+        elif not ops_b:
+            verdict = 'new'
+        elif res_c['seconds_median'] > res_b['seconds_median'] * (1 + significant):
+            verdict = 'regression'
+        elif res_c['seconds_median'] < res_b['seconds_median'] / (1 + significant):
+            verdict = 'improvement'
+        else:
+            verdict = 'ok'
+        rt.append({'name': name, 'baseline': ops_b, 'current': ops_c, 'change': change, 'threshold': significant,
+                   'verdict': verdict})
+    return rt
+
+
+def environment_diff(baseline, current, keys=('python', 'implementation', 'machine', 'cpu_count', 'hostname',
+                                              'pycurl', 'codec')):
+    """:returns: {key: (baseline value, current value)} of environment keys that affect comparability"""
+    env_b, env_c = baseline['environment'], current['environment']
+    return dict((key, (env_b.get(key), env_c.get(key))) for key in keys if env_b.get(key) != env_c.get(key))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="twtPyCurl benchmarks")
+    commands = parser.add_subparsers(dest='command')
+    parser_run = commands.add_parser('run', help='run benchmarks')
+    parser_run.add_argument('names', nargs='*', help='benchmarks to run (defaults to all)')
+    parser_run.add_argument('-o', dest='output', default=None, help='JSON file to write results to')
+    parser_run.add_argument('-groups', default=','.join(GROUPS), help='comma separated groups')
+    parser_run.add_argument('-filter', default=None, help='run only benchmarks whose name contains it')
+    parser_run.add_argument('-repeat', default=None, type=int, help='samples per benchmark')
+    parser_run.add_argument('-min_seconds', default=MIN_SECONDS, type=float, help='minimum micro sample seconds')
+    parser_compare = commands.add_parser('compare', help='compare results against a baseline')
+    parser_compare.add_argument('baseline', help='baseline JSON file')
+    parser_compare.add_argument('current', help='current JSON file')
+    parser_compare.add_argument('-threshold', default=THRESHOLD, type=float, help='minimum significant relative change')
+    commands.add_parser('list', help='list benchmarks')
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.error("a command is required")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'list':
+        for bench in benchmarks_load().values():
+            print ("{:28s}{:7s}{}".format(bench.name, bench.group, bench.doc.split('\n')[0]))
+    elif args.command == 'run':
+        results = run(args.names or None, args.groups.split(','), args.filter, args.repeat, args.min_seconds)
+        if args.output:
+            results_save(results, args.output)
+        return 1 if any('error' in i for i in results['results'].values()) else 0
+    else:
+        baseline, current = results_load(args.baseline), results_load(args.current)
+        for key, (value_b, value_c) in sorted(environment_diff(baseline, current).items()):
+            print ("warning: environment {} differs baseline:{} current:{}".format(key, value_b, value_c))
+        rows = compare(baseline, current, args.threshold)
+        print (format_header(FORMAT_COMPARE))
+        for row in rows:
+            print (FORMAT_COMPARE.format(change_pct=row['change'] * 100, threshold_pct=row['threshold'] * 100, **row))
+        regressions = [row['name'] for row in rows if row['verdict'] in ('regression', 'error')]
+        if regressions:
+            print ("regressions: {}".format(", ".join(regressions)))
+        return 1 if regressions else 0
+    return 0
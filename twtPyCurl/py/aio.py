@@ -0,0 +1,176 @@
+'''
+:module: aio
+
+asyncio front end to clients (python 3.6+ only), transfers are driven by a `pycurl.CurlMulti
+<http://pycurl.io/docs/latest/curlmultiobject.html>`_ through its socket and timer callbacks
+registered with event loop's add_reader/add_writer/call_later so any number of requests run concurrently
+in event loop's thread without blocking it.
+Retries work as in blocking clients but backoff waits are awaited instead of slept.
+
+:Usage:
+    >>> from twtPyCurl.py.aio import ClientAio
+    >>> async def main():
+    ...     clients = [ClientAio() for i in range(10)]
+    ...     responses = await asyncio.gather(*[cl.request(url, 'GET') for cl in clients])
+    >>> asyncio.get_event_loop().run_until_complete(main())
+
+.. seealso:: :mod:`~.twt.aio` for twitter clients
+
+.. Warning:: a client runs a single request at a time, concurrent requests on same client are serialized
+'''
+import asyncio
+import logging
+from time import time
+from twtPyCurl.py.requests import pycurl, Client
+
+LOG = logging.getLogger(__name__)
+
+
+class CurlMultiAio(object):
+    """a CurlMulti driven by an asyncio event loop, usually there is one per loop see :func:`get`
+
+    :param loop: an event loop (defaults to current event loop)
+    """
+    _instances = {}     # {loop: instance}
+
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.multi = pycurl.CurlMulti()
+        self.multi.setopt(pycurl.M_SOCKETFUNCTION, self._on_socket)
+        self.multi.setopt(pycurl.M_TIMERFUNCTION, self._on_timer)
+        self._futures = {}      # {handle: future} transfers in progress
+        self._fds = {}          # {fd: what} registered file descriptors
+        self._timer = None
+
+    @classmethod
+    def get(cls, loop=None):
+        """:returns: the instance for loop, creates one if needed"""
+        loop = loop or asyncio.get_event_loop()
+        rt = cls._instances.get(loop)
+        if rt is None:
+            rt = cls._instances[loop] = cls(loop)
+        return rt
+
+    def __len__(self):
+        """:returns: number of transfers in progress"""
+        return len(self._futures)
+
+    def _on_socket(self, what, fd, multi, socketp):
+        """libcurl tells us which events to watch on a socket"""
+        what_old = self._fds.pop(fd, pycurl.POLL_NONE)
+        if what_old in (pycurl.POLL_IN, pycurl.POLL_INOUT):
+            self.loop.remove_reader(fd)
+        if what_old in (pycurl.POLL_OUT, pycurl.POLL_INOUT):
+            self.loop.remove_writer(fd)
+        if what == pycurl.POLL_REMOVE:
+            return
+        if what in (pycurl.POLL_IN, pycurl.POLL_INOUT):
+            self.loop.add_reader(fd, self._socket_action, fd, pycurl.CSELECT_IN)
+        if what in (pycurl.POLL_OUT, pycurl.POLL_INOUT):
+            self.loop.add_writer(fd, self._socket_action, fd, pycurl.CSELECT_OUT)
+        self._fds[fd] = what
+
+    def _on_timer(self, timeout_ms):
+        """libcurl asks for a (single) timeout, -1 deletes it"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if timeout_ms >= 0:
+            self._timer = self.loop.call_later(timeout_ms / 1000.0, self._socket_action, pycurl.SOCKET_TIMEOUT, 0)
+
+    def _socket_action(self, fd, ev_bitmask):
+        while True:
+            ret, num_handles = self.multi.socket_action(fd, ev_bitmask)
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+        self._info_read()
+
+    def _info_read(self):
+        while True:
+            num_q, ok_list, err_list = self.multi.info_read()
+            for handle in ok_list:
+                self._done(handle, None)
+            for handle, errno, errmsg in err_list:
+                self._done(handle, pycurl.error(errno, errmsg))
+            if num_q == 0:
+                break
+
+    def _done(self, handle, err):
+        self.multi.remove_handle(handle)
+        future = self._futures.pop(handle)
+        if not future.done():
+            future.set_result(err)
+
+    def perform(self, handle):
+        """starts a transfer
+
+        :param handle: a pycurl.Curl handle ready to be performed
+        :returns: a future with result None or a pycurl.error when transfer is over
+        """
+        future = self.loop.create_future()
+        self._futures[handle] = future
+        self.multi.add_handle(handle)       # libcurl will call _on_timer to kick things off
+        return future
+
+    def remove(self, handle):
+        """aborts a transfer in progress"""
+        future = self._futures.pop(handle, None)
+        if future is not None:
+            self.multi.remove_handle(handle)
+            if not future.done():
+                future.cancel()
+
+    def close(self):
+        for handle in list(self._futures):
+            self.remove(handle)
+        if self._timer is not None:
+            self._timer.cancel()
+        self.multi.close()
+        if self._instances.get(self.loop) is self:
+            del self._instances[self.loop]
+
+
+class AioMixin(object):
+    """makes :func:`request` of a :class:`~.Client` descendant a coroutine
+    mix it in before client class i.e. class ClientTwtRestAio(AioMixin, ClientTwtRest)
+
+    :param CurlMultiAio multi_aio: optional multi to use (defaults to the one of current event loop)
+    """
+    def __init__(self, *args, **kwargs):
+        self.multi_aio = kwargs.pop('multi_aio', None)
+        self._aio_lock = None
+        super(AioMixin, self).__init__(*args, **kwargs)
+
+    async def request(self, url, method, parms={}, multipart=False):
+        """coroutine counterpart of :func:`~.Client.request`"""
+        if self._aio_lock is None:
+            self._aio_lock = asyncio.Lock()
+        async with self._aio_lock:
+            return await self._request_aio(url, method, parms, multipart)
+
+    async def _request_aio(self, url, method, parms, multipart):
+        multi = self.multi_aio or CurlMultiAio.get()
+        self.backoff_defer = True
+        self.request_start(url, method, parms, multipart)
+        try:
+            if self.backoff_until > time():         # delayed start (i.e. rate limits)
+                await asyncio.sleep(self.backoff_until - time())
+            retry = True
+            while retry:
+                self.request_attempt()
+                try:
+                    err = await multi.perform(self.handle)
+                except asyncio.CancelledError:
+                    multi.remove(self.handle)
+                    raise
+                retry = self.request_attempt_end(err)
+                if retry and self.backoff_until > time():
+                    await asyncio.sleep(self.backoff_until - time())
+        finally:
+            self.backoff_defer = False
+            self.request_finish()
+        return self.response
+
+
+class ClientAio(AioMixin, Client):
+    """an asyncio :class:`~.Client`"""
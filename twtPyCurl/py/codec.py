@@ -0,0 +1,137 @@
+'''
+:module: codec
+
+a thin layer over available JSON libraries, the fastest available backend is selected at import time
+preference order: `orjson <https://github.com/ijl/orjson>`_ , `ujson <https://github.com/ultrajson/ultrajson>`_ ,
+`simplejson <https://simplejson.readthedocs.org/en/latest/>`_  (only if its C speedups are available),
+python's json
+
+:Usage:
+    >>> from twtPyCurl.py.codec import CODEC, codec_get
+    >>> CODEC                                       # default codec
+    <Codec:orjson>
+    >>> CODEC.loads(b'{"a": 1}')
+    {'a': 1}
+    >>> codec_get('json').dumps({'a': 1})           # a specific backend
+    '{"a":1}'
+
+.. seealso:: clients accept a codec argument see :class:`~.Client`
+'''
+from time import time
+import json
+
+BACKENDS = ('orjson', 'ujson', 'simplejson', 'json')      # in order of preference
+
+
+class ErrorCodec(Exception):
+    """Exceptions base"""
+
+
+def _backend(name):
+    """:returns: (loads, dumps) functions of backend, dumps always returns a str
+    :raises: ImportError if backend is not available
+    """
+    if name == 'orjson':
+        import orjson
+
+        def dumps(obj):
+            return orjson.dumps(obj).decode('utf-8')
+        return orjson.loads, dumps
+    elif name == 'ujson':
+        import ujson
+
+        def dumps(obj):
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+        return ujson.loads, dumps
+    elif name == 'simplejson':
+        import simplejson
+        from simplejson import _speedups  # noqa pure python simplejson is slower than json
+        return simplejson.loads, simplejson.JSONEncoder(separators=(',', ':')).encode
+    elif name == 'json':
+        return json.loads, json.JSONEncoder(separators=(',', ':')).encode
+    raise ImportError("unknown JSON backend {}".format(name))
+
+
+class Codec(object):
+    """a JSON encoder/decoder
+
+    :param str name: one of :data:`BACKENDS`
+    :raises: ImportError if backend is not available
+    """
+    __slots__ = ['name', 'loads', 'dumps', 'loads_buffer']
+
+    def __init__(self, name):
+        self.name = name
+        self.loads, self.dumps = _backend(name)
+        try:        # loads_buffer decodes a bytearray, without a copy if backend accepts it
+            self.loads(bytearray(b'1'))
+            self.loads_buffer = self.loads
+        except TypeError:
+            loads = self.loads
+            self.loads_buffer = lambda buf: loads(bytes(buf))
+
+    def __repr__(self):
+        return '<{:s}:{:s}>'.format(self.__class__.__name__, self.name)
+
+
+def codecs_available():
+    """:returns: a list of names of available backends in order of preference"""
+    rt = []
+    for name in BACKENDS:
+        try:
+            _backend(name)
+            rt.append(name)
+        except ImportError:
+            pass
+    return rt
+
+
+_CODECS = {}     # instances cache
+
+
+def codec_get(name_or_codec=None):
+    """
+    :param name_or_codec: a backend name, a :class:`Codec` instance or None for the default codec
+    :returns: a :class:`Codec` instance
+    :raises: ErrorCodec if backend is not available
+    """
+    if isinstance(name_or_codec, Codec):
+        return name_or_codec
+    if name_or_codec is None:
+        return CODEC
+    rt = _CODECS.get(name_or_codec)
+    if rt is None:
+        try:
+            rt = _CODECS[name_or_codec] = Codec(name_or_codec)
+        except ImportError as err:
+            raise ErrorCodec("JSON backend {} not available ({!s})".format(name_or_codec, err))
+    return rt
+
+
+def codec_benchmark(docs, backends=None, seconds=1.0):
+    """measures decode throughput of backends
+
+    :param list docs: a list of encoded JSON documents (i.e. tweets)
+    :param list backends: names of backends to measure defaults to all available
+    :param float seconds: (approximate) time to spend measuring each backend
+    :returns: a list of dictionaries one per backend {'name', 'docs_per_sec', 'mb_per_sec'} fastest first
+    """
+    rt = []
+    size = sum([len(i) for i in docs])
+    for name in backends or codecs_available():
+        loads = codec_get(name).loads
+        rounds = 0
+        dt_start = time()
+        while True:
+            for doc in docs:
+                loads(doc)
+            rounds += 1
+            elapsed = time() - dt_start
+            if elapsed >= seconds:
+                break
+        rt.append({'name': name, 'docs_per_sec': rounds * len(docs) / elapsed,
+                   'mb_per_sec': rounds * size / elapsed / 2 ** 20})
+    return sorted(rt, key=lambda x: x['docs_per_sec'], reverse=True)
+
+
+CODEC = codec_get(codecs_available()[0])   # default codec fastest available
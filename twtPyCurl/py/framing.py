@@ -0,0 +1,292 @@
+'''
+:module: framing
+
+incremental framers that split a stream of data chunks (as received by a pyCurl write call back)
+into complete messages (frames)
+
+a framer is fed with data chunks and returns a list of all frames completed by each chunk, only the
+unfinished tail of the stream is kept in its buffer between calls
+'''
+import re
+
+FRAME_MAX = 2 ** 22   # default maximum frame size (4MB) protects from not properly delimited streams
+
+
+class ErrorFrame(Exception):
+    """Exceptions base"""
+
+
+class ErrorFrameOverflow(ErrorFrame):
+    """frame exceeds maximum frame size"""
+    def __init__(self, size, frame_max):
+        super(ErrorFrameOverflow, self).__init__(size, "frame size {:d} exceeds maximum {:d}".format(size, frame_max))
+
+
+class ErrorFrameMalformed(ErrorFrame):
+    """stream is not delimited as expected"""
+    def __init__(self, data):
+        super(ErrorFrameMalformed, self).__init__(data, "expected a frame length got: {!r}".format(data[:32]))
+
+
+class FramerDelimited(object):
+    """splits a stream into frames delimited by a separator i.e. "\\r\\n"
+
+    :param bytes separator: string used by server to separate frames
+    :param int frame_max: maximum frame size in bytes raises :class:`ErrorFrameOverflow` if exceeded
+
+    :Example:
+        >>> framer = FramerDelimited(b"\\r\\n")
+        >>> framer.feed(b'{"a":1}\\r\\n{"b":')
+        ['{"a":1}']
+        >>> framer.feed(b'2}\\r\\n\\r\\n{"c":3}\\r\\n')
+        ['{"b":2}', '{"c":3}']
+
+    .. Note:: empty frames (keep alive strings) are ignored
+    """
+    def __init__(self, separator=b"\r\n", frame_max=FRAME_MAX):
+        if not isinstance(separator, bytes):
+            separator = separator.encode('utf-8')
+        self.separator = separator
+        self.separator_len = len(separator)
+        self.frame_max = frame_max
+        self.reset()
+
+    def reset(self):
+        """discards any buffered data, call it before a new request"""
+        self.buffer = bytearray()
+        self._scan_from = 0     # where to resume searching for a separator in buffer
+
+    def feed(self, chunk):
+        """
+        :param bytes chunk: a chunk of data
+        :returns: a list of all frames completed by this chunk (can be empty)
+        :raises: :class:`ErrorFrameOverflow` if unfinished frame in buffer exceeds frame_max
+        """
+        # @Note:this piece of code is super critical for speed, since it runs for every chunk of data.
+        #       when buffer is empty (most common case) we slice frames directly out of the chunk
+        #       and only copy the unfinished tail (if any) to the buffer
+        buf = self.buffer
+        sep = self.separator
+        frames = []
+        start = 0
+        if buf:
+            buf += chunk
+            pos = buf.find(sep, self._scan_from)
+            if pos == -1:
+                self._scan_from = max(0, len(buf) - self.separator_len + 1)
+            else:
+                view = memoryview(buf)
+                while pos != -1:
+                    if pos != start:                # ignore keep alives
+                        frames.append(view[start:pos].tobytes())
+                    start = pos + self.separator_len
+                    pos = buf.find(sep, start)
+                del view                            # release buffer so we can resize it
+                del buf[:start]
+                self._scan_from = max(0, len(buf) - self.separator_len + 1)
+        else:
+            pos = chunk.find(sep)
+            while pos != -1:
+                if pos != start:
+                    frames.append(chunk[start:pos])
+                start = pos + self.separator_len
+                pos = chunk.find(sep, start)
+            if start < len(chunk):
+                buf += chunk[start:]
+                self._scan_from = max(0, len(buf) - self.separator_len + 1)
+        if len(buf) > self.frame_max:
+            raise ErrorFrameOverflow(len(buf), self.frame_max)
+        return frames
+
+    def __len__(self):
+        """:returns: number of bytes buffered (unfinished frame)"""
+        return len(self.buffer)
+
+
+class FramerLength(object):
+    """splits a stream where each frame is preceded by its length in bytes as produced by
+    twitter's stream API when requested with `delimited=length`
+    `see <https://dev.twitter.com/streaming/overview/processing>`_
+    frame's payload is sliced out of the buffer by its length, data are never searched for a separator
+    except the (short) length line
+
+    :param int frame_max: maximum frame size in bytes raises :class:`ErrorFrameOverflow` if exceeded
+
+    :Example:
+        >>> framer = FramerLength()
+        >>> framer.feed(b'9\\r\\n{"a":1}\\r\\n\\r\\n9\\r\\n{"b":')
+        ['{"a":1}']
+        >>> framer.feed(b'2}\\r\\n')
+        ['{"b":2}']
+
+    .. Note:: length includes payload's trailing "\\r\\n" which is stripped, empty lines (keep alives) are ignored
+    """
+    length_line_max = 16    # a length line can't be longer, else stream is not length delimited
+
+    def __init__(self, frame_max=FRAME_MAX):
+        self.frame_max = frame_max
+        self.reset()
+
+    def reset(self):
+        """discards any buffered data, call it before a new request"""
+        self.buffer = bytearray()
+        self._need = None       # payload length of current frame, None if we expect a length line
+
+    def feed(self, chunk):
+        """
+        :param bytes chunk: a chunk of data
+        :returns: a list of all frames completed by this chunk (can be empty)
+        :raises: :class:`ErrorFrameOverflow` if frame length exceeds frame_max
+            :class:`ErrorFrameMalformed` if stream is not length delimited
+        """
+        buf = self.buffer
+        if buf:
+            buf += chunk
+            if self._need is not None and len(buf) < self._need:
+                return []               # still collecting current frame's payload
+            data = buf
+            view = memoryview(buf)
+        else:
+            data = chunk
+            view = None
+        frames = []
+        pos = 0
+        end = len(data)
+        need = self._need
+        while True:
+            if need is None:
+                nl = data.find(b"\n", pos, pos + self.length_line_max)
+                if nl == -1:
+                    if end - pos >= self.length_line_max:
+                        raise ErrorFrameMalformed(bytes(data[pos:pos + self.length_line_max]))
+                    break
+                line = data[pos:nl].strip()
+                pos = nl + 1
+                if not line:
+                    continue            # keep alive
+                try:
+                    need = int(line)
+                except ValueError:
+                    raise ErrorFrameMalformed(bytes(line))
+                if need < 0:
+                    raise ErrorFrameMalformed(bytes(line))
+                if need > self.frame_max:
+                    raise ErrorFrameOverflow(need, self.frame_max)
+            if end - pos < need:
+                break
+            stop = pos + need
+            if data[stop - 2:stop] == b"\r\n":
+                stop -= 2
+            if stop > pos:
+                frames.append(data[pos:stop] if view is None else view[pos:stop].tobytes())
+            pos += need
+            need = None
+        self._need = need
+        if view is None:
+            if pos < end:
+                buf += chunk[pos:]
+        else:
+            del view                    # release buffer so we can resize it
+            del buf[:pos]
+        return frames
+
+    def __len__(self):
+        """:returns: number of bytes buffered (unfinished frame)"""
+        return len(self.buffer)
+
+
+class FramerJSONArray(object):
+    """splits the items of a JSON array out of a (REST) response body as it arrives so items can be decoded
+    and processed while download goes on, the array can be the top level value or the value of a top level
+    object's key i.e. 'statuses' for search/tweets responses.
+    Data are only scanned for structural characters (strings are skipped by a regular expression)
+    so it is not a validating parser, a malformed body will yield malformed items
+
+    :param bytes key: key of array in top level object or None if body is an array
+    :param int frame_max: maximum item size in bytes raises :class:`ErrorFrameOverflow` if exceeded
+
+    :Example:
+        >>> framer = FramerJSONArray(b'statuses')
+        >>> framer.feed(b'{"statuses": [{"id": 1, "text": "a]"}, {"id"')
+        ['{"id": 1, "text": "a]"}']
+        >>> framer.feed(b': 2}], "search_metadata": {"count": 2}}')
+        ['{"id": 2}']
+    """
+    # a complete string, a structural character or the opening quote of a string that continues in next chunk
+    re_token = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{},]|"', re.S)
+
+    def __init__(self, key=None, frame_max=FRAME_MAX):
+        if key is not None and not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        self.key = key
+        self.frame_max = frame_max
+        self.reset()
+
+    def reset(self):
+        """discards any buffered data, call it before a new request"""
+        self.buffer = b''
+        self._pos = 0               # where to resume scanning buffer
+        self._depth = 0
+        self._array_depth = None    # depth of array's items, None before array is found, -1 after its end
+        self._start = 0             # start of current item in buffer
+        self._key_last = None       # last string seen in top level object
+
+    def feed(self, chunk):
+        """
+        :param bytes chunk: a chunk of data
+        :returns: a list of (raw JSON) items completed by this chunk (can be empty)
+        :raises: :class:`ErrorFrameOverflow` if unfinished item exceeds frame_max
+        """
+        if self._array_depth == -1:
+            return []
+        buf = self.buffer + chunk if self.buffer else chunk
+        pos, depth, array_depth, start = self._pos, self._depth, self._array_depth, self._start
+        frames = []
+        for m in self.re_token.finditer(buf, pos):
+            c = m.group()
+            i = m.start()
+            if c[0:1] == b'"':
+                if len(c) == 1:     # string continues in next chunk
+                    pos = i
+                    break
+                if depth == 1 and array_depth is None:
+                    self._key_last = c[1:-1]
+                pos = m.end()
+                continue
+            pos = i + 1
+            if c == b',':
+                if depth == array_depth:
+                    frames.append(buf[start:i].strip())
+                    start = pos
+            elif c == b'[' or c == b'{':
+                depth += 1
+                if array_depth is None and c == b'[' and \
+                        ((self.key is None and depth == 1) or (depth == 2 and self._key_last == self.key)):
+                    array_depth = depth
+                    start = pos
+            else:
+                if depth == array_depth:
+                    item = buf[start:i].strip()
+                    if item:
+                        frames.append(item)
+                    array_depth = -1
+                    buf = b''
+                    pos = start = 0
+                    break
+                depth -= 1
+        else:
+            pos = len(buf)
+        keep = start if array_depth is not None and array_depth > 0 else pos    # drop what we are done with
+        self.buffer = buf[keep:]
+        self._pos, self._depth, self._array_depth, self._start = pos - keep, depth, array_depth, start - keep
+        if len(self.buffer) > self.frame_max:
+            raise ErrorFrameOverflow(len(self.buffer), self.frame_max)
+        return frames
+
+    def done(self):
+        """:returns: True if array is over"""
+        return self._array_depth == -1
+
+    def __len__(self):
+        """:returns: number of bytes buffered (unfinished item)"""
+        return len(self.buffer)
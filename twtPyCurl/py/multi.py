@@ -0,0 +1,208 @@
+'''
+:module: multi
+
+drives requests of many clients concurrently from a single thread using a `pycurl.CurlMulti
+<http://pycurl.io/docs/latest/curlmultiobject.html>`_ , each client keeps its own handle, state,
+retries and callbacks as if it was performing the request itself (see :func:`~.Client.request`)
+
+:Usage:
+    >>> from twtPyCurl.py.multi import ClientMulti
+    >>> multi = ClientMulti()
+    >>> multi.add(client1, url1, 'GET')
+    >>> multi.add(client2, url2, 'POST', {'track': 'foo'})
+    >>> multi.run()            # returns when all requests are over (or from an other thread call multi.stop())
+
+.. Warning:: clients must not be shared between requests i.e one request per client at a time
+'''
+import logging
+import threading
+from time import time, sleep
+from collections import deque
+from twtPyCurl.py.requests import pycurl
+from twtPyCurl.py.utilities import DotDot
+
+LOG = logging.getLogger(__name__)
+
+
+class ErrorMulti(Exception):
+    """Exceptions base"""
+
+
+class ClientMulti(object):
+    """
+    :param float select_timeout: maximum seconds to block waiting for activity, also the maximum delay
+        before requests added or removed from other threads take effect
+    """
+    def __init__(self, select_timeout=1.0):
+        self.select_timeout = select_timeout
+        self.multi = pycurl.CurlMulti()
+        self._clients = {}           # {handle: client} clients with an attempt in progress
+        self._deferred = []          # clients waiting for their backoff to expire
+        self._commands = deque()     # add remove commands from any thread
+        self._lock = threading.Lock()
+        self.running = False
+        self.counters = DotDot({'attempts': 0, 'retries': 0, 'done': 0, 'errors': 0})
+
+    def __len__(self):
+        """:returns: number of requests in progress (including those waiting to retry)"""
+        return len(self._clients) + len(self._deferred)
+
+    def add(self, client, url, method, parms={}, multipart=False):
+        """adds a request, thread safe so can be called from any thread while loop is running
+        arguments as in :func:`~.Client.request`
+        """
+        with self._lock:
+            self._commands.append((self._add, (client, (url, method, parms, multipart))))
+
+    def remove(self, client):
+        """removes a client's request, thread safe"""
+        with self._lock:
+            self._commands.append((self._remove, (client,)))
+
+    def clients(self):
+        """:returns: a list of clients with requests in progress"""
+        return list(self._clients.values()) + [i[1] for i in self._deferred]
+
+    def _add(self, client, request):
+        if client in self.clients():
+            raise ErrorMulti("client {!r} already has a request in progress".format(client))
+        client.backoff_defer = True
+        client.request_start(*request)
+        if client.backoff_until > time():           # client wants to delay start (i.e. rate limits)
+            self._deferred.append((client.backoff_until, client))
+        else:
+            self._attempt(client)
+
+    def _remove(self, client):
+        for handle, cl in list(self._clients.items()):
+            if cl is client:
+                self.multi.remove_handle(handle)
+                del self._clients[handle]
+                break
+        else:
+            deferred = [i for i in self._deferred if i[1] is client]
+            if not deferred:
+                return False
+            self._deferred.remove(deferred[0])
+        self._finish(client, None)
+        return True
+
+    def _attempt(self, client):
+        self.counters.attempts += 1
+        client.request_attempt()
+        self._clients[client.handle] = client
+        self.multi.add_handle(client.handle)
+
+    def _attempt_end(self, handle, err=None):
+        self.multi.remove_handle(handle)
+        client = self._clients.pop(handle)
+        try:
+            retry = client.request_attempt_end(err)
+        except Exception as exc:
+            self.counters.errors += 1
+            return self._finish(client, exc)
+        if retry:
+            self.counters.retries += 1
+            if client.backoff_until > time():
+                self._deferred.append((client.backoff_until, client))
+            else:
+                self._attempt(client)
+        else:
+            self._finish(client, None)
+
+    def _finish(self, client, error):
+        self.counters.done += 1
+        client.backoff_defer = False
+        client.request_finish()
+        self.on_request_done(client, error)
+
+    def on_request_done(self, client, error=None):
+        """called when a client's request is over (after any retries) override in descendants as needed
+
+        :param client: the client
+        :param Exception error: None or the exception the request raised
+        """
+        if error is not None:
+            LOG.error("request failed {!r} {!r}".format(client, error))
+
+    def _commands_run(self):
+        with self._lock:
+            commands, self._commands = self._commands, deque()
+        for fun, args in commands:
+            try:
+                fun(*args)
+            except ErrorMulti:      # client is busy with an other request which goes on
+                LOG.exception("command {} failed".format(fun.__name__))
+            except Exception as exc:
+                LOG.exception("command {} failed".format(fun.__name__))
+                if fun == self._add:    # request_start or first attempt failed
+                    self._finish(args[0], exc)
+
+    def _deferred_run(self):
+        if self._deferred:
+            now = time()
+            due = [i for i in self._deferred if i[0] <= now]
+            if due:
+                self._deferred = [i for i in self._deferred if i[0] > now]
+                for _, client in due:
+                    self._attempt(client)
+
+    def _timeout(self):
+        """:returns: seconds to wait for activity"""
+        rt = self.select_timeout
+        if self._deferred:
+            rt = min(rt, min([i[0] for i in self._deferred]) - time())
+        curl_timeout = self.multi.timeout()                # milliseconds or -1 if libcurl has no timeout set
+        if curl_timeout >= 0:
+            rt = min(rt, curl_timeout / 1000.0)
+        return max(rt, 0)
+
+    def perform(self):
+        """a single iteration of event loop (runs pending commands, transfers data and processes finished attempts)
+
+        :returns: number of requests in progress
+        """
+        self._commands_run()
+        self._deferred_run()
+        if self._clients:
+            if self.multi.select(self._timeout()) == -1:    # no file descriptors to wait on
+                sleep(min(self._timeout(), 0.01))
+            while True:
+                ret, num_handles = self.multi.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+            while True:
+                num_q, ok_list, err_list = self.multi.info_read()
+                for handle in ok_list:
+                    self._attempt_end(handle)
+                for handle, errno, errmsg in err_list:
+                    self._attempt_end(handle, pycurl.error(errno, errmsg))
+                if num_q == 0:
+                    break
+        else:
+            sleep(self._timeout())
+        return len(self)
+
+    def run(self, until_empty=True):
+        """runs event loop
+
+        :param bool until_empty: return when there are no requests in progress else run until :func:`stop` is called
+        """
+        self.running = True
+        try:
+            while self.running:
+                if self.perform() == 0 and until_empty and not self._commands:
+                    break
+        finally:
+            self.running = False
+
+    def stop(self):
+        """stops event loop (thread safe), requests in progress remain attached to multi"""
+        self.running = False
+
+    def close(self):
+        """removes all requests and closes multi"""
+        self._commands_run()
+        for client in self.clients():
+            self._remove(client)
+        self.multi.close()
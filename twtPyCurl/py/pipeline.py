@@ -0,0 +1,453 @@
+'''
+:module: pipeline
+
+decouples receiving data from processing them, so a slow consumer doesn't stall the connection.
+curl thread only splits data to frames and puts them in a bounded queue, worker thread(s)
+get frames from the queue and process them (decode, dispatch etc.)
+
+:Usage:
+    >>> from twtPyCurl.py.pipeline import Pipeline
+    >>> pipeline = Pipeline(workers=2, maxsize=50000, policy='drop_oldest')
+    >>> client = ClientTwtStream(credentials, pipeline=pipeline)
+    >>> client.stream.statuses.sample()
+    >>> pipeline.metrics()
+    {'depth': 12, 'depth_max': 1020, 'puts': 1251000, 'gets': 1250988, 'dropped': 0, 'spilled': 0, ...}
+
+    >>> from twtPyCurl.py.pipeline import DecodePool, Projection
+    >>> pool = DecodePool(processes=6, project=Projection(('id', 'text', 'user'), marker='source'))
+    >>> client = ClientTwtStream(credentials, pipeline=pool)     # decoding in 6 processes
+
+.. Warning:: with more than one worker data handlers must be thread safe
+'''
+import struct
+import pickle
+import logging
+import threading
+import multiprocessing
+from os import getpid
+from time import time
+from collections import deque
+from tempfile import TemporaryFile
+from twtPyCurl import _IS_PY2
+from twtPyCurl.py.utilities import DotDot
+from twtPyCurl.py.codec import codec_get
+
+LOG = logging.getLogger(__name__)
+
+POLICIES = ('block', 'drop_oldest', 'drop_newest', 'spill')
+# what to do when queue is full:
+#   block: wait until there is room (effectively stalls the connection)
+#   drop_oldest/drop_newest: discard oldest frame in queue or frame to be put
+#   spill: store frames in a temporary file until there is room in queue
+
+
+class ErrorPipeline(Exception):
+    """Exceptions base"""
+
+
+class FrameQueue(object):
+    """a thread safe bounded FIFO queue of frames with an overflow policy
+
+    :param int maxsize: maximum number of frames in memory
+    :param str policy: one of :data:`POLICIES`
+    :param str spill_dir: directory for spill file (policy 'spill' only) defaults to system's temp directory
+    """
+    _spill_hdr = struct.Struct('<I')
+
+    def __init__(self, maxsize=10000, policy='block', spill_dir=None):
+        if policy not in POLICIES:
+            raise ErrorPipeline("policy must be one of {}".format(", ".join(POLICIES)))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self._frames = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._spill = None
+        self._spill_pos = [0, 0]     # read, write file positions
+        self._spill_cnt = 0          # frames in spill file
+        self.closed = False
+        self.counters = DotDot({'puts': 0, 'gets': 0, 'dropped': 0, 'spilled': 0, 'depth_max': 0,
+                                'blocked_seconds': 0.0})
+
+    def __len__(self):
+        """:returns: number of frames queued (including spilled)"""
+        return len(self._frames) + self._spill_cnt
+
+    def put_many(self, frames):
+        """puts frames in queue applying overflow policy if full
+
+        :raises: ErrorPipeline if queue is closed
+        """
+        with self._lock:
+            if self.closed:
+                raise ErrorPipeline("queue is closed")
+            queued = self._frames
+            for frame in frames:
+                if len(queued) >= self.maxsize or self._spill_cnt:
+                    if not self._put_full(frame):
+                        continue
+                else:
+                    queued.append(frame)
+                self.counters.puts += 1
+            depth = len(queued) + self._spill_cnt
+            if depth > self.counters.depth_max:
+                self.counters.depth_max = depth
+            self._not_empty.notify_all()
+
+    def put(self, frame):
+        self.put_many((frame,))
+
+    def _put_full(self, frame):
+        """applies overflow policy (called with lock held)
+        :returns: True if frame was queued
+        """
+        if self.policy == 'spill':
+            self._spill_write(frame)
+            return True
+        elif self.policy == 'drop_newest':
+            self.counters.dropped += 1
+            return False
+        elif self.policy == 'drop_oldest':
+            self._frames.popleft()
+            self._frames.append(frame)
+            self.counters.dropped += 1
+            return True
+        dt_start = time()
+        self.counters.depth_max = max(self.counters.depth_max, len(self._frames))
+        self._not_empty.notify_all()
+        while len(self._frames) >= self.maxsize and not self.closed:
+            self._not_full.wait(1)
+        self.counters.blocked_seconds += time() - dt_start
+        self._frames.append(frame)
+        return True
+
+    def _spill_write(self, frame):
+        if self._spill is None:
+            self._spill = TemporaryFile(dir=self.spill_dir)
+        self._spill.seek(self._spill_pos[1])
+        self._spill.write(self._spill_hdr.pack(len(frame)))
+        self._spill.write(frame)
+        self._spill_pos[1] = self._spill.tell()
+        self._spill_cnt += 1
+        self.counters.spilled += 1
+
+    def _spill_read(self, max_n):
+        """moves up to max_n frames from spill file to memory (called with lock held)"""
+        self._spill.seek(self._spill_pos[0])
+        for cnt in range(min(max_n, self._spill_cnt)):
+            size = self._spill_hdr.unpack(self._spill.read(self._spill_hdr.size))[0]
+            self._frames.append(self._spill.read(size))
+            self._spill_cnt -= 1
+        self._spill_pos[0] = self._spill.tell()
+        if self._spill_cnt == 0:
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._spill_pos = [0, 0]
+
+    def get_many(self, max_n=100, timeout=None):
+        """gets up to max_n frames waits if queue is empty
+
+        :param int max_n: maximum number of frames to get
+        :param float timeout: seconds to wait for frames None waits until a frame is available or queue is closed
+        :returns: a list of frames (empty if timeout expired or queue is closed and empty)
+        """
+        with self._lock:
+            queued = self._frames
+            if not queued and not self._spill_cnt and not self.closed:
+                self._not_empty.wait(timeout)
+            if not queued and self._spill_cnt:
+                self._spill_read(self.maxsize)
+            n = min(max_n, len(queued))
+            rt = [queued.popleft() for cnt in range(n)]
+            self.counters.gets += n
+            self._not_full.notify_all()
+            return rt
+
+    def close(self):
+        """no more frames will be put, waiting getters return what is left"""
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def metrics(self):
+        """:returns: a dictionary with current depth and counters"""
+        with self._lock:
+            rt = DotDot(self.counters)
+            rt.depth = len(self._frames) + self._spill_cnt
+            rt.depth_spilled = self._spill_cnt
+            return rt
+
+
+class Pipeline(object):
+    """worker threads that get frames from a :class:`FrameQueue` and pass them to a target function
+
+    :param int workers: number of worker threads
+    :param int maxsize: see :class:`FrameQueue`
+    :param str policy: see :class:`FrameQueue`
+    :param str spill_dir: see :class:`FrameQueue`
+    :param int batch: maximum number of frames passed to target on each call
+    """
+    decodes = False     # target gets raw frames
+
+    def __init__(self, workers=1, maxsize=10000, policy='block', spill_dir=None, batch=100):
+        self.workers_n = workers
+        self.queue_args = (maxsize, policy, spill_dir)
+        self.batch = batch
+        self.queue = None
+        self.target = None
+        self._workers = []
+        self.errors = 0
+
+    @property
+    def running(self):
+        return bool(self._workers)
+
+    def start(self, target):
+        """starts worker threads
+
+        :param function target: a function to be called with a list of frames
+        """
+        if self.running:
+            raise ErrorPipeline("pipeline is already running")
+        self.queue = FrameQueue(*self.queue_args)
+        self.target = target
+        for cnt in range(self.workers_n):
+            worker = threading.Thread(target=self._work, name="pipeline_{:d}".format(cnt))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        queue = self.queue
+        target = self.target
+        while True:
+            frames = queue.get_many(self.batch)
+            if frames:
+                try:
+                    target(frames)
+                except Exception:
+                    self.errors += 1
+                    LOG.exception("pipeline worker")
+            elif queue.closed and not len(queue):
+                return
+
+    def put_many(self, frames):
+        self.queue.put_many(frames)
+
+    def stop(self, timeout=None):
+        """stops workers after they have processed all queued frames
+
+        :param float timeout: seconds to wait for each worker
+        """
+        if self.queue is not None:
+            self.queue.close()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def metrics(self):
+        """:returns: a dictionary with queue depth and counters see :func:`FrameQueue.metrics`"""
+        rt = self.queue.metrics() if self.queue is not None else DotDot()
+        rt.errors = self.errors
+        rt.workers = len(self._workers)
+        return rt
+
+
+class Projection(object):
+    """a picklable projection of decoded documents to some of their fields
+
+    :param tuple fields: fields to keep
+    :param str marker: if specified only documents having this key are projected others are returned intact
+        (i.e. 'source' to project only statuses and leave twitter messages intact), marker is always kept
+    """
+    def __init__(self, fields, marker=None):
+        self.fields = tuple(fields) if marker is None or marker in fields else tuple(fields) + (marker,)
+        self.marker = marker
+
+    def __call__(self, doc):
+        if self.marker is not None and self.marker not in doc:
+            return doc
+        return dict([(k, doc[k]) for k in self.fields if k in doc])
+
+
+def _decode_batch(args):
+    """runs in a pool process, never raises so every batch reaches the dispatcher (python 2 pools have
+    no error call back), documents are returned pickled, a document that can't be pickled counts as an error
+
+    :returns: (sequence number, process id, frames count, seconds spent, errors count, pickled list of documents)
+    """
+    seq, frames, codec_name, project = args
+    dt_start = time()
+    loads = codec_get(codec_name).loads
+    docs = []
+    errors = 0
+    for frame in frames:
+        try:
+            doc = loads(frame)
+            docs.append(doc if project is None else project(doc))
+        except Exception:
+            errors += 1
+    try:
+        payload = pickle.dumps(docs, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        docs_ok = []
+        for doc in docs:
+            try:
+                pickle.dumps(doc, pickle.HIGHEST_PROTOCOL)
+                docs_ok.append(doc)
+            except Exception:
+                errors += 1
+        payload = pickle.dumps(docs_ok, pickle.HIGHEST_PROTOCOL)
+    return seq, getpid(), len(frames), time() - dt_start, errors, payload
+
+
+class DecodePool(object):
+    """decodes frames in a pool of processes (not limited by GIL) and delivers decoded documents
+    to target in the same order frames were put, can be used instead of a :class:`Pipeline`
+
+    :param int processes: number of processes defaults to number of cpus
+    :param int batch: number of frames sent to a process at once
+    :param float batch_seconds: also send a batch if it is older than that many seconds (checked when frames arrive)
+    :param str codec: name of JSON backend see :mod:`~.codec` defaults to fastest available
+    :param function project: a picklable function applied to each document in pool processes see :class:`Projection`
+        (raises ErrorPipeline if it can't be pickled), projected documents that can't be pickled are
+        counted as errors and left out, a batch that fails in the pool is delivered empty
+    :param int pending_max: maximum number of batches being decoded, put_many blocks when exceeded
+    """
+    decodes = True      # target gets decoded documents
+
+    def __init__(self, processes=None, batch=200, batch_seconds=0.5, codec=None, project=None, pending_max=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.batch = batch
+        self.batch_seconds = batch_seconds
+        self.codec_name = codec_get(codec).name
+        if project is not None:
+            try:
+                pickle.dumps(project)
+            except Exception as err:
+                raise ErrorPipeline("project must be picklable ({!r})".format(err))
+        self.project = project
+        self.pending_max = pending_max or self.processes * 4
+        self._pool = None
+        self._dispatcher = None
+        self._cond = threading.Condition(threading.Lock())
+        self.errors = 0
+
+    @property
+    def running(self):
+        return self._pool is not None
+
+    def start(self, target):
+        """starts pool processes and dispatcher thread
+
+        :param function target: a function to be called with a list of decoded documents (in original order)
+        """
+        if self.running:
+            raise ErrorPipeline("pool is already running")
+        self.target = target
+        self._frames = []
+        self._frames_started = 0
+        self._seq_put = 0           # sequence number of next batch to be sent to pool
+        self._seq_deliver = 0       # sequence number of next batch to be delivered to target
+        self._done = {}             # decoded batches waiting to be delivered by sequence number
+        self._stopping = False
+        self.counters = DotDot({'batches': 0, 'frames': 0, 'errors': 0, 'blocked_seconds': 0.0})
+        self.workers = {}           # per process counters
+        self._pool = multiprocessing.Pool(self.processes)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="decode_pool_dispatcher")
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+
+    def put_many(self, frames):
+        self._frames.extend(frames)
+        if not self._frames_started:
+            self._frames_started = time()
+        if len(self._frames) >= self.batch or time() - self._frames_started >= self.batch_seconds:
+            self._submit()
+
+    def _submit(self):
+        if not self._frames:
+            return
+        frames, self._frames = self._frames, []
+        self._frames_started = 0
+        with self._cond:
+            if self._seq_put - self._seq_deliver >= self.pending_max:
+                dt_start = time()
+                while self._seq_put - self._seq_deliver >= self.pending_max:
+                    self._cond.wait(1)
+                self.counters.blocked_seconds += time() - dt_start
+            seq = self._seq_put
+            self._seq_put += 1
+        kwargs = {} if _IS_PY2 else {'error_callback': lambda err: self._on_error(seq, len(frames), err)}
+        self._pool.apply_async(_decode_batch, ((seq, frames, self.codec_name, self.project),),
+                               callback=self._on_decoded, **kwargs)
+
+    def _on_decoded(self, result):
+        """runs in pool's result handler thread"""
+        with self._cond:
+            self._done[result[0]] = result
+            self._cond.notify_all()
+
+    def _on_error(self, seq, frames_n, err):
+        """runs in pool's result handler thread when a batch failed (python 3 only),
+        an empty result is delivered in its place so later batches are not held back, its frames count as errors
+        """
+        LOG.error("decode pool batch %d of %d frames failed: %r", seq, frames_n, err)
+        self._on_decoded((seq, None, frames_n, 0.0, frames_n, None))
+
+    def _dispatch(self):
+        """delivers decoded batches to target in sequence order"""
+        while True:
+            with self._cond:
+                while self._seq_deliver not in self._done:
+                    if self._stopping and self._seq_deliver == self._seq_put:
+                        return
+                    self._cond.wait(1)
+                seq, pid, frames_n, seconds, errors, payload = self._done.pop(self._seq_deliver)
+                self._seq_deliver += 1
+                self._cond.notify_all()
+            docs = [] if payload is None else pickle.loads(payload)
+            if pid is not None:
+                worker = self.workers.get(pid)
+                if worker is None:
+                    worker = self.workers[pid] = DotDot({'batches': 0, 'frames': 0, 'seconds': 0.0})
+                worker.batches += 1
+                worker.frames += frames_n
+                worker.seconds += seconds
+            self.counters.batches += 1
+            self.counters.frames += frames_n
+            self.counters.errors += errors
+            try:
+                self.target(docs)
+            except Exception:
+                self.errors += 1
+                LOG.exception("decode pool dispatcher")
+
+    def stop(self, timeout=None):
+        """sends any pending frames, waits until all are delivered and terminates pool
+
+        :param float timeout: seconds to wait for dispatcher
+        """
+        if not self.running:
+            return
+        self._submit()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._dispatcher.join(timeout)
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+    def metrics(self):
+        """:returns: a dictionary with counters, batches pending and per process frames per second"""
+        rt = DotDot(getattr(self, 'counters', {}))
+        rt.errors_target = self.errors
+        if self.running:
+            rt.pending = self._seq_put - self._seq_deliver
+        rt.workers = dict([(pid, DotDot(w, frames_per_sec=w.frames / w.seconds if w.seconds else 0))
+                           for pid, w in getattr(self, 'workers', {}).items()])
+        return rt
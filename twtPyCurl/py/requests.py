@@ -7,15 +7,22 @@ a lightweight small footprint interface to pyCurl provides the base for twtCurl
    requests those have only been tested for requests
    to twitter REST and streaming API
 '''
-import simplejson
 import pycurl
-import urllib
-import urlparse
 import logging
+import threading
+from time import time, sleep
+try:
+    from urllib import urlencode
+    from urlparse import urlparse
+except ImportError:  # python 3
+    from urllib.parse import urlencode, urlparse
 from datetime import datetime
 from twtPyCurl import __version__, path
 from twtPyCurl.py.utilities import (dict_encode, DotDot, seconds_to_DHMS, format_header)
 from twtPyCurl.py.oauth import OAuth1, OAuth2
+from twtPyCurl.py.codec import CODEC, codec_get
+from twtPyCurl.py.framing import FramerDelimited, FramerLength, ErrorFrame, FRAME_MAX
+from twtPyCurl.py.share import share_default
 
 LOG = logging.getLogger(__name__)
 # LOG.addHandler(logging.NullHandler())
@@ -100,7 +107,7 @@ class CredentialsProviderFile(CredentialsProvider):
             file_path = "{}/credentials.json".format(path.expanduser("~"))
         with open(file_path, "r") as fin:
             try:
-                crd_dict = simplejson.load(fin)
+                crd_dict = CODEC.loads(fin.read())
             except IOError:
                 raise
         return cls.validate(crd_dict)
@@ -163,8 +170,85 @@ class Credentials(object):
         return self.__repr__()
 
 
+class CredentialsPool(object):
+    """a pool of :class:`Credentials`, a client bound to a pool (given as its credentials) picks
+    for each request the credentials with most headroom (see :func:`Client.credentials_headroom`)
+    ties are resolved in round robin fashion, it is thread safe so can be shared by many clients
+
+    :param list credentials_lst: initial credentials
+    :param CredentialsProvider provider: used by :func:`fill` and notified of revoked credentials
+
+    :Usage:
+        >>> pool = CredentialsPool(provider=provider)
+        >>> pool.fill([(id_appl, id_user1), (id_appl, id_user2)])
+        >>> client = ClientTwtRest(pool, rate_limits=RateLimits())
+    """
+    def __init__(self, credentials_lst=[], provider=None):
+        self.provider = provider
+        self._credentials = []
+        self._next = 0              # round robin position
+        self._lock = threading.Lock()
+        self.revoked = []
+        for credentials in credentials_lst:
+            self.add(credentials)
+
+    def __len__(self):
+        return len(self._credentials)
+
+    def __repr__(self):
+        return '<{:s}:{:d}>'.format(self.__class__.__name__, len(self))
+
+    def add(self, credentials):
+        with self._lock:
+            self._credentials.append(credentials)
+
+    def fill(self, ids):
+        """adds credentials from provider
+
+        :param list ids: a list of (id_appl, id_user) tuples
+        """
+        for id_appl, id_user in ids:
+            self.add(Credentials(**self.provider.get_credentials(id_appl, id_user)))
+
+    def pick(self, url, headroom_fun=None):
+        """
+        :param str url: request's url
+        :param function headroom_fun: f(credentials, url) returns a number the higher the better
+        :returns: credentials to use for a request to url
+        :raises: ErrorRqCredentialsNotValid if pool is empty
+        """
+        with self._lock:
+            cnt = len(self._credentials)
+            if cnt == 0:
+                raise ErrorRqCredentialsNotValid("credentials pool is empty")
+            candidates = self._credentials[self._next:] + self._credentials[:self._next]
+            self._next = (self._next + 1) % cnt
+        if headroom_fun is None:
+            return candidates[0]
+        return max(candidates, key=lambda x: headroom_fun(x, url))   # max returns first of equals
+
+    def revoke(self, credentials):
+        """takes credentials out of rotation and notifies provider (if any)"""
+        with self._lock:
+            if credentials not in self._credentials:
+                return False
+            self._credentials.remove(credentials)
+            self._next = 0
+            self.revoked.append(credentials)
+        LOG.warning("credentials revoked {!s}".format(credentials))
+        if self.provider is not None:
+            try:
+                self.provider.on_revoke_credentials(credentials.id_appl, credentials.id_user)
+            except NotImplementedError:
+                pass
+        return True
+
+
 class Response(object):
-    ''''a lightweight HTTP response class handles only basic things since we want it to be fast'''
+    ''''a lightweight HTTP response class handles only basic things since we want it to be fast
+    body is collected in a bytearray (preallocated when Content-Length is known) so appending chunks is
+    linear, :func:`decode` hands it to the codec without copying where the backend allows it
+    '''
     def __init__(self):
         self.reset()
 
@@ -174,20 +258,74 @@ class Response(object):
         # caution status_provisional we will only get it if we:
         # a) hit a server and b) server sends proper headers
         self.headers_raw = []
-        self.data = ''
+        self._body = bytearray()
+        self._body_len = 0              # bytes written, body can be longer if preallocated
+        self._data = None               # data if set (i.e. decoded) else data is body's bytes
+        self._size_hint = None          # Content-Length of an unencoded body
         self.status_http = None         # status(int) from curl we get it only well after perform
         self.status_provisional = None  # status(int) we derive it early from first header line
         self._headers = None
         self.err_curl = None
+        self.cached = False             # True if data came from a cache (see :mod:`~.twt.cache`)
 
     def write_headers(self, headers_data):
+        if not isinstance(headers_data, str):   # python 3 curl gives bytes
+            headers_data = headers_data.decode('iso-8859-1')
         if self.headers_raw == []:      # first headers record
             try:
                 self.status_provisional = int(headers_data.split(" ")[1])
             except (ValueError, IndexError):
                 pass
+        if headers_data[:1] in 'cC':
+            header = headers_data.lower()
+            if header.startswith('content-length:'):
+                try:
+                    self._size_hint = int(header[15:])
+                except ValueError:
+                    pass
+            elif header.startswith('content-encoding:') and header[17:].strip() != 'identity':
+                self._size_hint = -1    # libcurl decodes it, we don't know size of decoded body
+        elif headers_data.startswith('HTTP/'):
+            self._size_hint = None      # a new headers block (i.e. after a redirect or 100 Continue)
         self.headers_raw.append(headers_data.strip())
 
+    def write(self, chunk):
+        """appends a chunk to body"""
+        pos = self._body_len
+        if pos == 0 and self._size_hint and self._size_hint > 0:
+            self._body = bytearray(self._size_hint)
+        self._body[pos:pos + len(chunk)] = chunk    # extends body if past its end
+        self._body_len = pos + len(chunk)
+
+    def _body_trim(self):
+        if len(self._body) != self._body_len:       # preallocated but got less (or a write was undone)
+            self._body = self._body[:self._body_len]
+        return self._body
+
+    @property
+    def body(self):
+        """:returns: a memoryview of body (zero copy)"""
+        return memoryview(self._body_trim())
+
+    @property
+    def data(self):
+        """data set (i.e. decoded by a client) or body as bytes"""
+        if self._data is None:
+            return bytes(self._body_trim())
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    def decode(self, codec):
+        """decodes body with codec (without copying it if codec's backend allows) and sets data
+
+        :returns: data
+        """
+        self._data = codec.loads_buffer(self._body_trim())
+        return self._data
+
     @property
     def headers(self):
         """sets (on demand and only once) and returns headers dictionary
@@ -211,7 +349,7 @@ class Client(object):
 
     :param tuple request: (url, method, parms) if specified request will be executed following instance creation
            see :func:`request`
-    :param Credentials credentials: an instance of :class:`Credentials`
+    :param Credentials credentials: an instance of :class:`Credentials` or a :class:`CredentialsPool`
     :param function on_data_cb: a call back with a single parameter to execute when data from request are ready,
            if missing or None instance's :func:`on_data_default` will be called instead
     :param str user_agent: a user agent string to use in request header (defaults to class name + 'v '+ __version)
@@ -219,6 +357,10 @@ class Client(object):
     :param bool allow_retries: if True allows instance to perform retries to recover from an error if possible (defaults to True)
     :param bool allow_redirects: if True allows automatic redirects (defaults to False)
     :param int verbose: set to 0 for silent mode 1 to turn curl verbose and progress on, 2 to turn curl debug mode on (defaults to 0)
+    :param codec: JSON codec used by descendants to decode data, a :class:`~.Codec` instance or a backend name
+           i.e. 'ujson' (defaults to fastest available see :mod:`~.codec`)
+    :param share: a :class:`~.ConnectionShare` to share DNS, SSL sessions and connections with other clients
+           or True for the process wide one (defaults to None no sharing see :mod:`~.share`)
 
 
     :example:
@@ -240,7 +382,9 @@ class Client(object):
         name=None,              # a name to distinguish the instance (defaults to str(id(instance))[-4:]
         allow_retries=True,     # allows instance to perform retries
         verbose=0,              # 0 for silent mode 1 to turn curl verbose on, 2 to turn curl debug mode on
-        allow_redirects=False   # if True allows automatic redirects
+        allow_redirects=False,  # if True allows automatic redirects
+        codec=None,             # JSON codec (defaults to fastest available)
+        share=None              # a ConnectionShare or True for process wide share
             ):
             self._curl_options = DotDot()
             self._vars = DotDot({'last_progress': None})
@@ -256,6 +400,10 @@ class Client(object):
             self.name = name
             self.allow_retries = allow_retries
             self._allow_redirects = allow_redirects
+            self.codec = codec_get(codec)
+            self.share = share_default() if share is True else share
+            self.backoff_defer = False  # see backoff method
+            self.backoff_until = 0
             if request:
                 self.request(request[0], request[1], request[2])
 
@@ -290,14 +438,30 @@ class Client(object):
 
     @credentials.setter
     def credentials(self, credentials):
-        '''a Credentials class instance'''
+        '''a Credentials or a CredentialsPool class instance'''
         self._credentials = credentials
 
+    def credentials_pick(self, url):
+        """:returns: credentials to be used for a request to url, picked from pool if credentials is a pool"""
+        if isinstance(self.credentials, CredentialsPool):
+            return self.credentials.pick(url, self.credentials_headroom)
+        return self.credentials
+
+    def credentials_headroom(self, credentials, url):
+        """override in descendants to tell how much capacity (i.e. rate limit) credentials have for url
+        used to pick credentials from a :class:`CredentialsPool`
+
+        :returns: a number the higher the better
+        """
+        return 0
+
     def _handle_init(self):  # @Todo any reason why we don't call it from __init__  ?
         """initializes pycurl handle, override for any special set up
         `for options details see <http://curl.haxx.se/libcurl/c/curl_easy_setopt.html>`_
         """
         self.handle = pycurl.Curl()
+        if self.share is not None:
+            self.share.attach(self.handle)
         if self._allow_redirects is True:
             self.handle.setopt(pycurl.FOLLOWLOCATION, True)
         self.handle.setopt(pycurl.USERAGENT, self.user_agent)
@@ -324,7 +488,7 @@ class Client(object):
         especially useful in a threading environment to notify main thread before raising
         it calls _on_exception and raises the exception only if it returns True
         """
-        LOG.exception("exception {:s}{:s}".format(err_class, args))
+        LOG.exception("exception {!s}{!s}".format(err_class, args))
         if self._on_exception(err_class, *args):
             raise err_class(*args)
 
@@ -345,15 +509,16 @@ class Client(object):
         if self.handle is None:
             self._handle_init()
         headers = [i for i in self.request_headers]  # @Note add copy of standard headers
-        if self.credentials is not None:
+        credentials = self._last_req.credentials
+        if credentials is not None:
                 # although not needed if authorization type is application
                 # set it any way, so credentials can be reseted on the fly
-                self._last_req.url_parsed = urlparse.urlparse(url)
+                self._last_req.url_parsed = urlparse(url)
                 self._last_req.subdomain = self._last_req.url_parsed.netloc.split('.')[0]
                 headers.append('Host: %s' % (self._last_req.url_parsed.netloc))
-                headers.append(self.credentials.get_oath_header(url, method, {} if multipart else request_parms))
+                headers.append(credentials.get_oath_header(url, method, {} if multipart else request_parms))
         if method == 'GET' or method == 'HEAD':
-            tmp = urllib.urlencode(request_parms)
+            tmp = urlencode(request_parms)
             tmp = "%s%s%s" % (url, "?" if tmp else '', tmp)
             self.handle.setopt(pycurl.URL, tmp)
             self.handle.setopt(pycurl.HTTPGET, 1)
@@ -364,7 +529,7 @@ class Client(object):
                 self.handle.setopt(pycurl.CUSTOMREQUEST, "POST")
                 # http://pycurl.cvs.sourceforge.net/pycurl/pycurl/tests/test_post2.py?view=markup
             else:
-                self.handle.setopt(pycurl.POSTFIELDS, urllib.urlencode(request_parms))
+                self.handle.setopt(pycurl.POSTFIELDS, urlencode(request_parms))
                 # no need to setopt(pycurl.POST, 1) POSTFIELDS sets it to POST anyway
                 # headers.append("Content-Transfer-Encoding: base64")   do we need it ?
         else:
@@ -467,9 +632,9 @@ class Client(object):
         `see libcurl error codes <http://curl.haxx.se/libcurl/c/libcurl-errors.html>`_
         return True to auto retry request, raise an exception or return False to abort
         """
-        if err[0] == pycurl.E_WRITE_ERROR and self._request_abort[0] is not None:  # 23
+        if err.args[0] == pycurl.E_WRITE_ERROR and self._request_abort[0] is not None:  # 23
             return False    # normal termination requested by us
-        raise ErrorRqCurl(err[0], err[1])
+        raise ErrorRqCurl(err.args[0], err.args[1])
 
     def on_request_error_http(self, err):
         """default error handling, for HTTP Errors override method for any special handling
@@ -492,36 +657,85 @@ class Client(object):
 
         :Raises:  proper HTTP or pyCurl errors
         """
-        parms = dict_encode(parms)
+        self.request_start(url, method, parms, multipart)
+        try:
+            retry = True
+            while retry:
+                self.request_attempt()
+                try:
+                    self.handle.perform()
+                except pycurl.error as err:
+                    retry = self.request_attempt_end(err)
+                else:
+                    retry = self.request_attempt_end()
+        finally:
+            self.request_finish()
+        return self.response
+
+    # request_start, request_attempt, request_attempt_end and request_finish are the steps of :func:`request`
+    # those are also used by non blocking drivers that perform the handle themselves (see :mod:`~.multi`)
+
+    def request_start(self, url, method, parms={}, multipart=False):
+        """prepares a new request (arguments as in :func:`request`)
+        descendants can delay request's start by calling :func:`backoff`
+        """
+        self._last_req.parms = (url, method, dict_encode(parms), multipart)
+        self._last_req.credentials = self.credentials_pick(url)
+        self.backoff_until = 0
         self.on_request_start()
         self._state.retries_curl = 0
         self._state.retries_http = 0
-        retry = True
-        while retry:
-            self._state.retries_curl += 1
-            self._state.retries_http += 1
-            retry = False
-            self.request_abort_set(None)
-            self.response.reset()
-            self.handle_set(url, method, parms, multipart)
-            # we must call handle_set it every time to get fresh credentials
-            # (Out-of-sync timestamp in case we retry after long time)
-            self._before_perform()
-            try:
-                self.handle.perform()
-            except pycurl.error as err:
+
+    def request_attempt(self):
+        """prepares handle for an attempt (first one or a retry) to perform current request"""
+        self._state.retries_curl += 1
+        self._state.retries_http += 1
+        self.request_abort_set(None)
+        self.response.reset()
+        self.handle_set(*self._last_req.parms)
+        # we must call handle_set it every time to get fresh credentials
+        # (Out-of-sync timestamp in case we retry after long time)
+        self._before_perform()
+
+    def request_attempt_end(self, err=None):
+        """called when handle has been performed
+
+        :param pycurl.error err: curl error if perform failed
+        :returns: True if request should be retried
+        :Raises:  proper HTTP or pyCurl errors
+        """
+        retry = False
+        try:
+            if err is not None:
                 self.response.err_curl = err
                 retry = self.on_request_error_curl(err) if self.allow_retries else False
                 # LOG.info("retry _SBOU =" + str(retry))
-            finally:
-                self.response.status_http = self.handle.getinfo(pycurl.HTTP_CODE)
-                if self.response.status_http > 299:
-                    if self.allow_retries:
-                        retry = self.on_request_error_http(self.response.status_http)
-                    else:
-                        retry = False
-                self.on_request_end()
-        return self.response
+        finally:
+            self.response.status_http = self.handle.getinfo(pycurl.HTTP_CODE)
+            if self.share is not None:
+                self.share.stats_update(self._last_req.parms[0], self.handle)
+            if self.response.status_http > 299:
+                if self.allow_retries:
+                    retry = self.on_request_error_http(self.response.status_http)
+                else:
+                    retry = False
+            self.on_request_end()
+        return retry
+
+    def request_finish(self):
+        """called once when current request is over (after any retries) override in descendants as needed"""
+        pass
+
+    def backoff(self, seconds):
+        """waits for seconds before a retry, if backoff_defer is True it only sets backoff_until
+        and the non blocking driver that performs the request delays the retry
+
+        :param float seconds: seconds to wait
+        """
+        if self.backoff_defer:
+            self.backoff_until = time() + seconds
+        else:
+            sleep(seconds)
 
     def _before_perform(self):
         pass
@@ -571,7 +785,7 @@ class Client(object):
 
     def handle_on_write(self, data):
         """this must return None or number of bytes received else connection terminates"""
-        self.response.data += data
+        self.response.write(data)
         self.on_data(data)
         return None
 
@@ -614,52 +828,180 @@ class ClientStream(Client):
     """
     :param str data_separator: string used by server to separate data
     :param int stats_every: report statistics every n data packets (specify 0 to suppress stats)
+    :param int frame_max: maximum size of a single data packet in bytes, request is aborted if exceeded
+           (protects from not properly delimited streams) see :class:`~.FramerDelimited`
+    :param bool length_delimited: if True server precedes each data packet with its length
+           (data_separator is ignored) see :class:`~.FramerLength` and :func:`framer_set`
+    :param function on_data_batch_cb: a call back with a single parameter (a list of data packets) used in batch mode,
+           if missing or None instance's :func:`on_data_batch_default` will be called instead
+    :param int batch_size: None (default) disables batch mode, 0 delivers all data packets received by a
+           single curl write call back, N delivers data packets in batches of at least N
+    :param float batch_seconds: in batch mode also deliver a batch if it is older than that many seconds
+           (checked when data arrive, 0 or None disables)
+    :param Pipeline pipeline: a :class:`~.Pipeline` instance, if specified data packets are put in pipeline's queue
+           and delivered by its worker thread(s) so processing doesn't block receiving data,
+           in batch mode each batch contains data packets gotten by a worker.
+           Can also be a :class:`~.DecodePool` that decodes data in a pool of processes and delivers
+           decoded documents to :func:`on_data_decoded_batch`
+    :param sink: an object with a put_many(frames) method (i.e. an :class:`~.ArchiveWriter`) all data packets
+           are passed to it (as received) before they are delivered
     :param dict kwargs: any other argument(s) as specified in :class:`Client`
     """
     format_stream_stats = "|{name:8s}|{DHMS:12s}|{chunks:15,d}|{data:14,d}|{avg_per_sec:12,.2f}|"
     format_stream_stats_header = format_header(format_stream_stats)
     # format strings for printing statistics
+    abort_frame_error = 1002    # request_abort code on a framing error (by convention > 1000 comes from our side)
 
     def __init__(self,
                  data_separator="\r\n",
                  stats_every=10000,  # output statistics every N data packets 0 or None disables
+                 frame_max=FRAME_MAX,
+                 length_delimited=False,
+                 on_data_batch_cb=None,
+                 batch_size=None,
+                 batch_seconds=None,
+                 pipeline=None,
+                 sink=None,
                  **kwargs):
         self.data_separator = data_separator
         self.data_separator_len = len(data_separator)
         self.stats_every = stats_every
         self.stream_started = False
+        self.frame_max = frame_max
+        self.framer = None
+        self.framer_set(length_delimited)
+        self.on_data_batch = on_data_batch_cb if on_data_batch_cb else self.on_data_batch_default
+        self.batch_size = 0 if batch_size is None and on_data_batch_cb else batch_size
+        self.batch_seconds = batch_seconds
+        self._batch = []
+        self._batch_started = 0
+        self.pipeline = pipeline
+        self.sink = sink
         self.counters = DotDot({'name': self.name[:4], 'chunks': 0,
                                 'DHMS': '', 'avg_per_sec': 0,
                                 'data': 0})
         super(ClientStream, self).__init__(**kwargs)
 
+    def framer_set(self, length_delimited=False):
+        """sets the framer used to split incoming data to data packets
+
+        :param bool length_delimited: True for a length delimited stream else a data_separator delimited one
+        """
+        framer_class = FramerLength if length_delimited else FramerDelimited
+        if not isinstance(self.framer, framer_class):
+            self.framer = FramerLength(self.frame_max) if length_delimited else \
+                FramerDelimited(self.data_separator, self.frame_max)
+        return self.framer
+
+    @property
+    def resp_buffer(self):
+        """
+        :returns: data received but not yet delivered (an unfinished data packet)
+        """
+        return bytes(self.framer.buffer)
+
     def handle_on_write(self, data_chunk):
         '''data call back receives chunks of data from server and
         this must return None or number of bytes received else connection terminates
         '''
-        # LOG.debug("counters.chunks= {:d} chunk [{:s}]".format(self.counters.chunks, data_chunk))
         # @Note:this piece of code is super critical for speed, since it is the main loop executed all the time
-        #       data comes in.
-        #       currently it uses string concatenation to amend data
-        #       tried it with a list buffer and join with very marginal efficiency improvements
-        #       when actual data/chunks ratio is close to 1.
-        #       Also cstringIO can't be used since it complicates things due to utf data handling
-        # @Note:descented classes can check len(self.resp_buffer) to protect
-        #       from buffer overruns (not properly delimited streams)
+        #       data comes in. Framer delivers all data packets contained in a chunk (server can batch those)
+        #       and keeps the unfinished tail, see :class:`~.FramerDelimited` and :class:`~.FramerLength`
         self.counters.chunks += 1
-        self.resp_buffer += data_chunk
-        if self.resp_buffer.endswith(self.data_separator):
-            self.resp_buffer = self.resp_buffer[:-self.data_separator_len]
-            if self.resp_buffer:           # @Note:ignore keep_alives strings ('')
-                self.counters.data += 1
-                self.on_data(self.resp_buffer)
-                self.resp_buffer = ''
-                if self.stats_every and self.counters.data % self.stats_every == 0:
-                    if self.stats_every == self.counters.data:
-                        print (self.format_stream_stats_header)
-                    self.print_stats()
+        try:
+            frames = self.framer.feed(data_chunk)
+        except ErrorFrame as err:
+            self.request_abort_set(self.abort_frame_error, err.args[1])
+            return self._request_abort[0]
+        if self.sink is not None and frames:
+            self.sink.put_many(frames)
+        if self.pipeline is not None:
+            if frames:
+                data_before = self.counters.data
+                self.counters.data += len(frames)
+                self.pipeline.put_many(frames)
+                self._stats_check(data_before)
+            return self._request_abort[0]
+        if self.batch_size is not None:
+            if frames:
+                self._batch_add(frames)
+            return self._request_abort[0]
+        for frame in frames:
+            self.counters.data += 1
+            self.on_data(frame)
+            if self.stats_every and self.counters.data % self.stats_every == 0:
+                if self.stats_every == self.counters.data:
+                    print (self.format_stream_stats_header)
+                self.print_stats()
         return self._request_abort[0]
 
+    def _batch_add(self, frames):
+        """batch mode, one call back and one statistics check per curl write call back instead of per data packet"""
+        data_before = self.counters.data
+        self.counters.data += len(frames)
+        if not self._batch:
+            self._batch_started = time() if self.batch_seconds else 0
+        self._batch.extend(frames)
+        if len(self._batch) >= self.batch_size or \
+                (self.batch_seconds and time() - self._batch_started >= self.batch_seconds):
+            self.batch_flush()
+        self._stats_check(data_before)
+
+    def _stats_check(self, data_before):
+        """prints statistics if counters.data crossed a stats_every boundary since data_before"""
+        if self.stats_every and data_before // self.stats_every != self.counters.data // self.stats_every:
+            if data_before < self.stats_every:
+                print (self.format_stream_stats_header)
+            self.print_stats()
+
+    def batch_flush(self):
+        """delivers any data packets pending in current batch"""
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self.on_data_batch(batch)
+
+    def _on_data_each(self, data_lst):
+        for data in data_lst:
+            self.on_data(data)
+
+    def request_start(self, url, method, parms={}, multipart=False):
+        """see :func:`Client.request_start`, if a pipeline is specified its workers run while request lasts"""
+        if self.pipeline is not None:
+            if self.pipeline.decodes:
+                self.pipeline.start(self.on_data_decoded_batch)
+            else:
+                self.pipeline.start(self.on_data_batch if self.batch_size is not None else self._on_data_each)
+        try:
+            super(ClientStream, self).request_start(url, method, parms, multipart)
+        except Exception:               # request never starts so request_finish won't be called to stop pipeline
+            if self.pipeline is not None:
+                self.pipeline.stop()
+            raise
+
+    def request_finish(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+
+    def on_data_decoded_batch(self, docs):
+        '''receives a list of decoded data (in order received) when pipeline decodes data see :class:`~.DecodePool`
+           descendants that can handle decoded data must implement it
+        '''
+        raise NotImplementedError
+
+    def on_data_batch_default(self, data_lst):
+        '''batch mode counterpart of :func:`on_data_default` receives a list of data packets
+           if you don't specify an on_data_batch_cb function on init, by default it calls on_data for each one
+        '''
+        for data in data_lst:
+            self.on_data(data)
+
+    def on_request_error_curl(self, err):
+        """a framing error is not a normal termination so we raise it"""
+        if err.args[0] == pycurl.E_WRITE_ERROR and self._request_abort[0] is not None:
+            if self._request_abort[1] == self.abort_frame_error:
+                raise ErrorRqCurl(err.args[0], self._request_abort[2])
+        return super(ClientStream, self).on_request_error_curl(err)
+
     def on_data_default(self, data):
         '''this is where actual data comes after data chunks cleansing,
            if you don't specify an on_data_cb function on init
@@ -672,14 +1014,15 @@ class ClientStream(Client):
 
     def on_request_start(self):
         self._reset_counters(self.counters)
-        self.resp_buffer = ''  # for streams we don't output to response object for efficiency
+        self.framer.reset()  # for streams we don't output to response object for efficiency
         self.dt_start = datetime.utcnow()
 
     def _before_perform(self):
-        self.resp_buffer = ''
+        self.batch_flush()  # complete data packets from a previous try
+        self.framer.reset()
 
     def on_request_end(self):
-        pass
+        self.batch_flush()
 
     def time_since_start(self):
         return datetime.utcnow() - self.dt_start
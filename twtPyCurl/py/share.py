@@ -0,0 +1,94 @@
+'''
+:module: share
+
+shares DNS cache, SSL session ids and connection cache between clients via a `pycurl.CurlShare
+<http://pycurl.io/docs/latest/curlshareobject.html>`_ so a new client (or a new handle) doesn't have to
+repeat DNS resolution, TCP and TLS handshakes, also keeps connection reuse statistics per host
+
+:Usage:
+    >>> client1 = ClientTwtRest(credentials, share=True)       # process wide share see :func:`share_default`
+    >>> client2 = ClientTwtRest(credentials, share=True)
+    >>> client1.share.stats()
+    {'api.twitter.com': {'requests': 120, 'connects': 2, 'reuse_ratio': 0.983}}
+
+.. Warning:: connection cache sharing requires libcurl 7.57+ (silently ignored by older versions)
+'''
+import threading
+import pycurl
+from twtPyCurl.py.utilities import DotDot
+try:
+    from urlparse import urlparse
+except ImportError:  # python 3
+    from urllib.parse import urlparse
+
+LOCK_DATA_CONNECT = getattr(pycurl, 'LOCK_DATA_CONNECT', None)    # missing in old pycurl versions
+
+
+class ConnectionShare(object):
+    """a CurlShare to attach to clients handles (see :class:`~.Client` share argument), it is thread safe
+
+    :param bool dns: share DNS cache
+    :param bool ssl_session: share SSL session ids
+    :param bool connections: share connection cache (if supported by pycurl)
+    """
+    def __init__(self, dns=True, ssl_session=True, connections=True):
+        self.share = pycurl.CurlShare()
+        self.shared = []
+        for name, data, enabled in (('dns', pycurl.LOCK_DATA_DNS, dns),
+                                    ('ssl_session', pycurl.LOCK_DATA_SSL_SESSION, ssl_session),
+                                    ('connections', LOCK_DATA_CONNECT, connections)):
+            if enabled and data is not None:
+                try:
+                    self.share.setopt(pycurl.SH_SHARE, data)
+                    self.shared.append(name)
+                except pycurl.error:        # not supported by libcurl
+                    pass
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def attach(self, handle):
+        """attaches a pycurl.Curl handle"""
+        handle.setopt(pycurl.SHARE, self.share)
+
+    def stats_update(self, url, handle):
+        """updates host's statistics after a transfer
+
+        :param str url: transfer's url
+        :param handle: transfer's pycurl.Curl handle
+        """
+        connects = handle.getinfo(pycurl.NUM_CONNECTS)     # new connections this transfer had to make
+        host = urlparse(url).netloc
+        with self._lock:
+            stats = self._stats.get(host)
+            if stats is None:
+                stats = self._stats[host] = DotDot({'requests': 0, 'connects': 0})
+            stats.requests += 1
+            stats.connects += connects
+
+    def stats(self):
+        """:returns: a dictionary {host: {'requests', 'connects', 'reuse_ratio'}}"""
+        with self._lock:
+            rt = {}
+            for host, stats in self._stats.items():
+                rt[host] = DotDot(stats)
+                rt[host].reuse_ratio = round(max(0, 1 - stats.connects / float(stats.requests)), 3)
+            return rt
+
+    def stats_reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def close(self):
+        self.share.close()
+
+
+_SHARE_DEFAULT = []
+_SHARE_DEFAULT_LOCK = threading.Lock()
+
+
+def share_default():
+    """:returns: the process wide :class:`ConnectionShare` (created on first call)"""
+    with _SHARE_DEFAULT_LOCK:
+        if not _SHARE_DEFAULT:
+            _SHARE_DEFAULT.append(ConnectionShare())
+        return _SHARE_DEFAULT[0]
@@ -141,7 +141,7 @@ class AdHocTree(object):
         rt = []
         curAttr = self
         while isinstance(curAttr.parent, AdHocTree):
-            print "attr", curAttr
+            print ("attr", curAttr)
             rt.append(curAttr.name)
             curAttr = curAttr.parent
         rt.reverse()
@@ -181,7 +181,7 @@ def dict_encode(in_dict):
             out_dict[k] = v
         return out_dict
     else:
-        raise NotImplementedError
+        return dict(in_dict)
 
 
 def dict_copy(a_dict, exclude_keys_lst=[], exclude_values_lst=[]):
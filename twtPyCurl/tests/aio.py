@@ -0,0 +1,190 @@
+'''
+tests for asyncio clients against the simulators (no network or credentials needed, python 3.6+ only)
+
+to run: python -m twtPyCurl.tests.aio -v
+'''
+import asyncio
+import unittest
+from time import time
+from twtPyCurl.py.requests import Credentials
+from twtPyCurl.py.aio import CurlMultiAio, ClientAio
+from twtPyCurl.twt.aio import ClientTwtRestAio, ClientTwtStreamAio
+from twtPyCurl.twt.clients import ErrorRqHttpTwt
+from twtPyCurl.twt.simulate import Simulator
+from twtPyCurl.twt.simulate_rest import SimulatorRest
+
+CREDENTIALS = {'id_appl': 'app', 'id_user': 'u1', 'consumer_key': 'ck', 'consumer_secret': 'cs',
+               'access_token_key': 'tok-1', 'access_token_secret': 'ts'}
+
+
+class ClientStreamAioSim(ClientTwtStreamAio):
+    """requests stream end points from the stream simulator and treats its streams as statuses streams"""
+    url_api = None
+
+    def request_ep_prepare(self, end_point, test_server=False, parms={}):
+        super(ClientStreamAioSim, self).request_ep_prepare(end_point, test_server, parms)
+        return self.url_api.format(end_point.split('/', 1)[1])
+
+    def _before_perform(self):
+        self._last_req.subdomain = 'stream'
+        super(ClientStreamAioSim, self)._before_perform()
+
+
+class AioTestCase(unittest.TestCase):
+    """runs each test's coroutine in a new event loop"""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        multi = CurlMultiAio._instances.get(self.loop)
+        if multi is not None:
+            multi.close()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def run_aio(self, coro, timeout=30):
+        return self.loop.run_until_complete(asyncio.wait_for(coro, timeout))
+
+
+class TestRestAio(AioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.simulator = SimulatorRest(port=0, options={'rate_limits': False, 'latency': 100,
+                                                       'latency_dist': 'fixed'}).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.simulator.stop()
+
+    def client(self, **kwargs):
+        client = ClientTwtRestAio(Credentials(**CREDENTIALS), url_api=self.simulator.url_api, **kwargs)
+        self.addCleanup(client.handle_close)
+        return client
+
+    def test_concurrent(self):
+        clients = [self.client() for _ in range(10)]
+
+        async def main():
+            return await asyncio.gather(*[client.request_ep('users/show', parms={'user_id': 1000 + n})
+                                          for n, client in enumerate(clients)])
+        t_start = time()
+        responses = self.run_aio(main())
+        self.assertTrue(time() - t_start < 0.9, time() - t_start)      # 10 requests of 100ms latency overlap
+        self.assertEqual([i.data['id'] for i in responses], [1000 + n for n in range(10)])
+        self.assertEqual(len(CurlMultiAio.get(self.loop)), 0)
+
+    def test_serialized(self):
+        client = self.client()
+
+        async def main():
+            return await asyncio.gather(*[client.request_ep('users/show', parms={'user_id': n}) for n in range(3)])
+        self.assertEqual(self.run_aio(main())[2].status_http, 200)
+
+    def test_client_aio(self):
+        client = ClientAio()
+        self.addCleanup(client.handle_close)
+        response = self.run_aio(client.request(self.simulator.url_api.format('help/configuration'), 'GET'))
+        self.assertEqual(response.status_http, 200)
+
+    def test_error(self):
+        client = self.client()
+        with self.assertRaises(ErrorRqHttpTwt):
+            self.run_aio(client.request_ep('users/show', parms={'user_id': 1, 'p_error': 1, 'error_status': 404}))
+        self.assertEqual(self.run_aio(client.request_ep('users/show', parms={'user_id': 1})).data['id'], 1)
+
+    def test_cancel(self):
+        client = self.client()
+
+        async def main():
+            task = asyncio.ensure_future(client.request_ep('users/show', parms={'user_id': 1}))
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        self.run_aio(main())
+        self.assertEqual(len(CurlMultiAio.get(self.loop)), 0)           # transfer was removed
+        self.assertEqual(self.run_aio(client.request_ep('users/show', parms={'user_id': 2})).data['id'], 2)
+
+    def test_lookups(self):
+        client = self.client()
+
+        async def main():
+            return await asyncio.gather(*[client.get_user(n) for n in range(1, 6)])
+        users = self.run_aio(main())
+        self.assertEqual([i['id'] for i in users], list(range(1, 6)))
+
+
+class TestStreamAio(AioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.simulator = Simulator(port=0).start()
+        cls.url_api = 'http://127.0.0.1:{}/1.1/{{}}.json'.format(cls.simulator.port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.simulator.stop()
+
+    def client(self, **kwargs):
+        client = ClientStreamAioSim(stats_every=0, **kwargs)
+        client.url_api = self.url_api
+        self.addCleanup(client.handle_close)
+        return client
+
+    def test_iter_ep(self):
+        client = self.client()
+
+        async def main():
+            return [tweet async for tweet in client.iter_ep('stream/statuses/sample', max_n=500)]
+        tweets = self.run_aio(main())
+        self.assertEqual(len(tweets), 500)
+        self.assertEqual(client.counters.t_data, 500)
+        self.assertTrue(all('text' in i for i in tweets))
+
+    def test_request_ep(self):
+        client = self.client()
+        tweets = []
+        client.on_twitter_data = tweets.append
+        self.run_aio(client.request_ep('stream/statuses/sample', 'GET', max_n=100, delimited='length'))
+        self.assertEqual(len(tweets), 100)
+
+    def test_paused(self):
+        client = self.client(queue_max=20)
+        client._handle_init()
+        client.curl_low_speed = (1, 1)
+        low_speed = []
+        attempts = []
+        request_attempt = client.request_attempt
+        client.request_attempt = lambda: (attempts.append(1), request_attempt())
+
+        async def main():
+            rt = []
+            async for tweet in client.iter_ep('stream/statuses/sample', max_n=2000, rate=20000):
+                if not rt:                      # a consumer slower than low speed time
+                    await asyncio.sleep(2.5)
+                    low_speed.append((client._paused, client.curl_low_speed))
+                rt.append(tweet)
+            return rt
+        tweets = self.run_aio(main())
+        self.assertEqual(low_speed, [(True, (1, 0))])
+        self.assertEqual(len(tweets), 2000)
+        self.assertEqual(len(attempts), 1)                              # connection was not timed out
+        self.assertEqual(client.curl_low_speed, (1, 1))
+
+    def test_early_break(self):
+        client = self.client(queue_max=10)
+
+        async def main():
+            async for tweet in client.iter_ep('stream/statuses/sample', rate=5000):
+                return tweet
+        self.assertIn('text', self.run_aio(main()))
+        self.run_aio(asyncio.sleep(0.05))                               # cancelled request cleans up
+        self.assertEqual(len(CurlMultiAio.get(self.loop)), 0)
+        self.assertEqual(client.curl_low_speed, (1, 60))
+
+
+if __name__ == "__main__":
+    unittest.main()
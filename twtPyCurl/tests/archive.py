@@ -0,0 +1,144 @@
+'''
+round trip tests of archive writer and reader (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.archive -v
+'''
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from time import time
+from twtPyCurl.twt.samples import snowflake_id, snowflake_timestamp_ms
+from twtPyCurl.twt.archive import (ArchiveWriter, ArchiveReader, ErrorArchive, frame_id, frame_kind,
+                                   KIND_TWEET, KIND_DELETE, KIND_OTHER)
+
+NOW_MS = int(time() * 1000)
+IDS = [snowflake_id(NOW_MS - 600000 + i * 1000, i) for i in range(100)]     # a tweet per second 10 minutes ago
+IDS_DELETED = IDS[10:30:5]
+
+
+def tweet(tweet_id):
+    return json.dumps({'created_at': 'Mon Mar 07 10:00:00 +0000 2016', 'id': tweet_id, 'id_str': str(tweet_id),
+                       'text': 'tweet {}'.format(tweet_id), 'source': 'web'}).encode('utf-8')
+
+
+def delete(tweet_id):
+    return json.dumps({'delete': {'status': {'id': tweet_id, 'id_str': str(tweet_id), 'user_id': 1,
+                                             'user_id_str': '1'}}}).encode('utf-8')
+
+
+FRAMES = [tweet(i) for i in IDS] + [delete(i) for i in IDS_DELETED] + [b'{"limit":{"track":12}}']
+
+
+class TestFrames(unittest.TestCase):
+
+    def test_kind(self):
+        tweet_id = IDS[0]
+        self.assertEqual(frame_kind(tweet(tweet_id), frame_id(tweet(tweet_id))), KIND_TWEET)
+        self.assertEqual(frame_kind(delete(tweet_id), frame_id(delete(tweet_id))), KIND_DELETE)
+        self.assertEqual(frame_id(delete(tweet_id)), tweet_id)
+        withheld = b'{"status_withheld":{"id":1234567,"user_id":1,"withheld_in_countries":["DE"]}}'
+        self.assertEqual(frame_kind(withheld, frame_id(withheld)), KIND_OTHER)
+        self.assertEqual(frame_kind(b'{"limit":{"track":12}}', 0), KIND_OTHER)
+
+
+class ArchiveRoundTrip(object):
+    compress = True
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # every block rotates segment so segments hold 20 frames at most, deletes land in the last one(s)
+        writer = ArchiveWriter(self.directory, compress=self.compress, segment_bytes=1, block_frames=20,
+                               block_seconds=0.1)
+        writer.put_many(FRAMES)
+        writer.close()
+        self.writer = writer
+        self.reader = ArchiveReader(self.directory)
+
+    def tearDown(self):
+        self.reader.close()
+        shutil.rmtree(self.directory)
+
+    def test_rotation(self):
+        self.assertTrue(len(self.reader.segments) >= 6)
+        self.assertEqual(len(self.reader.segments), self.writer.counters.segments)
+        self.assertEqual(len(self.reader), len(FRAMES))
+        self.assertEqual(self.writer.counters.frames, len(FRAMES))
+
+    def test_iter_time_order(self):
+        frames = [bytes(i) for i in self.reader]
+        self.assertEqual(sorted(frames), sorted(FRAMES))
+        ids = [frame_id(i) for i in frames if frame_id(i)]
+        self.assertEqual(ids, sorted(ids))              # deletes are merged by their tweet's time
+        self.assertEqual(frames[-1], FRAMES[-1])        # limit notice has receive time
+
+    def test_get(self):
+        self.assertEqual(self.reader.get(IDS[3], decode=True)['id'], IDS[3])
+        for tweet_id in IDS_DELETED:                    # not the delete notice archived in a later segment
+            self.assertEqual(bytes(self.reader.get(tweet_id)), tweet(tweet_id))
+        self.assertIsNone(self.reader.get(IDS[3] + 1))
+
+    def test_id_range(self):
+        docs = list(self.reader.id_range(IDS[10], IDS[30], decode=True))
+        self.assertEqual([i['id'] for i in docs], IDS[10:30])
+
+    def test_time_range(self):
+        seconds_from = snowflake_timestamp_ms(IDS[10]) / 1000.0
+        docs = list(self.reader.time_range(seconds_from, seconds_from + 20, decode=True))
+        self.assertEqual(len([i for i in docs if 'delete' in i]), len(IDS_DELETED))
+        self.assertEqual([i['id'] for i in docs if 'id' in i], IDS[10:30])
+
+    def test_index_complete(self):
+        self.assertEqual(self.writer.queue.policy, 'spill')
+        self.assertEqual([i for i in os.listdir(self.directory) if i.endswith('.tmp')], [])
+        path = self.reader.segments[0].path
+        shutil.copy(path, path + '-0')                  # a segment whose index is being written
+        shutil.copy(path + '.idx', path + '-0.idx.tmp')
+        self.reader.refresh()
+        self.assertEqual(len(self.reader), len(FRAMES))
+
+    def test_bad_index(self):
+        path = self.reader.segments[0].path + '.idx'
+        with open(path, 'r+b') as fout:
+            fout.write(b'TWTIDX00')
+        self.reader.close()
+        self.assertRaises(ErrorArchive, ArchiveReader, self.directory)
+        self.reader = ArchiveReader(self.directory + '/none')
+
+
+class TestArchiveCompressed(ArchiveRoundTrip, unittest.TestCase):
+    compress = True
+
+
+class TestArchiveRaw(ArchiveRoundTrip, unittest.TestCase):
+    compress = False
+
+
+class TestArchiveBlocks(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def read_all(self, blocks_cached):
+        reader = ArchiveReader(self.directory, blocks_cached=blocks_cached)
+        self.addCleanup(reader.close)
+        frames = [bytes(i) for i in reader.time_range(0, NOW_MS / 1000.0)]
+        return frames, reader.metrics().blocks_read
+
+    def test_blocks_cached(self):
+        # a segment of several blocks, delete notices in its last block are indexed among tweets of earlier ones
+        writer = ArchiveWriter(self.directory, block_frames=10)
+        writer.put_many([tweet(i) for i in IDS[:40]] + [delete(i) for i in IDS[:40:2]])
+        writer.close()
+        frames, blocks_read = self.read_all(8)
+        self.assertEqual(len(frames), 60)
+        self.assertEqual(blocks_read, writer.counters.blocks)       # each block decompressed once
+        frames_one, blocks_read = self.read_all(1)
+        self.assertEqual(frames_one, frames)
+        self.assertTrue(blocks_read > writer.counters.blocks * 2, blocks_read)
+
+
+if __name__ == "__main__":
+    unittest.main()
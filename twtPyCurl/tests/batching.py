@@ -0,0 +1,174 @@
+'''
+tests for lookup batching (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.batching -v
+'''
+import threading
+import unittest
+from twtPyCurl import _IS_PY2
+from twtPyCurl.py.requests import Credentials
+from twtPyCurl.twt.batching import LOOKUPS, LookupBatcher, LookupFuture, ErrorLookup, ErrorLookupTimeout
+from twtPyCurl.twt.clients import ClientTwtRest, ErrorRqHttpTwt
+
+ID_LONG = 1234567890123456789
+
+
+class ErrorFake(Exception):
+    pass
+
+
+class Response(object):
+    def __init__(self, data):
+        self.data = data
+
+
+class ClientFake(object):
+    """stands for a ClientTwtRest, responds to lookups with objects of ids asked except missing ones"""
+    def __init__(self, missing=(), failing=()):
+        self.missing = set(str(i) for i in missing)
+        self.failing = set(str(i) for i in failing)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def request_many(self, requests, concurrency, clients=None):
+        for index, (end_point, method, parms) in enumerate(requests):
+            with self._lock:
+                self.requests.append((end_point, method, parms))
+            ids = parms[LOOKUPS[end_point][0]].split(',')
+            if self.failing.intersection(ids):
+                yield index, ErrorFake("request failed")
+            else:
+                yield index, Response([{'id_str': i} for i in ids if i not in self.missing])
+
+
+class TestLookupFuture(unittest.TestCase):
+
+    def test_result(self):
+        future = LookupFuture()
+        self.assertRaises(ErrorLookupTimeout, future.result, 0.01)
+        called = []
+        future.add_done_callback(called.append)
+        future.set_result({'id_str': '1'})
+        future.add_done_callback(called.append)
+        self.assertEqual(future.result(), {'id_str': '1'})
+        self.assertEqual(called, [future, future])
+
+    def test_exception(self):
+        future = LookupFuture()
+        future.set_exception(ErrorFake())
+        self.assertRaises(ErrorFake, future.result)
+        self.assertIsInstance(future.exception(), ErrorFake)
+
+
+class TestLookupBatcher(unittest.TestCase):
+
+    def batcher(self, client, end_point='users/lookup', **kwargs):
+        batcher = LookupBatcher(client, end_point, **kwargs)
+        self.addCleanup(batcher.close)
+        return batcher
+
+    def test_dedup(self):
+        client = ClientFake()
+        batcher = self.batcher(client, window=0.1)
+        futures = [batcher.get(i) for i in (1, '1', 2, 1)]
+        self.assertIs(futures[0], futures[1])
+        self.assertEqual([i.result(5) for i in futures], [{'id_str': i} for i in ('1', '1', '2', '1')])
+        self.assertEqual((batcher.counters.lookups, batcher.counters.deduplicated), (4, 2))
+        self.assertEqual(client.requests, [('users/lookup', 'GET', {'user_id': '1,2'})])
+
+    def test_fan_out(self):
+        client = ClientFake(missing=[7, 149])
+        batcher = self.batcher(client, parms={'include_entities': 'false'})
+        futures = dict((i, batcher.get(i)) for i in range(250))
+        results = dict((i, future.result(5)) for i, future in futures.items())
+        self.assertEqual((results[7], results[149]), (None, None))
+        self.assertEqual(results[200], {'id_str': '200'})
+        self.assertEqual(len([i for i in results.values() if i is not None]), 248)
+        self.assertTrue(all(len(i[2]['user_id'].split(',')) <= 100 for i in client.requests))
+        self.assertTrue(all(i[2]['include_entities'] == 'false' for i in client.requests))
+        self.assertEqual(batcher.counters.requests, len(client.requests))
+
+    def test_errors(self):
+        client = ClientFake(failing=[3])
+        batcher = self.batcher(client, end_point='statuses/lookup', window=0.1)
+        futures = [batcher.get(i) for i in range(5)]
+        for future in futures:
+            self.assertRaises(ErrorFake, future.result, 5)
+        self.assertEqual(batcher.counters.errors, 1)
+        self.assertEqual(batcher.get(1).result(5), {'id_str': '1'})      # errors are not kept
+
+    def test_method(self):
+        for end_point, method in (('users/lookup', 'POST'), ('statuses/lookup', 'POST'),
+                                  ('friendships/lookup', 'GET')):
+            client = ClientFake()
+            batcher = self.batcher(client, end_point=end_point, window=5)
+            futures = [batcher.get(ID_LONG + i) for i in range(100)]       # a full batch is sent at once
+            futures[-1].result(5)
+            self.assertEqual([i[1] for i in client.requests], [method])
+
+    def test_close(self):
+        client = ClientFake()
+        batcher = LookupBatcher(client, 'users/lookup', window=60)
+        future = batcher.get(1)
+        batcher.close()                                                     # pending ids are sent
+        self.assertEqual(future.result(0), {'id_str': '1'})
+        self.assertRaises(ErrorLookup, batcher.get, 2)
+        self.assertRaises(ErrorLookup, LookupBatcher, client, 'users/show')
+
+    def test_client_close(self):
+        client = ClientTwtRest(None)
+        batcher = client.lookup_batchers['users/lookup'] = LookupBatcher(ClientFake(), 'users/lookup', window=60)
+        future = batcher.get(1)
+        client.handle_close()
+        self.assertEqual(future.result(0), {'id_str': '1'})
+        self.assertEqual(client.lookup_batchers, {})
+
+
+@unittest.skipIf(_IS_PY2, "REST simulator needs python 3")
+class TestSimulatorLookups(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from twtPyCurl.twt.simulate_rest import SimulatorRest
+        cls.simulator = SimulatorRest(port=0).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.simulator.stop()
+
+    def setUp(self):
+        credentials = Credentials(id_appl='app', id_user='u1', consumer_key='ck', consumer_secret='cs',
+                                  access_token_key='tok-1', access_token_secret='ts')
+        self.client = ClientTwtRest(credentials, url_api=self.simulator.url_api)
+        self.addCleanup(self.client.handle_close)
+
+    def test_methods(self):
+        ids = ','.join(str(ID_LONG + i) for i in range(3))
+        self.assertEqual(self.client.request_ep('users/lookup', 'POST', {'user_id': '1,2'}).status_http, 200)
+        self.assertEqual(self.client.request_ep('statuses/lookup', 'POST', {'id': ids}).status_http, 200)
+        self.assertEqual(self.client.request_ep('friendships/lookup', 'GET', {'user_id': '1,2'}).status_http, 200)
+        self.assertRaises(ErrorRqHttpTwt, self.client.request_ep, 'friendships/lookup', 'POST', {'user_id': '1'})
+
+    def test_batched(self):
+        futures = [self.client.lookup('friendships/lookup', ID_LONG + i) for i in range(150)]
+        for future in futures:
+            future.result(10)                           # raises if a batch was POSTed
+        self.assertEqual(self.client.lookup_batchers['friendships/lookup'].counters.errors, 0)
+
+    def test_clones_reused(self):
+        batcher = self.client.lookup_batchers['users/lookup'] = LookupBatcher(self.client, 'users/lookup',
+                                                                              window=0.01, concurrency=2)
+        for cnt in range(3):                            # a batch each
+            self.assertEqual(batcher.get(cnt + 1).result(10)['id'], cnt + 1)
+        clones = list(batcher._clients)
+        self.assertEqual((batcher.counters.requests, len(clones)), (3, 1))
+        futures = [batcher.get(i) for i in range(100, 400)]
+        self.assertEqual(futures[-1].result(10)['id'], 399)
+        self.assertTrue(clones[0] in batcher._clients and len(batcher._clients) <= 2)
+        clones = list(batcher._clients)
+        self.client.handle_close()
+        self.assertTrue(all(i.handle is None for i in clones))
+
+
+if __name__ == "__main__":
+    unittest.main()
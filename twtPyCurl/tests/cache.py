@@ -0,0 +1,188 @@
+'''
+tests for response cache (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.cache -v
+'''
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from time import sleep
+from twtPyCurl import _IS_PY2
+from twtPyCurl.py.requests import Credentials, CredentialsPool
+from twtPyCurl.twt.cache import ResponseCache
+
+URL = 'https://api.twitter.com/1.1/users/show.json'
+
+
+def credentials(id_user):
+    return Credentials(id_appl='app', id_user=id_user, consumer_key='ck', consumer_secret='cs',
+                       access_token_key='tok-' + id_user, access_token_secret='ts')
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_key(self):
+        cache = ResponseCache()
+        self.assertEqual(cache.key(URL, {'b': 2, 'a': 1}), cache.key(URL, {'a': 1, 'b': 2}))
+        self.assertEqual(cache.key(URL, {}, credentials('u1')), cache.key(URL, {}, credentials('u2')))
+        cache = ResponseCache(per_credentials=True)
+        self.assertNotEqual(cache.key(URL, {}, credentials('u1')), cache.key(URL, {}, credentials('u2')))
+
+    def test_ttl(self):
+        cache = ResponseCache(ttls={'/users/show': 0, '/trends/place': 1})
+        self.assertEqual(cache.ttl(URL), 0)
+        self.assertEqual(cache.ttl('https://api.twitter.com/1.1/statuses/show/123.json'), 3600)
+        self.assertEqual(cache.ttl('https://api.twitter.com/1.1/search/tweets.json'), 0)
+        cache.put('k', b'{}', 0.05)
+        self.assertEqual(cache.get('k'), b'{}')
+        sleep(0.1)
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual((cache.counters.hits, cache.counters.expired, len(cache)), (1, 1, 0))
+
+    def test_lru(self):
+        cache = ResponseCache(max_items=2)
+        cache.put('a', b'1', 60)
+        cache.put('b', b'2', 60)
+        cache.get('a')                                  # b is least recently used
+        cache.put('c', b'3', 60)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (b'1', b'3'))
+        self.assertEqual(cache.counters.evictions, 1)
+
+    def test_purge(self):
+        cache = ResponseCache()
+        cache.put('a', b'1', 0.05)
+        cache.put('b', b'2', 60)
+        sleep(0.1)
+        cache.purge()
+        self.assertEqual((len(cache), cache.counters.expired), (1, 1))
+
+    def test_fetch_not_cacheable(self):
+        cache = ResponseCache()
+        self.assertEqual(cache.fetch('k', 60, lambda: (b'{"errors":[]}', False)), (b'{"errors":[]}', True))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.fetch('k', 60, lambda: (b'{}', True)), (b'{}', True))
+        self.assertEqual(cache.fetch('k', 60, lambda: (b'{"x":1}', True)), (b'{}', False))
+        self.assertEqual((cache.counters.misses, cache.counters.hits), (2, 1))
+
+    def test_fetch_single_flight(self):
+        cache = ResponseCache()
+        calls = []
+        results = []
+
+        def fun():
+            calls.append(1)
+            sleep(0.2)
+            return b'{}', True
+
+        threads = [threading.Thread(target=lambda: results.append(cache.fetch('k', 60, fun))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(i[1] for i in results), [False] * 4 + [True])
+        self.assertEqual((cache.counters.misses, cache.counters.coalesced), (1, 4))
+
+    def test_fetch_leader_fails(self):
+        cache = ResponseCache()
+
+        def fun():
+            raise ValueError("request failed")
+        self.assertRaises(ValueError, cache.fetch, 'k', 60, fun)
+        self.assertEqual(cache._in_flight, {})          # followers make their own request
+        self.assertEqual(cache.fetch('k', 60, lambda: (b'{}', True)), (b'{}', True))
+
+
+class TestResponseCacheSQLite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_persistent(self):
+        cache = ResponseCache(path=self.path)
+        cache.put('a', b'1', 60)
+        cache.put('b', b'2', 0.05)
+        cache.close()
+        sleep(0.1)
+        cache = ResponseCache(max_items=1, path=self.path)     # a new process
+        self.assertEqual(cache.get('a'), b'1')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.counters.hits_disk, 1)
+        self.assertEqual(cache.get('a'), b'1')                  # now in memory
+        self.assertEqual(cache.counters.hits, 1)
+        cache.purge()
+        cache.clear()
+        self.assertIsNone(cache.get('a'))
+        cache.close()
+
+    def test_memory_not_blocked_by_db(self):
+        cache = ResponseCache(path=self.path)
+        self.addCleanup(cache.close)
+        cache.put('a', b'1', 60)
+        got = []
+        with cache._db_lock:                                    # as if a slow SQLite write was in progress
+            reader = threading.Thread(target=lambda: got.append(cache.get('a')))
+            reader.start()
+            reader.join(2)
+            self.assertEqual(got, [b'1'])
+            writer = threading.Thread(target=cache.put, args=('b', b'2', 60))
+            writer.start()
+            sleep(0.05)
+            self.assertEqual(cache.get('b'), b'2')              # in memory before SQLite write completes
+        writer.join(2)
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+
+
+@unittest.skipIf(_IS_PY2, "REST simulator needs python 3")
+class TestClientCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from twtPyCurl.twt.simulate_rest import SimulatorRest
+        cls.simulator = SimulatorRest(port=0).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.simulator.stop()
+
+    def client(self, credentials, cache, **kwargs):
+        from twtPyCurl.twt.clients import ClientTwtRest
+        client = ClientTwtRest(credentials, cache=cache, url_api=self.simulator.url_api, **kwargs)
+        self.addCleanup(client.handle_close)
+        return client
+
+    def test_cached(self):
+        cache = ResponseCache()
+        client = self.client(credentials('u1'), cache)
+        first = client.request_ep('users/show', parms={'screen_name': 'twitter'}).data
+        response = client.request_ep('users/show', parms={'screen_name': 'twitter'})
+        self.assertTrue(response.cached)
+        self.assertEqual(response.data, first)
+        self.assertEqual((cache.counters.misses, cache.counters.hits), (1, 1))
+
+    def test_error_not_cached(self):
+        cache = ResponseCache()
+        client = self.client(credentials('u1'), cache, allow_retries=False)
+        parms = {'screen_name': 'twitter', 'p_error': 1, 'error_status': 404}
+        for _ in range(2):
+            self.assertEqual(client.request_ep('users/show', parms=parms).status_http, 404)
+        self.assertEqual((cache.counters.misses, cache.counters.hits, len(cache)), (2, 0, 0))
+
+    def test_per_credentials(self):
+        cache = ResponseCache(per_credentials=True)
+        client = self.client(CredentialsPool([credentials('u1'), credentials('u2')]), cache)
+        for _ in range(4):
+            client.request_ep('users/show', parms={'screen_name': 'twitter'})
+        self.assertEqual((cache.counters.misses, cache.counters.hits, len(cache)), (2, 2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+'''
+tests for JSON codecs (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.codec -v
+'''
+import sys
+import unittest
+from twtPyCurl.py import codec
+from twtPyCurl.py.codec import (Codec, ErrorCodec, BACKENDS, CODEC, codec_get, codecs_available,
+                                codec_benchmark)
+
+DOC = {'id': 1, 'text': u'café http://t.co/x', 'entities': {'urls': []}, 'truncated': False, 'geo': None}
+
+
+class ModulesBlocked(object):
+    """a context manager that makes importing modules raise ImportError"""
+    def __init__(self, *names):
+        self.names = names
+        self.saved = {}
+
+    def __enter__(self):
+        for name in self.names:
+            self.saved[name] = sys.modules.get(name)
+            sys.modules[name] = None
+        return self
+
+    def __exit__(self, *args):
+        for name, module in self.saved.items():
+            if module is None:
+                del sys.modules[name]
+            else:
+                sys.modules[name] = module
+
+
+class TestCodec(unittest.TestCase):
+
+    def test_backends(self):
+        for name in codecs_available():
+            codec_ = Codec(name)
+            encoded = codec_.dumps(DOC)
+            self.assertIsInstance(encoded, type(u'') if name == 'orjson' else (type(''), type(u'')))
+            self.assertNotIn(', ', encoded, name)                   # compact separators
+            self.assertNotIn('\\/', encoded, name)                  # slashes are not escaped
+            self.assertEqual(codec_.loads(encoded), DOC, name)
+            self.assertEqual(codec_.loads(encoded.encode('utf-8')), DOC, name)
+            self.assertEqual(repr(codec_), '<Codec:{}>'.format(name))
+
+    def test_loads_buffer(self):
+        buf = bytearray(b'{"ids":[1,2,3]}')
+        for name in codecs_available():
+            self.assertEqual(codec_get(name).loads_buffer(buf), {'ids': [1, 2, 3]}, name)
+
+    def test_loads_buffer_paths(self):
+        def loads(doc):                                             # a backend that rejects a bytearray
+            if not isinstance(doc, bytes):
+                raise TypeError("bytes expected")
+            return doc
+        backend = codec._backend
+        codec._backend = lambda name: (loads, None)
+        try:
+            codec_ = Codec('bytes_only')
+        finally:
+            codec._backend = backend
+        self.assertIsNot(codec_.loads_buffer, codec_.loads)
+        self.assertEqual(codec_.loads_buffer(bytearray(b'[1]')), b'[1]')   # decoded from a copy
+        codec_ = Codec('json')
+        if codec_.loads_buffer is codec_.loads:                     # backend accepts a bytearray as is
+            self.assertEqual(codec_.loads_buffer(bytearray(b'[1]')), [1])
+
+    def test_unknown(self):
+        self.assertRaises(ImportError, Codec, 'nope')
+        self.assertRaises(ErrorCodec, codec_get, 'nope')
+
+
+class TestCodecGet(unittest.TestCase):
+
+    def test_default(self):
+        self.assertIs(codec_get(), CODEC)
+        self.assertIs(codec_get(None), CODEC)
+
+    def test_instance(self):
+        codec_ = Codec('json')
+        self.assertIs(codec_get(codec_), codec_)
+
+    def test_cached(self):
+        self.assertIs(codec_get('json'), codec_get('json'))
+        self.assertEqual(codec_get('json').name, 'json')
+
+    def test_unavailable(self):
+        with ModulesBlocked('ujson'):
+            codec._CODECS.pop('ujson', None)
+            self.assertRaises(ErrorCodec, codec_get, 'ujson')
+        codec._CODECS.pop('ujson', None)
+
+
+class TestFallback(unittest.TestCase):
+
+    def test_order(self):
+        available = codecs_available()
+        self.assertEqual(available[-1], 'json')
+        self.assertEqual(available, [i for i in BACKENDS if i in available])
+        self.assertEqual(CODEC.name, available[0])
+
+    def test_fallback(self):
+        with ModulesBlocked('orjson'):
+            self.assertNotIn('orjson', codecs_available())
+        with ModulesBlocked('orjson', 'ujson'):
+            self.assertEqual(codecs_available()[0], 'simplejson' if 'simplejson' in codecs_available() else 'json')
+        with ModulesBlocked('orjson', 'ujson', 'simplejson'):
+            self.assertEqual(codecs_available(), ['json'])
+
+    def test_simplejson_speedups(self):
+        simplejson = sys.modules.get('simplejson')
+        speedups = getattr(simplejson, '_speedups', None)
+        if speedups is not None:                                    # from-import finds the loaded submodule
+            del simplejson._speedups
+        try:
+            with ModulesBlocked('simplejson._speedups'):             # pure python simplejson is not used
+                self.assertNotIn('simplejson', codecs_available())
+                self.assertIn('json', codecs_available())
+        finally:
+            if speedups is not None:
+                simplejson._speedups = speedups
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_benchmark(self):
+        docs = [CODEC.dumps(DOC).encode('utf-8')] * 10
+        rt = codec_benchmark(docs, seconds=0.01)
+        self.assertEqual(sorted(i['name'] for i in rt), sorted(codecs_available()))
+        self.assertEqual(rt, sorted(rt, key=lambda x: x['docs_per_sec'], reverse=True))
+        self.assertTrue(all(i['docs_per_sec'] > 0 and i['mb_per_sec'] > 0 for i in rt))
+        self.assertEqual([i['name'] for i in codec_benchmark(docs, backends=['json'], seconds=0.01)], ['json'])
+
+
+if __name__ == "__main__":
+    unittest.main()
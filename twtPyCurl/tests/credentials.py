@@ -0,0 +1,108 @@
+'''
+tests for credentials pools (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.credentials -v
+'''
+import unittest
+from time import time
+from twtPyCurl.py.requests import Credentials, CredentialsPool, CredentialsProvider, ErrorRqCredentialsNotValid
+from twtPyCurl.twt.clients import ClientTwtRest, ErrorRqHttpTwt
+from twtPyCurl.twt.ratelimits import RateLimits
+
+URL = 'https://api.twitter.com/1.1/users/show.json'
+ERROR_89 = b'{"errors":[{"message":"Invalid or expired token.","code":89}]}'
+
+
+def credentials_dict(id_user):
+    return {'id_appl': 'app', 'id_user': id_user, 'consumer_key': 'ck', 'consumer_secret': 'cs',
+            'access_token_key': 'tok-' + id_user, 'access_token_secret': 'ts'}
+
+
+def headers(limit, remaining, reset):
+    return {'x-rate-limit-limit': str(limit), 'x-rate-limit-remaining': str(remaining),
+            'x-rate-limit-reset': str(reset)}
+
+
+class ProviderFake(CredentialsProvider):
+    def __init__(self):
+        self.revoked = []
+
+    def get_credentials(self, id_appl, id_user=None):
+        return credentials_dict(id_user)
+
+    def on_revoke_credentials(self, appl_id, user_id):
+        self.revoked.append((appl_id, user_id))
+
+
+class TestCredentialsPool(unittest.TestCase):
+
+    def setUp(self):
+        self.provider = ProviderFake()
+        self.pool = CredentialsPool(provider=self.provider)
+        self.pool.fill([('app', 'u1'), ('app', 'u2'), ('app', 'u3')])
+        self.u1, self.u2, self.u3 = self.pool._credentials
+
+    def test_round_robin(self):
+        self.assertEqual(len(self.pool), 3)
+        self.assertEqual([self.pool.pick(URL).id_user for _ in range(4)], ['u1', 'u2', 'u3', 'u1'])
+        headroom = {'u1': 5, 'u2': 5, 'u3': 1}
+        picked = [self.pool.pick(URL, lambda x, url: headroom[x.id_user]).id_user for _ in range(3)]
+        self.assertEqual(picked, ['u2', 'u1', 'u1'])       # ties in round robin order, never u3
+
+    def test_revoke(self):
+        self.assertTrue(self.pool.revoke(self.u2))
+        self.assertFalse(self.pool.revoke(self.u2))
+        self.assertEqual(self.provider.revoked, [('app', 'u2')])
+        self.assertEqual(self.pool.revoked, [self.u2])
+        self.assertEqual(set(self.pool.pick(URL).id_user for _ in range(4)), set(['u1', 'u3']))
+
+    def test_revoke_provider_not_implemented(self):
+        pool = CredentialsPool([Credentials(**credentials_dict('u1'))], provider=CredentialsProvider())
+        self.assertTrue(pool.revoke(pool.pick(URL)))
+        self.assertRaises(ErrorRqCredentialsNotValid, pool.pick, URL)
+
+
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.provider = ProviderFake()
+        self.pool = CredentialsPool(provider=self.provider)
+        self.pool.fill([('app', 'u1'), ('app', 'u2')])
+        self.limits = RateLimits(window=60)
+        self.client = ClientTwtRest(self.pool, rate_limits=self.limits)
+        self.client.backoff_defer = True
+        self.addCleanup(self.client.handle_close)
+        self.reset = int(time()) + 30
+
+    def test_pick_by_headroom(self):
+        u1, u2 = self.pool._credentials
+        self.limits.update(self.limits.key(u1, URL), headers(15, 10, self.reset))
+        self.limits.update(self.limits.key(u2, URL), headers(15, 2, self.reset))
+        self.assertEqual([self.client.credentials_pick(URL) for _ in range(2)], [u1, u1])
+        self.client.request_start(URL, 'GET', {})
+        self.assertIs(self.client._last_req.credentials, u1)
+        self.assertEqual(self.limits.headroom(self.limits.key(u1, URL)), 9)
+
+    def error_401(self):
+        self.client.response.reset()
+        self.client.response.write(ERROR_89)
+        self.client._state.retries_http = 1
+        return self.client.on_request_error_http(401)
+
+    def test_revoke_and_retry(self):
+        u1, u2 = self.pool._credentials
+        self.limits.update(self.limits.key(u1, URL), headers(15, 10, self.reset))
+        self.limits.update(self.limits.key(u2, URL), headers(15, 0, self.reset))     # retry has to wait
+        self.client.request_start(URL, 'GET', {})
+        self.assertEqual(self.client.backoff_until, 0)
+        self.assertTrue(self.error_401())
+        self.assertEqual(self.provider.revoked, [('app', 'u1')])
+        self.assertIs(self.client._last_req.credentials, u2)
+        self.assertEqual(self.limits.headroom(self.limits.key(u2, URL)), -1)        # reserved by retry
+        self.assertTrue(self.client.backoff_until > time() + 25)
+        self.assertRaises(ErrorRqHttpTwt, self.error_401)                           # pool is exhausted
+        self.assertEqual(len(self.pool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
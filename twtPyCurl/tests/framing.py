@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+'''
+tests for stream framers (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.framing -v
+'''
+import unittest
+import json
+from twtPyCurl.py.framing import (FramerDelimited, FramerLength, FramerJSONArray,
+                                    ErrorFrameOverflow, ErrorFrameMalformed)
+from twtPyCurl.py.requests import pycurl, ErrorRqCurl
+from twtPyCurl.twt.clients import ClientTwtStream
+
+
+def feed_all(framer, chunks):
+    rt = []
+    for chunk in chunks:
+        rt.extend(framer.feed(chunk))
+    return rt
+
+
+class TestFramerDelimited(unittest.TestCase):
+
+    def test_many_per_chunk(self):
+        framer = FramerDelimited(b"\r\n")
+        self.assertEqual(framer.feed(b'{"a":1}\r\n{"b":2}\r\n{"c":3}\r\n'), [b'{"a":1}', b'{"b":2}', b'{"c":3}'])
+        self.assertEqual(len(framer), 0)
+
+    def test_split_frames(self):
+        framer = FramerDelimited(b"\r\n")
+        self.assertEqual(framer.feed(b'{"a":1}\r\n{"b"'), [b'{"a":1}'])
+        self.assertEqual(framer.feed(b':2}'), [])
+        self.assertEqual(framer.feed(b'\r\n{"c":3}'), [b'{"b":2}'])
+        self.assertEqual(framer.feed(b'\r\n'), [b'{"c":3}'])
+
+    def test_split_separator(self):
+        framer = FramerDelimited(b"\r\n")
+        self.assertEqual(feed_all(framer, [b'{"a":1}\r', b'\n{"b":2}\r', b'\n']), [b'{"a":1}', b'{"b":2}'])
+
+    def test_keep_alives(self):
+        framer = FramerDelimited(b"\r\n")
+        self.assertEqual(feed_all(framer, [b'\r\n', b'\r\n{"a":1}\r\n\r\n', b'\r\n']), [b'{"a":1}'])
+
+    def test_byte_by_byte(self):
+        data = b'{"a":1}\r\n\r\n{"b":"\xce\xb1"}\r\n'
+        framer = FramerDelimited("\r\n")
+        self.assertEqual(feed_all(framer, [data[i:i + 1] for i in range(len(data))]),
+                         [b'{"a":1}', b'{"b":"\xce\xb1"}'])
+
+    def test_overflow(self):
+        framer = FramerDelimited(b"\r\n", frame_max=8)
+        self.assertEqual(framer.feed(b'{"a":1}\r\n1234'), [b'{"a":1}'])
+        self.assertRaises(ErrorFrameOverflow, framer.feed, b'56789')
+        framer.reset()
+        self.assertEqual(framer.feed(b'{"b":2}\r\n'), [b'{"b":2}'])
+
+
+class TestFramerLength(unittest.TestCase):
+
+    @staticmethod
+    def delimit(*payloads):
+        return b"".join([b"\r\n" + str(len(i) + 2).encode('ascii') + b"\r\n" + i + b"\r\n" for i in payloads])
+
+    def test_many_per_chunk(self):
+        framer = FramerLength()
+        self.assertEqual(framer.feed(self.delimit(b'{"a":1}', b'{"b":2}')), [b'{"a":1}', b'{"b":2}'])
+        self.assertEqual(len(framer), 0)
+
+    def test_split_frames(self):
+        data = self.delimit(b'{"a":1}', b'{"b":"\xce\xb1"}', b'{"c":3}')
+        for size in range(1, len(data)):
+            framer = FramerLength()
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            self.assertEqual(feed_all(framer, chunks), [b'{"a":1}', b'{"b":"\xce\xb1"}', b'{"c":3}'])
+
+    def test_payload_with_separator(self):
+        framer = FramerLength()
+        self.assertEqual(framer.feed(self.delimit(b'{"a":"\r\n"}')), [b'{"a":"\r\n"}'])
+
+    def test_overflow(self):
+        framer = FramerLength(frame_max=8)
+        self.assertRaises(ErrorFrameOverflow, framer.feed, self.delimit(b'{"a":1000}'))
+
+    def test_malformed(self):
+        framer = FramerLength()
+        self.assertRaises(ErrorFrameMalformed, framer.feed, b'{"a":1}\r\n')
+        framer.reset()
+        self.assertRaises(ErrorFrameMalformed, framer.feed, b'{"a":1000000000000000}')
+
+    def test_negative_length(self):
+        for data in (b'5\r\nhello-4\r\nabc', b'5\r\nhello-3\r\nabc'):
+            framer = FramerLength()
+            self.assertRaises(ErrorFrameMalformed, framer.feed, data)
+
+
+class TestStreamFrameError(unittest.TestCase):
+
+    def client(self, **kwargs):
+        client = ClientTwtStream(stats_every=0, **kwargs)
+        client.request_abort_set(None)
+        client.on_request_start()
+        return client
+
+    def assert_frame_error(self, client, chunk):
+        self.assertEqual(client.handle_on_write(chunk), -1)     # aborts transfer
+        self.assertEqual(client.request_abort[1], client.abort_frame_error)
+        with self.assertRaises(ErrorRqCurl) as cm:
+            client.on_request_error_curl(pycurl.error(pycurl.E_WRITE_ERROR, 'write error'))
+        self.assertEqual(cm.exception.args[0], pycurl.E_WRITE_ERROR)
+
+    def test_overflow(self):
+        self.assert_frame_error(self.client(frame_max=8), b'{"a":1000}')
+
+    def test_malformed(self):
+        self.assert_frame_error(self.client(length_delimited=True), b'{"a":1}\r\n')
+
+    def test_abort_requested(self):
+        client = self.client()
+        client.request_abort_set(1001, 'stop')
+        self.assertFalse(client.on_request_error_curl(pycurl.error(pycurl.E_WRITE_ERROR, 'write error')))
+
+
+class TestFramerJSONArray(unittest.TestCase):
+    items = [{"id": 1, "text": "a ] } , [ { \" \\"}, {"id": 2, "user": {"ids": [1, 2]}, "e": []},
+             {"id": 3, "text": u"\u03b1\u03b2 \\\""}, "x,y", 4, None]
+
+    def split_all(self, data, key=None):
+        for size in range(1, len(data) + 1):
+            framer = FramerJSONArray(key)
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            yield [json.loads(i.decode('utf-8')) for i in feed_all(framer, chunks)], framer
+
+    def test_top_level(self):
+        data = json.dumps(self.items).encode('utf-8')
+        for items, framer in self.split_all(data):
+            self.assertEqual(items, self.items)
+            self.assertTrue(framer.done())
+            self.assertEqual(len(framer), 0)
+
+    def test_key(self):
+        data = json.dumps({"search_metadata": {"statuses": [0]}, "a": "statuses", "b": [5],
+                           "statuses": self.items, "next": [6]}).encode('utf-8')
+        for items, framer in self.split_all(data, 'statuses'):
+            self.assertEqual(items, self.items)
+
+    def test_ids(self):
+        data = b'{"ids":[10,11 , 12],"next_cursor":0}'
+        for items, framer in self.split_all(data, b'ids'):
+            self.assertEqual(items, [10, 11, 12])
+
+    def test_empty(self):
+        for data in (b'[]', b'[ ]', b'{"ids": []}', b'{"errors": [{"code": 34}]}'):
+            self.assertEqual(FramerJSONArray(b'ids' if b'{' in data else None).feed(data), [])
+
+    def test_overflow(self):
+        framer = FramerJSONArray(frame_max=8)
+        self.assertRaises(ErrorFrameOverflow, framer.feed, b'[{"a":1000000}')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+'''
+tests for incremental delivery of REST response items against a local http server (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.items -v
+'''
+import json
+import threading
+import unittest
+from time import time
+from twtPyCurl.py.requests import Credentials, CredentialsPool, ErrorRqCurl
+from twtPyCurl.py.framing import ErrorFrameOverflow, FRAME_MAX
+from twtPyCurl.twt.clients import ClientTwtRest, ErrorRqHttpTwt
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:  # python 3
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+ERROR_89 = b'{"errors":[{"message":"Invalid or expired token.","code":89}]}'
+ITEMS = [{'id': i, 'text': 'item {}'.format(i)} for i in range(10)]
+
+
+def credentials(id_user):
+    return Credentials(id_appl='app', id_user=id_user, consumer_key='ck', consumer_secret='cs',
+                       access_token_key='tok-' + id_user, access_token_secret='ts')
+
+
+def items_json(items):
+    return ','.join([json.dumps(i) for i in items]).encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    """responds to /1.1/<end point>.json, body is sent until connection closes unless Content-Length is set"""
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('Authorization', ''))
+        end_point = self.path.split('?')[0][len('/1.1/'):-len('.json')]
+        if end_point == 'revoked' and 'oauth_token="tok-1"' in self.server.requests[-1]:
+            return self.respond(401, ERROR_89)
+        if end_point == 'missing':
+            return self.respond(404, b'{"errors":[{"message":"Sorry, that page does not exist","code":34}]}')
+        self.send_response(200)
+        if end_point == 'truncated':
+            self.send_header('Content-Length', '10000')
+        self.end_headers()
+        if end_point == 'gated':           # half of items then waits for test to consume some
+            self.wfile.write(b'{"next_cursor":0,"ids":[' + items_json(ITEMS[:5]))
+            self.wfile.flush()
+            self.server.gate.wait(5)
+            self.wfile.write(b',' + items_json(ITEMS[5:]) + b']}')
+        elif end_point == 'truncated':
+            self.wfile.write(b'[' + items_json(ITEMS[:3]) + b',')
+        elif end_point == 'huge':
+            huge = b'{"ids":[' + b','.join([b'1234567890'] * (FRAME_MAX // 10)) + b']}'
+            self.wfile.write(b'[' + items_json(ITEMS[:2]) + b',' + huge + b']')
+        else:
+            self.wfile.write(b'[' + items_json(ITEMS) + b']')
+
+    def respond(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestRequestEpItems(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        cls.url_api = 'http://127.0.0.1:{}/1.1/{{}}.json'.format(cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.gate = threading.Event()
+        self.addCleanup(self.server.gate.set)
+
+    def client(self, creds=None):
+        client = ClientTwtRest(creds or credentials('1'), url_api=self.url_api)
+        self.addCleanup(client.handle_close)
+        return client
+
+    def test_items(self):
+        client = self.client()
+        self.assertEqual(list(client.request_ep_items('array')), ITEMS)
+        self.assertEqual(client.response.status_http, 200)
+        self.assertEqual(list(client.request_ep_items('array', parms={'count': 10})), ITEMS)     # reusable
+
+    def test_incremental(self):
+        client = self.client()
+        items = client.request_ep_items('gated', key='ids')
+        t_start = time()
+        self.assertEqual([next(items) for _ in range(4)], ITEMS[:4])     # 5th is completed by next ','
+        self.assertTrue(time() - t_start < 2)                           # server is still waiting at the gate
+        self.server.gate.set()
+        self.assertEqual(list(items), ITEMS[4:])
+
+    def test_retry_before_first_item(self):
+        pool = CredentialsPool([credentials('1'), credentials('2')])
+        client = self.client(pool)
+        self.assertEqual(list(client.request_ep_items('revoked')), ITEMS)
+        self.assertEqual(len(self.server.requests), 2)                  # retried with other credentials
+        self.assertEqual([i.id_user for i in pool.revoked], ['1'])
+
+    def test_http_error(self):
+        client = self.client()
+        with self.assertRaises(ErrorRqHttpTwt):
+            list(client.request_ep_items('missing'))
+        self.assertEqual(client.response.status_http, 404)
+
+    def test_error_after_items(self):
+        client = self.client()
+        items = []
+        with self.assertRaises(ErrorRqCurl):                            # no retry, items would be yielded twice
+            for item in client.request_ep_items('truncated'):
+                items.append(item)
+        self.assertEqual(items, ITEMS[:3])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_framing_error(self):
+        client = self.client()
+        items = []
+        with self.assertRaises(ErrorFrameOverflow):
+            for item in client.request_ep_items('huge'):
+                items.append(item)
+        self.assertEqual(items, ITEMS[:2])
+        self.assertEqual(list(client.request_ep_items('array')), ITEMS)  # transfer was aborted and handle released
+
+    def test_early_close(self):
+        client = self.client()
+        items = client.request_ep_items('gated', key='ids')
+        self.assertEqual(next(items), ITEMS[0])
+        items.close()
+        self.assertEqual(list(client.request_ep_items('array')), ITEMS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,12 @@
 """
-some manual benchmarking tests
+some manual benchmarking tests, for repeatable benchmarks see :mod:`twtPyCurl.bench`
 """
 import argparse
 from twtPyCurl.py.requests import (Credentials, CredentialsProviderFile)
 from twtPyCurl.twt.clients import (ClientTwtRest, ClientTwtStream)
-import simplejson
+from twtPyCurl.py.codec import CODEC, codec_benchmark
+from twtPyCurl.twt.samples import tweets_sample_encoded
+from twtPyCurl.py.utilities import format_header
 
 
 def test_rest():
@@ -19,17 +21,45 @@ def test_rest():
 def stream_simulate():
     def on_data(data):
         return
-        jdata = simplejson.loads(data)
-        print jdata.get('text') 
+        jdata = CODEC.loads(data)
+        print (jdata.get('text'))
     tmp_credentials = Credentials(**CredentialsProviderFile()())
     cls = ClientTwtStream(credentials=tmp_credentials, stats_every=10000, name="tst1", verbose=0, on_data_cb=on_data) 
     resp = cls.stream.statuses.filter.test(track="foo")
     return resp
 
 
+def codec_bench():
+    """decode throughput of available JSON backends on sample tweets (no credentials needed)"""
+    frmt = "|{name:14s}|{docs_per_sec:14,.0f}|{mb_per_sec:10,.2f}|"
+    docs = tweets_sample_encoded()
+    print (format_header(frmt))
+    for rt in codec_benchmark(docs):
+        print (frmt.format(**rt))
+
+
+def oauth_bench(count=20000):
+    """OAuth1 headers per second oauthlib vs native signer (no credentials needed)"""
+    from timeit import timeit
+    from twtPyCurl.py.oauth import OAuth1
+    keys = {'consumer_key': 'xvz1evFS4wEEPTGEFPHBog', 'consumer_secret': 'kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw',
+            'access_token_key': '370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb',
+            'access_token_secret': 'LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE'}
+    url = 'https://api.twitter.com/1.1/search/tweets.json'
+    parms = {'q': 'USA OR France', 'count': 100, 'result_type': 'recent', 'include_entities': 'true'}
+    oauth = OAuth1(**keys)
+    signer, oauth.signer = oauth.signer, None
+    frmt = "|{name:14s}|{headers_per_sec:16,.0f}|"
+    print (format_header(frmt))
+    for name, signer_used in [('oauthlib', None), ('native', signer)]:
+        oauth.signer = signer_used
+        seconds = timeit(lambda: oauth.get_oath_header(url, 'GET', parms), number=count)
+        print (frmt.format(name=name, headers_per_sec=count / seconds))
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description="manual tests")
-    parser.add_argument('--testfun',  choices=['test_rest', 'stream_simulate'],
+    parser.add_argument('--testfun',  choices=['test_rest', 'stream_simulate', 'codec_bench', 'oauth_bench'],
                          help='test to run')
     parser.add_argument('-collection',    default=None, type=str,
                         help='name of output collection')
@@ -43,11 +73,15 @@ def parse_args():
 def main():
 
         args = parse_args()
-        print "starting with args", vars(args)
+        print ("starting with args {}".format(vars(args)))
         if args.testfun == 'test_rest':
             test_rest()
         elif args.testfun == 'stream_simulate':
             stream_simulate()
+        elif args.testfun == 'codec_bench':
+            codec_bench()
+        elif args.testfun == 'oauth_bench':
+            oauth_bench()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+'''
+tests for stream message classification (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.messages -v
+'''
+import json
+import unittest
+from twtPyCurl.twt.clients import ClientTwtStream, msg_type_sniff, RE_LIMIT_TRACK
+
+TWEET = b'{"created_at":"Mon Mar 07 10:00:00 +0000 2016","id":1,"id_str":"1","text":"a","source":"web"}'
+LIMIT = b'{"limit":{"track":12,"timestamp_ms":"1457344800000"}}'
+DELETE = b'{"delete":{"status":{"id":1,"id_str":"1","user_id":3,"user_id_str":"3"}}}'
+WARNING = b'{"warning":{"code":"FALLING_BEHIND","message":"behind","percent_full":60}}'
+FRIENDS = b'{"friends":[1,2,3]}'
+FRAMES = [TWEET, LIMIT, DELETE, TWEET, WARNING, FRIENDS, b'{"limit":{"track":15}}']
+
+
+class ClientMsgs(ClientTwtStream):
+    """records messages it gets"""
+    def __init__(self, **kwargs):
+        self.msgs = []
+        super(ClientMsgs, self).__init__(stats_every=0, **kwargs)
+
+    def on_twitter_msg(self, msg_type, msg):
+        self.msgs.append(msg_type)
+
+
+def client_stream(client):
+    """prepares client to receive data as if it was connected to a statuses stream"""
+    client.request_abort_set(None)
+    client._last_req.subdomain = 'stream'
+    client.on_request_start()
+    return client
+
+
+def feed(client, path):
+    if path == 'single':
+        for frame in FRAMES:
+            client.on_data(frame)
+    elif path == 'batch':
+        client.on_data_batch(FRAMES)
+    else:
+        client.on_data_decoded_batch([json.loads(i.decode('utf-8')) for i in FRAMES])
+    return client
+
+
+class TestSniff(unittest.TestCase):
+
+    def test_msg_type_sniff(self):
+        self.assertEqual(msg_type_sniff(LIMIT), b'limit')
+        self.assertEqual(msg_type_sniff(DELETE), b'delete')
+        self.assertEqual(msg_type_sniff(TWEET), b'created_at')
+        self.assertIsNone(msg_type_sniff(b'{ "limit":{"track":1}}'))      # can't tell, it is decoded
+        self.assertIsNone(msg_type_sniff(b'[1, 2]'))
+        self.assertIsNone(msg_type_sniff(b'{"' + b'k' * 40 + b'":1}'))
+        self.assertIsNone(msg_type_sniff(b''))
+
+    def test_limit_track(self):
+        self.assertEqual(RE_LIMIT_TRACK.search(LIMIT).group(1), b'12')
+        self.assertEqual(RE_LIMIT_TRACK.search(b'{"limit": {"track": 345}}').group(1), b'345')
+        self.assertIsNone(RE_LIMIT_TRACK.search(b'{"limit":{}}'))
+
+
+class TestMsgsDecode(unittest.TestCase):
+
+    def counters(self, client):
+        return dict((k, client.counters[k]) for k in ('t_data', 't_msgs', 't_limit', 't_deletes'))
+
+    def test_default_not_overridden(self):
+        msgs = []
+        for path in ('single', 'batch', 'decoded'):
+            client = client_stream(ClientTwtStream(stats_every=0))
+            client.on_twitter_msg_base = lambda msg: msgs.append(list(msg.keys())[0])
+            feed(client, path)
+            self.assertEqual(self.counters(client), {'t_data': 2, 't_msgs': 5, 't_limit': 15, 't_deletes': 1})
+            self.assertEqual(msgs, ['warning', 'friends'])          # limit and delete notices not decoded
+            del msgs[:]
+
+    def test_overridden(self):
+        for path in ('single', 'batch', 'decoded'):
+            client = feed(client_stream(ClientMsgs()), path)
+            self.assertEqual(client.msgs, ['limit', 'delete', 'warning', 'friends', 'limit'], path)
+            self.assertEqual(self.counters(client), {'t_data': 2, 't_msgs': 5, 't_limit': 15, 't_deletes': 1})
+
+    def test_overridden_on_instance(self):
+        client = ClientTwtStream(stats_every=0)
+        self.assertNotIn(b'limit', client.msgs_decode)
+        msgs = []
+        client.on_twitter_msg = lambda msg_type, msg: msgs.append(msg_type)
+        feed(client_stream(client), 'single')                       # resolved again on request start
+        self.assertEqual(msgs, ['limit', 'delete', 'warning', 'friends', 'limit'])
+
+    def test_explicit(self):
+        for path in ('single', 'batch', 'decoded'):
+            client = feed(client_stream(ClientMsgs(msgs_decode=['limit'])), path)
+            self.assertEqual(client.msgs, ['limit', 'friends', 'limit'], path)
+            self.assertEqual(client.msgs_decode, frozenset([b'limit', b'disconnect']))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+'''
+tests for request steps and ClientMulti against a local http server (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.multi -v
+'''
+import threading
+import unittest
+from time import time
+from twtPyCurl.py.requests import Client, CredentialsPool, ErrorRqHttp, ErrorRqCredentialsNotValid
+from twtPyCurl.py.multi import ClientMulti
+from twtPyCurl.py.pipeline import Pipeline
+from twtPyCurl.twt.clients import ClientTwtStream
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:  # python 3
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+
+class Handler(BaseHTTPRequestHandler):
+    """responds to /status/<code> with that code, to anything else with 200 and path as body"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status = int(self.path.split('/')[2]) if self.path.startswith('/status/') else 200
+        body = self.path.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ClientRetry(Client):
+    """retries once after a short backoff on HTTP 503"""
+    def on_request_error_http(self, err):
+        if err == 503 and self._state.retries_http < 2:
+            self._last_req.parms = (self._last_req.parms[0].replace('/status/503', '/ok'),) + self._last_req.parms[1:]
+            self.backoff(0.1)
+            return True
+        return super(ClientRetry, self).on_request_error_http(err)
+
+
+class MultiRecorder(ClientMulti):
+    def __init__(self, *args, **kwargs):
+        super(MultiRecorder, self).__init__(*args, **kwargs)
+        self.done = []
+
+    def on_request_done(self, client, error=None):
+        self.done.append((client, error))
+
+
+class TestRequests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def client(self, cls=Client, **kwargs):
+        client = cls(**kwargs)
+        self.addCleanup(client.handle_close)
+        return client
+
+    def test_request(self):
+        client = self.client()
+        response = client.request(self.url + '/ok', 'GET', {'a': 1})
+        self.assertEqual((response.status_http, response.data), (200, b'/ok?a=1'))
+        self.assertRaises(ErrorRqHttp, client.request, self.url + '/status/404', 'GET')
+
+    def test_steps(self):
+        client = self.client(ClientRetry)
+        client.backoff_defer = True
+        client.request_start(self.url + '/status/503', 'GET')
+        attempts = 0
+        retry = True
+        while retry:
+            attempts += 1
+            client.request_attempt()
+            client.handle.perform()
+            retry = client.request_attempt_end()
+            if retry:
+                self.assertTrue(client.backoff_until > time())
+        client.request_finish()
+        self.assertEqual((attempts, client.response.status_http, client.response.data), (2, 200, b'/ok'))
+
+    def test_multi(self):
+        multi = MultiRecorder(select_timeout=0.1)
+        clients = [self.client() for _ in range(5)]
+        for cnt, client in enumerate(clients):
+            multi.add(client, self.url + '/ok/{}'.format(cnt), 'GET')
+        failing = self.client()
+        multi.add(failing, self.url + '/status/404', 'GET')
+        retrying = self.client(ClientRetry)
+        multi.add(retrying, self.url + '/status/503', 'GET')
+        multi.run()
+        multi.close()
+        self.assertEqual(len(multi.done), 7)
+        errors = dict(multi.done)
+        self.assertIsInstance(errors.pop(failing), ErrorRqHttp)
+        self.assertEqual(list(errors.values()), [None] * 6)
+        self.assertEqual([i.response.data for i in clients], [b'/ok/' + str(i).encode() for i in range(5)])
+        self.assertEqual(retrying.response.data, b'/ok')
+        self.assertFalse(retrying.backoff_defer)
+        self.assertEqual((multi.counters.done, multi.counters.retries, multi.counters.errors), (7, 1, 1))
+
+    def test_multi_add_fails(self):
+        multi = MultiRecorder()
+        client = self.client(credentials=CredentialsPool())            # request_start raises
+        multi.add(client, self.url + '/ok', 'GET')
+        multi.add(client, self.url + '/ok', 'GET')
+        multi.run()
+        multi.close()
+        self.assertEqual([type(i[1]) for i in multi.done], [ErrorRqCredentialsNotValid] * 2)
+
+    def test_multi_remove(self):
+        multi = MultiRecorder()
+        client = self.client(ClientRetry)
+        multi.add(client, self.url + '/status/503', 'GET')
+        while not multi._deferred:                                      # waiting for its backoff
+            multi.perform()
+        multi.remove(client)
+        multi.add(client, self.url + '/ok', 'GET')
+        multi.run()
+        multi.close()
+        self.assertEqual([i[1] for i in multi.done], [None, None])
+        self.assertEqual(client.response.data, b'/ok')
+
+    def test_multi_busy_client(self):
+        multi = MultiRecorder()
+        pipeline = Pipeline()
+        client = self.client(ClientTwtStream, pipeline=pipeline, stats_every=0)
+        client.on_request_error_http = lambda err: False
+        multi.add(client, self.url + '/ok/1', 'GET')
+        multi.add(client, self.url + '/ok/2', 'GET')       # client has a request in progress, ignored
+        multi.perform()
+        self.assertEqual(multi.done, [])
+        self.assertTrue(pipeline.running)
+        self.assertTrue(client.backoff_defer)
+        multi.run()
+        multi.close()
+        self.assertEqual(multi.done, [(client, None)])
+        self.assertFalse(pipeline.running)
+
+    def test_pipeline_stopped_if_start_fails(self):
+        pipeline = Pipeline()
+        client = self.client(ClientTwtStream, credentials=CredentialsPool(), pipeline=pipeline, stats_every=0)
+        self.assertRaises(ErrorRqCredentialsNotValid, client.request, self.url + '/ok', 'GET')
+        self.assertFalse(pipeline.running)
+        multi = MultiRecorder()
+        multi.add(client, self.url + '/ok', 'GET')
+        multi.run()
+        multi.close()
+        self.assertFalse(pipeline.running)
+        self.assertIsInstance(multi.done[0][1], ErrorRqCredentialsNotValid)
+
+
+if __name__ == "__main__":
+    unittest.main()
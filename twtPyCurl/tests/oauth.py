@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+'''
+conformance tests of OAuth1Signer against oauthlib (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.oauth -v
+'''
+import unittest
+from oauthlib.oauth1 import Client
+from twtPyCurl.py.oauth import OAuth1, OAuth1Signer, escape
+try:
+    from urllib import urlencode
+except ImportError:  # python 3
+    from urllib.parse import urlencode
+
+# example of `creating a signature <https://dev.twitter.com/oauth/overview/creating-signatures>`_
+KEYS = ('xvz1evFS4wEEPTGEFPHBog', 'kAcSOqF21Fu85e7zjz7ZN2U4ZRhfV3WpwPAoE3Z7kBw',
+        '370773112-GmHxMAgYyLbNEtIKZeRNFsMKPR9EyMZeS9weJAEb', 'LswwdoUaIvS8ltyTt5jkRh4J50vUPVVHtR2YPi5kE')
+NONCE = 'kYjzVBB8Y0ZFabxSWbWovY3uYSQ2pTgmZeNu2VS4cg'
+TIMESTAMP = '1318622958'
+URL = 'https://api.twitter.com/1.1/statuses/update.json'
+
+
+def header_oauthlib(keys, url, method, parms, nonce=NONCE, timestamp=TIMESTAMP):
+    client = Client(*keys, nonce=nonce, timestamp=timestamp)
+    rt = client.sign('%s?%s' % (url, urlencode(parms)), http_method=method)[1]
+    rt = rt.get('Authorization') or rt[b'Authorization']
+    return rt if isinstance(rt, str) else rt.decode('utf-8')
+
+
+class TestOAuth1Signer(unittest.TestCase):
+
+    def assertConforms(self, url, method, parms, keys=KEYS):
+        signer = OAuth1Signer(*keys)
+        self.assertEqual(signer.sign(url, method, parms, NONCE, TIMESTAMP),
+                         header_oauthlib(keys, url, method, parms))
+
+    def test_twitter_example(self):
+        parms = {'include_entities': 'true', 'status': 'Hello Ladies + Gentlemen, a signed OAuth request!'}
+        rt = OAuth1Signer(*KEYS).sign(URL, 'POST', parms, NONCE, TIMESTAMP)
+        self.assertIn('oauth_signature="hCtSmYh%2BiHYCEqBWrE7C7hYmtUk%3D"', rt)
+        self.assertConforms(URL, 'POST', parms)
+
+    def test_no_parms(self):
+        self.assertConforms('https://api.twitter.com/1.1/account/verify_credentials.json', 'GET', {})
+
+    def test_reserved_characters(self):
+        self.assertConforms(URL, 'POST', {'status': "~!*'();:@&=+$,/?#[] %-._"})
+        self.assertConforms(URL, 'GET', {'q': 'a b', 'a': '', 'count': 100, 'z~': '1'})
+
+    def test_unicode(self):
+        self.assertConforms(URL, 'POST', {'status': u'καλημέρα κόσμε ☃'.encode('utf-8')})
+
+    def test_url(self):
+        self.assertConforms('HTTPS://API.Twitter.com:443/1.1/users/show.json', 'get', {'screen_name': 'twitter'})
+        self.assertConforms('http://127.0.0.1:8080/1.1/users/show.json', 'GET', {'screen_name': 'twitter'})
+
+    def test_no_token(self):
+        self.assertConforms(URL, 'GET', {'a': 1}, keys=KEYS[:2] + (None, None))
+
+    def test_random_nonce(self):
+        signer = OAuth1Signer(*KEYS)
+        self.assertNotEqual(signer.sign(URL, 'GET', {}), signer.sign(URL, 'GET', {}))
+
+    def test_oauth1_uses_signer(self):
+        oauth = OAuth1(consumer_key=KEYS[0], consumer_secret=KEYS[1],
+                       access_token_key=KEYS[2], access_token_secret=KEYS[3])
+        self.assertIsInstance(oauth.signer, OAuth1Signer)
+        self.assertTrue(oauth.get_oath_header(URL, 'GET', {}).startswith('Authorization: OAuth oauth_nonce="'))
+
+    def test_escape(self):
+        self.assertEqual(escape(u'Ladies + Gentlemen'), 'Ladies%20%2B%20Gentlemen')
+        self.assertEqual(escape(b'\xe2\x98\x83'), '%E2%98%83')
+        self.assertEqual(escape('-._~'), '-._~')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+'''
+tests for pagination of REST end points (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.pagination -v
+'''
+import threading
+import unittest
+from time import sleep, time
+from twtPyCurl import _IS_PY2
+from twtPyCurl.py.requests import Credentials
+from twtPyCurl.py.utilities import DotDot
+from twtPyCurl.twt.pagination import pages, pagination_style, Prefetcher, ErrorPagination
+from twtPyCurl.twt.clients import ClientTwtRest
+
+CREDENTIALS = {'id_appl': 'app', 'id_user': 'u1', 'consumer_key': 'ck', 'consumer_secret': 'cs',
+               'access_token_key': 'tok-1', 'access_token_secret': 'ts'}
+
+
+class ClientFake(object):
+    """serves items 0 to items_n - 1, newest (highest) first for max_id end points, fails on request fail_on"""
+    def __init__(self, items_n=25, count=10, fail_on=None):
+        self.items_n = items_n
+        self.count = count
+        self.fail_on = fail_on
+        self.requests = []
+
+    def request_ep(self, end_point, method, parms):
+        self.requests.append(dict(parms))
+        if len(self.requests) == self.fail_on:
+            raise ValueError("request {} failed".format(self.fail_on))
+        if end_point == 'followers/ids':
+            start = int(parms.get('cursor', 0))
+            stop = min(start + self.count, self.items_n)
+            cursor = stop if stop < self.items_n else 0
+            return DotDot({'data': {'ids': list(range(start, stop)), 'next_cursor': cursor}})
+        top = min(int(parms.get('max_id', self.items_n - 1)), self.items_n - 1)
+        items = [{'id': i} for i in range(top, max(top - self.count, -1), -1)]
+        return DotDot({'data': items if end_point == 'statuses/user_timeline' else {'statuses': items}})
+
+
+class PagesClosed(object):
+    """a generator of pages that records if it was closed"""
+    def __init__(self, pages_gen):
+        self.closed = threading.Event()
+        self.pages = pages_gen
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.pages)
+    next = __next__
+
+    def close(self):
+        self.closed.set()
+
+
+class TestPages(unittest.TestCase):
+
+    def test_style(self):
+        self.assertEqual(pagination_style('followers/ids'), 'cursor')
+        self.assertEqual(pagination_style('search/tweets'), 'max_id')
+        self.assertIsNone(pagination_style('users/show'))
+        self.assertRaises(ErrorPagination, next, pages(ClientFake(), 'users/show'))
+
+    def test_cursor(self):
+        client = ClientFake()
+        rt = list(pages(client, 'followers/ids', {'screen_name': 'a'}))
+        self.assertEqual(rt, [list(range(0, 10)), list(range(10, 20)), list(range(20, 25))])
+        self.assertEqual([i.get('cursor') for i in client.requests], [None, 10, 20])
+        self.assertEqual(client.requests[-1]['screen_name'], 'a')
+
+    def test_max_id(self):
+        client = ClientFake()
+        rt = list(pages(client, 'statuses/user_timeline'))
+        self.assertEqual([i['id'] for page in rt for i in page], list(range(24, -1, -1)))
+        self.assertEqual([i.get('max_id') for i in client.requests], [None, 14, 4, -1])   # stops on an empty page
+        rt = list(pages(ClientFake(), 'search/tweets'))
+        self.assertEqual(rt[1][0], {'id': 14})
+
+    def test_max_pages(self):
+        client = ClientFake()
+        self.assertEqual(len(list(pages(client, 'followers/ids', max_pages=2))), 2)
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(list(pages(client, 'followers/ids', max_pages=0)), [])
+
+    def test_parms_unchanged(self):
+        parms = {'count': 10}
+        list(pages(ClientFake(), 'followers/ids', parms))
+        self.assertEqual(parms, {'count': 10})
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def test_items(self):
+        pages_gen = PagesClosed(pages(ClientFake(items_n=95), 'followers/ids'))
+        self.assertEqual(list(Prefetcher(pages_gen, prefetch=2)), list(range(95)))
+        self.assertTrue(pages_gen.closed.wait(5))
+
+    def test_error(self):
+        pages_gen = PagesClosed(pages(ClientFake(fail_on=3), 'followers/ids'))
+        items = []
+        with self.assertRaises(ValueError):
+            for item in Prefetcher(pages_gen, prefetch=4):
+                items.append(item)
+        self.assertEqual(items, list(range(20)))            # pages before failed one are delivered
+        self.assertTrue(pages_gen.closed.wait(5))
+
+    def test_early_close(self):
+        client = ClientFake(items_n=1000)
+        pages_gen = PagesClosed(pages(client, 'followers/ids'))
+        items = iter(Prefetcher(pages_gen, prefetch=2))
+        self.assertEqual(next(items), 0)
+        items.close()
+        self.assertTrue(pages_gen.closed.wait(5))           # fetching stopped
+        self.assertTrue(len(client.requests) <= 4, len(client.requests))
+
+
+@unittest.skipIf(_IS_PY2, "REST simulator needs python 3")
+class TestIterEp(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from twtPyCurl.twt.simulate_rest import SimulatorRest
+        cls.simulator = SimulatorRest(port=0, options={'rate_limits': False}).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.simulator.stop()
+
+    def client(self):
+        client = ClientTwtRest(Credentials(**CREDENTIALS), url_api=self.simulator.url_api)
+        self.addCleanup(client.handle_close)
+        clones = client.clones = []
+        clone = client.clone
+
+        def clone_recorded():
+            clones.append(clone())
+            return clones[-1]
+        client.clone = clone_recorded
+        return client
+
+    def wait_closed(self, client, timeout=5):
+        t_end = time() + timeout
+        while time() < t_end and not all(i.handle is None for i in client.clones):
+            sleep(0.01)
+        return [i.handle is None for i in client.clones]
+
+    def test_cursor(self):
+        client = self.client()
+        ids = list(client.iter_ep('followers/ids', {'user_id': 1, 'count': 5000}, prefetch=2))
+        self.assertEqual(len(ids), 20000)                   # simulator's cursor_n
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(self.wait_closed(client), [True])
+
+    def test_max_id(self):
+        client = self.client()
+        tweets = list(client.iter_ep('statuses/user_timeline', {'user_id': 1, 'count': 200}, max_pages=3))
+        ids = [i['id'] for i in tweets]
+        self.assertEqual(len(ids), 600)
+        self.assertEqual(ids, sorted(set(ids), reverse=True))
+        self.assertEqual(self.wait_closed(client), [True])
+
+    def test_no_prefetch(self):
+        client = self.client()
+        tweets = list(client.iter_ep('statuses/user_timeline', {'user_id': 1, 'count': 200}, prefetch=0,
+                                     max_pages=2))
+        self.assertEqual((len(tweets), client.clones), (400, []))
+
+    def test_early_close(self):
+        client = self.client()
+        ids = client.iter_ep('followers/ids', {'user_id': 1, 'count': 100}, prefetch=2)
+        self.assertEqual(len([next(ids) for _ in range(150)]), 150)
+        ids.close()
+        self.assertEqual(self.wait_closed(client), [True])
+
+    def test_not_started(self):
+        client = self.client()
+        client.iter_ep('followers/ids', {'user_id': 1})
+        self.assertEqual(client.clones, [])                 # clone is created on first page
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+'''
+tests for frame queue, pipeline and decode pool (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.pipeline -v
+'''
+import json
+import threading
+import unittest
+from time import sleep
+from twtPyCurl.py.pipeline import FrameQueue, Pipeline, DecodePool, Projection, ErrorPipeline
+from twtPyCurl.twt.clients import ClientTwtStream
+
+FRAMES = [json.dumps({'id': i, 'text': 'tweet %d' % i, 'source': 'web'}).encode('utf-8') for i in range(1000)]
+
+
+def project_unpicklable(doc):
+    """a picklable projection whose results can't be pickled"""
+    return threading.Lock() if doc.get('id') == 500 else doc
+
+
+def frames(start, stop):
+    return [str(i).encode('ascii') for i in range(start, stop)]
+
+
+def drain(queue):
+    rt = []
+    while len(queue):
+        rt.extend(queue.get_many(4))
+    return rt
+
+
+class TestFrameQueue(unittest.TestCase):
+
+    def test_fifo(self):
+        queue = FrameQueue(maxsize=10)
+        queue.put_many(frames(0, 5))
+        queue.put(b'5')
+        self.assertEqual(queue.get_many(4), frames(0, 4))
+        metrics = queue.metrics()
+        self.assertEqual((metrics.depth, metrics.depth_max, metrics.puts, metrics.gets), (2, 6, 6, 4))
+        self.assertEqual(queue.get_many(), frames(4, 6))
+        self.assertEqual(queue.get_many(timeout=0.01), [])
+
+    def test_policy_invalid(self):
+        self.assertRaises(ErrorPipeline, FrameQueue, policy='drop')
+
+    def test_drop_newest(self):
+        queue = FrameQueue(maxsize=3, policy='drop_newest')
+        queue.put_many(frames(0, 5))
+        metrics = queue.metrics()
+        self.assertEqual((metrics.depth, metrics.puts, metrics.dropped), (3, 3, 2))
+        self.assertEqual(drain(queue), frames(0, 3))
+
+    def test_drop_oldest(self):
+        queue = FrameQueue(maxsize=3, policy='drop_oldest')
+        queue.put_many(frames(0, 5))
+        metrics = queue.metrics()
+        self.assertEqual((metrics.depth, metrics.puts, metrics.dropped), (3, 5, 2))
+        self.assertEqual(drain(queue), frames(2, 5))
+
+    def test_spill(self):
+        queue = FrameQueue(maxsize=3, policy='spill')
+        queue.put_many(frames(0, 10))
+        metrics = queue.metrics()
+        self.assertEqual((metrics.depth, metrics.depth_spilled, metrics.spilled, metrics.dropped), (10, 7, 7, 0))
+        self.assertEqual(queue.get_many(5), frames(0, 3))
+        queue.put_many(frames(10, 12))                  # spilled behind frames already in spill file
+        self.assertEqual(drain(queue), frames(3, 12))
+        self.assertEqual(queue.metrics().depth_spilled, 0)
+        queue.put_many(frames(12, 14))                  # spill file was emptied, in memory again
+        self.assertEqual((queue.get_many(), queue.metrics().spilled), (frames(12, 14), 9))
+
+    def test_block(self):
+        queue = FrameQueue(maxsize=2, policy='block')
+        queue.put_many(frames(0, 2))
+        putter = threading.Thread(target=queue.put_many, args=(frames(2, 4),))
+        putter.start()
+        sleep(0.1)
+        self.assertTrue(putter.is_alive())
+        self.assertEqual(queue.get_many(1), frames(0, 1))
+        self.assertEqual(queue.get_many(1), frames(1, 2))
+        putter.join(5)
+        self.assertFalse(putter.is_alive())
+        self.assertEqual(drain(queue), frames(2, 4))
+        metrics = queue.metrics()
+        self.assertEqual((metrics.puts, metrics.dropped), (4, 0))
+        self.assertTrue(metrics.blocked_seconds >= 0.1, metrics.blocked_seconds)
+
+    def test_close(self):
+        queue = FrameQueue(maxsize=10)
+        got = []
+        getter = threading.Thread(target=lambda: got.append(queue.get_many()))
+        getter.start()
+        sleep(0.05)
+        queue.close()
+        getter.join(5)
+        self.assertEqual(got, [[]])                     # a waiting getter is released
+        self.assertRaises(ErrorPipeline, queue.put, b'0')
+
+    def test_close_drain(self):
+        queue = FrameQueue(maxsize=2, policy='spill')
+        queue.put_many(frames(0, 5))
+        queue.close()
+        self.assertEqual(drain(queue), frames(0, 5))    # what is left can still be got
+        self.assertEqual(queue.get_many(), [])
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_workers(self):
+        lock = threading.Lock()
+        got = []
+
+        def target(frames):
+            with lock:
+                got.extend(frames)
+        pipeline = Pipeline(workers=3, maxsize=50, batch=7)
+        pipeline.start(target)
+        self.assertEqual(pipeline.metrics().workers, 3)
+        self.assertRaises(ErrorPipeline, pipeline.start, target)
+        for cnt in range(0, 1000, 10):
+            pipeline.put_many(frames(cnt, cnt + 10))
+        pipeline.stop(timeout=10)                       # stops after all queued frames are processed
+        self.assertFalse(pipeline.running)
+        self.assertEqual(sorted(got, key=int), frames(0, 1000))
+        metrics = pipeline.metrics()
+        self.assertEqual((metrics.puts, metrics.gets, metrics.depth, metrics.errors, metrics.workers),
+                         (1000, 1000, 0, 0, 0))
+
+    def test_target_errors(self):
+        got = []
+
+        def target(frames):
+            if b'13' in frames:
+                raise ValueError("bad frame")
+            got.extend(frames)
+        pipeline = Pipeline(workers=1, batch=5)
+        pipeline.start(target)
+        pipeline.put_many(frames(0, 30))
+        pipeline.stop(timeout=10)
+        self.assertEqual(got, frames(0, 10) + frames(15, 30))
+        self.assertEqual(pipeline.metrics().errors, 1)
+
+    def test_restart(self):
+        got = []
+        pipeline = Pipeline()
+        for cnt in range(2):
+            pipeline.start(got.extend)
+            pipeline.put_many(frames(cnt, cnt + 1))
+            pipeline.stop(timeout=10)
+        self.assertEqual(got, frames(0, 2))
+
+    def test_client_counters(self):
+        tweet = FRAMES[0]
+        delete = b'{"delete":{"status":{"id":1,"id_str":"1","user_id":3,"user_id_str":"3"}}}'
+        pipeline = Pipeline(workers=4, batch=1)
+        client = ClientTwtStream(stats_every=0, pipeline=pipeline)
+        client.request_abort_set(None)
+        client._last_req.subdomain = 'stream'
+        client.on_request_start()
+        pipeline.start(client._on_data_each)             # as request_start does, frames handled one by one
+        for cnt in range(2000):
+            pipeline.put_many([tweet, delete, tweet, '{{"limit":{{"track":{:d}}}}}'.format(cnt).encode('ascii')])
+        pipeline.stop(timeout=30)
+        counters = client.counters
+        self.assertEqual((counters.t_data, counters.t_msgs, counters.t_deletes, counters.t_limit),
+                         (4000, 4000, 2000, 1999))
+
+
+class TestDecodePool(unittest.TestCase):
+
+    def run_pool(self, pool, frames=FRAMES):
+        docs = []
+        pool.start(docs.extend)
+        for cnt in range(0, len(frames), 50):
+            pool.put_many(frames[cnt:cnt + 50])
+        pool.stop(timeout=30)
+        return docs
+
+    def test_order(self):
+        pool = DecodePool(processes=2, batch=50)
+        docs = self.run_pool(pool)
+        self.assertEqual([i['id'] for i in docs], list(range(1000)))
+        self.assertEqual((pool.counters.frames, pool.counters.errors), (1000, 0))
+        self.assertFalse(pool.running)
+
+    def test_project(self):
+        docs = self.run_pool(DecodePool(processes=2, batch=50, project=Projection(('id',), marker='source')))
+        self.assertEqual(docs[7], {'id': 7, 'source': 'web'})
+
+    def test_errors(self):
+        pool = DecodePool(processes=1, batch=10)
+        docs = self.run_pool(pool, FRAMES[:5] + [b'{"id": '] + FRAMES[5:10])
+        self.assertEqual((len(docs), pool.counters.errors), (10, 1))
+
+    def test_project_unpicklable(self):
+        self.assertRaises(ErrorPipeline, DecodePool, project=lambda doc: doc)
+
+    def test_unpicklable_doc(self):
+        pool = DecodePool(processes=2, batch=100, project=project_unpicklable)
+        docs = self.run_pool(pool)
+        self.assertFalse(pool._dispatcher.is_alive())
+        self.assertEqual(len(docs), 999)                    # doc with id 500 is left out, others delivered
+        self.assertEqual([i['id'] for i in docs[499:501]], [499, 501])
+        self.assertEqual(pool.counters.errors, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
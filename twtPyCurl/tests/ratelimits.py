@@ -0,0 +1,93 @@
+'''
+tests for rate limit buckets (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.ratelimits -v
+'''
+import unittest
+from time import time
+from twtPyCurl.twt.ratelimits import RateBucket, RateLimits, endpoint_family
+
+KEY = ('u1', '/users/show')
+
+
+def headers(limit, remaining, reset):
+    return {'x-rate-limit-limit': str(limit), 'x-rate-limit-remaining': str(remaining),
+            'x-rate-limit-reset': str(reset)}
+
+
+class TestRateBucket(unittest.TestCase):
+
+    def test_within_limit(self):
+        bucket = RateBucket(3, 3, 1000, window=10)
+        self.assertEqual([bucket.acquire(990) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.remaining, 0)
+
+    def test_exhausted_queues_to_later_windows(self):
+        bucket = RateBucket(3, 0, 1000, window=10)
+        delays = [bucket.acquire(990) for _ in range(7)]
+        self.assertEqual(delays, [11, 11, 11, 21, 21, 21, 31])     # never more than limit per window
+        self.assertEqual(bucket.remaining, -7)
+        self.assertEqual(bucket.reset, 1000)                       # not refilled on a reservation
+
+    def test_new_window_carries_queued(self):
+        bucket = RateBucket(3, -4, 1000, window=10)                # 3 queued to next window and 1 to the one after
+        self.assertEqual(bucket.acquire(1001), 10)                 # queued behind the one left
+        self.assertEqual(bucket.reset, 1010)
+        self.assertEqual(bucket.remaining, -2)
+        bucket = RateBucket(3, 1, 1000, window=10)
+        self.assertEqual(bucket.acquire(1025), 0)                  # idle for two windows
+        self.assertEqual((bucket.reset, bucket.remaining), (1030, 2))
+
+    def test_pace(self):
+        bucket = RateBucket(4, 4, 1000, window=100)
+        delays = [bucket.acquire(960, pace=True) for _ in range(4)]
+        self.assertEqual([round(i, 2) for i in delays], [0, 13.33, 26.67, 40])     # last one at window's reset
+
+
+class TestRateLimits(unittest.TestCase):
+
+    def test_unknown_bucket(self):
+        limits = RateLimits()
+        self.assertEqual(limits.acquire(KEY), 0)
+        self.assertEqual(limits.headroom(KEY), float('inf'))
+
+    def test_update_from_headers(self):
+        limits = RateLimits(window=60)
+        reset = int(time()) + 30
+        self.assertIsNone(limits.update(KEY, {}))
+        limits.update(KEY, headers(10, 5, reset))
+        self.assertEqual(limits.headroom(KEY), 5)
+        limits.acquire(KEY)
+        limits.acquire(KEY)
+        limits.update(KEY, headers(10, 4, reset))                  # a request acquired is still in flight
+        self.assertEqual(limits.headroom(KEY), 3)
+        limits.update(KEY, headers(10, 7, reset - 60))             # late response of previous window
+        self.assertEqual(limits.headroom(KEY), 3)
+        limits.update(KEY, headers(10, 9, reset + 60))             # a new window
+        self.assertEqual(limits.buckets()[KEY], {'limit': 10, 'remaining': 9, 'reset': reset + 60})
+
+    def test_exhausted_delays(self):
+        limits = RateLimits(window=60)
+        reset = int(time()) + 30
+        limits.update(KEY, headers(2, 1, reset))
+        self.assertEqual(limits.acquire(KEY), 0)
+        delays = [limits.acquire(KEY) for _ in range(3)]
+        self.assertTrue(29 < delays[0] <= 31 and 29 < delays[1] <= 31 and 89 < delays[2] <= 91, delays)
+        self.assertEqual(limits.counters.delayed, 3)
+
+    def test_429(self):
+        limits = RateLimits(window=60)
+        reset = int(time()) + 30
+        self.assertEqual(limits.on_429(KEY, {}), 60)
+        self.assertTrue(29 < limits.on_429(KEY, headers(15, 3, reset)) <= 31)
+        self.assertEqual(limits.headroom(KEY), 0)
+        self.assertEqual(limits.counters.http_429, 2)
+        self.assertTrue(29 < limits.acquire(KEY) <= 31)
+
+    def test_endpoint_family(self):
+        self.assertEqual(endpoint_family('https://api.twitter.com/1.1/statuses/show/123.json'), '/statuses/show/:id')
+        self.assertEqual(endpoint_family('http://127.0.0.1:8081/1.1/users/show.json'), '/users/show')
+
+
+if __name__ == "__main__":
+    unittest.main()
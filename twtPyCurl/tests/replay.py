@@ -0,0 +1,186 @@
+'''
+tests for replaying recorded streams through stream clients (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.replay -v
+'''
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from time import time
+from twtPyCurl.py.pipeline import Pipeline, DecodePool
+from twtPyCurl.twt.archive import ArchiveWriter, ArchiveReader
+from twtPyCurl.twt.clients import ClientTwtStream
+from twtPyCurl.twt.samples import snowflake_id, snowflake_timestamp_ms
+from twtPyCurl.twt.replay import Replayer, Chunker, ErrorReplay, frames_source, DISTRIBUTIONS, CHUNK_SIZE_MAX
+
+NOW_MS = int(time() * 1000)
+IDS = [snowflake_id(NOW_MS - 60000 + i * 10, i) for i in range(50)]        # recorded in half a second
+
+
+def tweet(tweet_id):
+    return json.dumps({'id': tweet_id, 'id_str': str(tweet_id), 'text': 'tweet {}'.format(tweet_id),
+                       'source': 'web'}).encode('utf-8')
+
+
+def delete(tweet_id):
+    return json.dumps({'delete': {'status': {'id': tweet_id, 'id_str': str(tweet_id), 'user_id': 1,
+                                             'user_id_str': '1'}}}).encode('utf-8')
+
+
+FRAMES = [tweet(i) for i in IDS[:25]] + [delete(IDS[0]), b'{"limit":{"track":7}}'] + [tweet(i) for i in IDS[25:]]
+DISCONNECT = b'{"disconnect":{"code":12,"stream_name":"test","reason":"replay"}}'
+
+
+class ClientReplayed(ClientTwtStream):
+    """records tweets and messages it gets"""
+    def __init__(self, **kwargs):
+        super(ClientReplayed, self).__init__(stats_every=0, **kwargs)
+        self.tweets = []
+        self.msgs = []
+
+    def on_twitter_data(self, data):
+        self.tweets.append(data['id'])
+
+    def on_twitter_msg(self, msg_type, msg):
+        self.msgs.append(msg_type)
+
+
+class TestChunker(unittest.TestCase):
+
+    def test_distribution(self):
+        self.assertRaises(ErrorReplay, Chunker, 'poisson')
+        self.assertEqual(Chunker('fixed', size=10 ** 6).size, CHUNK_SIZE_MAX)
+
+    def test_reassembly(self):
+        stream = b''.join(i + b'\r\n' for i in FRAMES)
+        for distribution in DISTRIBUTIONS:
+            for size in (1, 7, 100, 4096):
+                chunks = [i[0] for i in Chunker(distribution, size=size, seed=3).chunks(FRAMES)]
+                self.assertEqual(b''.join(chunks), stream, (distribution, size))
+                self.assertTrue(all(0 < len(i) <= CHUNK_SIZE_MAX for i in chunks), (distribution, size))
+                if distribution == 'fixed':
+                    self.assertTrue(all(len(i) == size for i in chunks[:-1]))
+                elif distribution == 'frames':
+                    self.assertEqual(chunks, [i + b'\r\n' for i in FRAMES])
+
+    def test_separator(self):
+        chunks = Chunker('fixed', size=5, separator=b'\n').chunks([b'{}', b'{}'])
+        self.assertEqual(b''.join(i[0] for i in chunks), b'{}\n{}\n')
+
+    def test_seed(self):
+        def sizes(seed):
+            return [len(i[0]) for i in Chunker('lognormal', size=50, seed=seed).chunks(FRAMES)]
+        self.assertEqual(sizes(1), sizes(1))
+        self.assertNotEqual(sizes(1), sizes(2))
+
+    def test_timestamps(self):
+        frames = [tweet(i) for i in IDS]
+        chunks = list(Chunker('frames').chunks(frames, timestamps=True))
+        self.assertEqual([i[1] for i in chunks], [snowflake_timestamp_ms(i) for i in IDS])
+        chunks = list(Chunker('fixed', size=300).chunks(frames, timestamps=True))
+        timestamps = [i[1] for i in chunks]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(timestamps[-1], snowflake_timestamp_ms(IDS[-1]))
+        self.assertEqual(set(i[1] for i in Chunker('fixed', size=300).chunks(frames)), set([None]))
+        chunks = list(Chunker('frames').chunks([b'{"limit":{"track":7}}'] + frames[:1], timestamps=True))
+        self.assertEqual([i[1] for i in chunks], [None, snowflake_timestamp_ms(IDS[0])])  # no id no timestamp
+
+
+class TestFramesSource(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_iterable(self):
+        self.assertIs(frames_source(FRAMES), FRAMES)
+
+    def test_jsonl(self):
+        for name, opener in (('stream.jsonl', open), ('stream.jsonl.gz', gzip.open)):
+            path = os.path.join(self.directory, name)
+            with opener(path, 'wb') as fout:
+                fout.write(b'\n'.join(FRAMES) + b'\n\n')                 # blank lines are skipped
+            self.assertEqual(list(frames_source(path)), FRAMES)
+
+    def test_archive(self):
+        tweets = [tweet(i) for i in IDS]                                # archives are read in time order
+        writer = ArchiveWriter(self.directory, block_frames=10, block_seconds=0.1)
+        writer.put_many(tweets)
+        writer.close()
+        self.assertEqual(list(frames_source(self.directory)), tweets)
+        reader = ArchiveReader(self.directory)
+        self.addCleanup(reader.close)
+        frames = list(frames_source(reader))
+        self.assertEqual(frames, tweets)
+        self.assertTrue(all(isinstance(i, bytes) for i in frames))
+
+
+class TestReplayer(unittest.TestCase):
+
+    def assertReplayed(self, client, report, ordered=True):
+        tweets = client.tweets if ordered else sorted(client.tweets)
+        self.assertEqual(tweets, IDS)
+        self.assertEqual(sorted(client.msgs), ['delete', 'limit'])
+        counters = client.counters
+        self.assertEqual((counters.t_data, counters.t_msgs, counters.t_deletes, counters.t_limit), (50, 2, 1, 7))
+        self.assertEqual((report.frames, report.bytes), (len(FRAMES), sum(len(i) + 2 for i in FRAMES)))
+        self.assertIsNone(report.aborted)
+        for wrapped in ('on_data', 'on_data_batch', 'on_data_decoded_batch'):
+            self.assertNotEqual(getattr(client, wrapped).__name__, 'timed', wrapped)     # timing wrappers removed
+
+    def test_distributions(self):
+        for distribution in DISTRIBUTIONS:
+            client = ClientReplayed()
+            report = Replayer(client, FRAMES, chunker=Chunker(distribution, size=64)).run()
+            self.assertReplayed(client, report)
+            if distribution == 'frames':
+                self.assertEqual(report.chunks, len(FRAMES))
+
+    def test_batch(self):
+        client = ClientReplayed(batch_size=10)
+        self.assertReplayed(client, Replayer(client, FRAMES, chunker=Chunker('uniform', size=100)).run())
+
+    def test_pipeline(self):
+        client = ClientReplayed(pipeline=Pipeline(workers=3, batch=4))
+        report = Replayer(client, FRAMES).run()
+        self.assertReplayed(client, report, ordered=False)
+        self.assertFalse(client.pipeline.running)                       # drained and stopped
+
+    def test_decode_pool(self):
+        client = ClientReplayed(pipeline=DecodePool(processes=2, batch=8))
+        report = Replayer(client, FRAMES).run()
+        self.assertReplayed(client, report)                             # pool delivers in order
+        self.assertTrue(report.seconds_on_data > 0)
+
+    def test_aborted(self):
+        client = ClientReplayed()
+        report = Replayer(client, FRAMES[:10] + [DISCONNECT] + FRAMES[10:], chunker=Chunker('frames')).run()
+        self.assertEqual(client.tweets, IDS[:10])                      # stopped on twitter's disconnect
+        self.assertEqual(report.aborted, (-1, 12, 'replay'))
+        self.assertEqual(report.chunks, 11)
+
+    def test_speed(self):
+        recorded = (IDS[-1] - IDS[0] >> 22) / 1000.0
+        for speed, seconds_min, seconds_max in ((1, recorded * 0.9, recorded + 0.5), (10, 0, recorded * 0.5)):
+            client = ClientReplayed()
+            report = Replayer(client, FRAMES, speed=speed, chunker=Chunker('frames')).run()
+            self.assertReplayed(client, report)
+            self.assertTrue(seconds_min <= report.seconds <= seconds_max, (speed, report.seconds))
+            self.assertTrue(report.seconds_sleep > 0)
+        report = Replayer(ClientReplayed(), FRAMES, chunker=Chunker('frames')).run()
+        self.assertEqual((report.seconds_sleep, report.lag_max), (0, 0))  # as fast as possible
+
+    def test_report(self):
+        client = ClientReplayed()
+        report = Replayer(client, FRAMES).run()
+        for key in ('seconds', 'seconds_write', 'seconds_on_data', 'seconds_framing', 'seconds_source',
+                    'frames_per_sec', 'mb_per_sec'):
+            self.assertTrue(report[key] >= 0, key)
+        self.assertTrue(report.seconds_on_data <= report.seconds_write <= report.seconds)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+'''
+tests for HTTP responses (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.response -v
+'''
+import gzip
+import io
+import json
+import threading
+import unittest
+from twtPyCurl.py.codec import codec_get, codecs_available
+from twtPyCurl.py.requests import Client, Response
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:  # python 3
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+DOC = {'ids': list(range(1000)), 'next_cursor': 0}
+BODY = json.dumps(DOC).encode('utf-8')
+
+
+def response_get(headers, chunks=()):
+    """:returns: a Response that got headers (as curl gives them) and chunks of body"""
+    response = Response()
+    for header in headers:
+        response.write_headers((header + '\r\n').encode('iso-8859-1'))
+    for chunk in chunks:
+        response.write(chunk)
+    return response
+
+
+def gzipped(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as fl:
+        fl.write(data)
+    return buf.getvalue()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """/plain, /gzip (Content-Length of the compressed body), /redirect (to /plain with a body of its own)"""
+
+    def do_GET(self):
+        if self.path == '/redirect':
+            body = b'moved'
+            self.send_response(301)
+            self.send_header('Location', '/plain')
+        elif self.path == '/gzip':
+            body = gzipped(BODY)
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+        else:
+            body = BODY
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestResponse(unittest.TestCase):
+
+    def test_status(self):
+        response = response_get(['HTTP/1.1 404 Not Found', 'Content-Type: application/json', ''])
+        self.assertEqual(response.status_provisional, 404)
+        self.assertEqual(response.headers['content-type'], 'application/json')
+        self.assertEqual(response.headers.status_raw, 'HTTP/1.1 404 Not Found')
+        self.assertIsNone(response_get(['garbage']).status_provisional)
+
+    def test_preallocated(self):
+        response = response_get(['HTTP/1.1 200 OK', 'Content-Length: 10', ''], [b'0123'])
+        buf = response._body
+        self.assertEqual(len(buf), 10)                                  # allocated on first write
+        response.write(b'456789')
+        self.assertIs(response._body, buf)                              # filled in place
+        self.assertEqual(response.data, b'0123456789')
+
+    def test_short(self):
+        response = response_get(['HTTP/1.1 200 OK', 'Content-Length: 10', ''], [b'012', b'3'])
+        self.assertEqual(response.data, b'0123')                        # trimmed to bytes written
+        self.assertEqual(len(response.body), 4)
+
+    def test_long(self):
+        response = response_get(['HTTP/1.1 200 OK', 'Content-Length: 4', ''], [b'012', b'3456', b'789'])
+        self.assertEqual(response.data, b'0123456789')
+
+    def test_no_length(self):
+        response = response_get(['HTTP/1.1 200 OK', ''], [b'01', b'23'])
+        self.assertEqual(len(response._body), 4)
+        response = response_get(['HTTP/1.1 200 OK', 'Content-Length: nan', ''], [b'01', b'23'])
+        self.assertEqual(response.data, b'0123')
+
+    def test_content_encoded(self):
+        for encoding in ('gzip', 'deflate'):                            # decoded body is longer than its length
+            response = response_get(['HTTP/1.1 200 OK', 'Content-Length: 4', 'Content-Encoding: ' + encoding, ''],
+                                    [b'0123', b'456789'])
+            self.assertEqual(len(response._body), 10)
+            self.assertEqual(response.data, b'0123456789')
+        response = response_get(['HTTP/1.1 200 OK', 'Content-Encoding: identity', 'Content-Length: 4', ''],
+                                [b'01'])
+        self.assertEqual(len(response._body), 4)                        # identity is not an encoding
+
+    def test_headers_blocks(self):
+        for first in ('HTTP/1.1 100 Continue', 'HTTP/1.1 301 Moved Permanently\r\nContent-Length: 1000'):
+            response = response_get(first.split('\r\n') + ['', 'HTTP/1.1 200 OK', ''], [b'0123'])
+            self.assertEqual(len(response._body), 4)                    # length of first block was dropped
+            self.assertEqual(response.data, b'0123')
+        response = response_get(['HTTP/1.1 100 Continue', '', 'HTTP/1.1 200 OK', 'Content-Length: 4', ''], [b'01'])
+        self.assertEqual(len(response._body), 4)
+        self.assertEqual(response.status_provisional, 100)
+
+    def test_body_data(self):
+        response = response_get(['HTTP/1.1 200 OK', 'Content-Length: 8', ''], [b'[1,', b'2]'])
+        self.assertIsInstance(response.body, memoryview)
+        self.assertEqual(response.body.tobytes(), b'[1,2]')
+        self.assertIsInstance(response.data, bytes)
+        response.data = [1]
+        self.assertEqual(response.data, [1])                            # set data takes precedence over body
+        self.assertEqual(response.body.tobytes(), b'[1,2]')
+
+    def test_decode(self):
+        for name in codecs_available():
+            response = response_get(['HTTP/1.1 200 OK', 'Content-Length: {}'.format(len(BODY) + 100), ''],
+                                    [BODY[:100], BODY[100:]])
+            self.assertEqual(response.decode(codec_get(name)), DOC, name)
+            self.assertEqual(response.data, DOC, name)
+
+    def test_reset(self):
+        response = response_get(['HTTP/1.1 200 OK', 'Content-Length: 8', ''], [b'[1]'])
+        response.decode(codec_get('json'))
+        response.reset()
+        self.assertEqual((response.data, response.headers_raw, response.status_provisional), (b'', [], None))
+        response.write(b'[2]')
+        self.assertEqual(len(response._body), 3)
+
+
+class TestClient(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        cls.url = 'http://127.0.0.1:{}/{{}}'.format(cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def request(self, path, **kwargs):
+        client = Client(**kwargs)
+        self.addCleanup(client.handle_close)
+        return client.request(self.url.format(path), 'GET')
+
+    def test_plain(self):
+        response = self.request('plain')
+        self.assertEqual((response.status_http, response.data), (200, BODY))
+        self.assertEqual(len(response._body), len(BODY))
+
+    def test_gzip(self):
+        response = self.request('gzip')
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.data, BODY)                           # longer than its Content-Length
+
+    def test_redirect(self):
+        response = self.request('redirect', allow_redirects=True)
+        self.assertEqual((response.status_http, response.data), (200, BODY))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+'''
+tests for concurrent REST requests against the REST simulator (no network or credentials needed, python 3)
+
+to run: python -m twtPyCurl.tests.rest -v
+'''
+import unittest
+from twtPyCurl import _IS_PY2
+from twtPyCurl.py.requests import Credentials
+from twtPyCurl.twt.cache import ResponseCache
+from twtPyCurl.twt.clients import ClientTwtRest, ErrorRqHttpTwt
+
+CREDENTIALS = {'id_appl': 'app', 'id_user': 'u1', 'consumer_key': 'ck', 'consumer_secret': 'cs',
+               'access_token_key': 'tok-1', 'access_token_secret': 'ts'}
+
+
+@unittest.skipIf(_IS_PY2, "REST simulator needs python 3")
+class TestRequestMany(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from twtPyCurl.twt.simulate_rest import SimulatorRest
+        cls.simulator = SimulatorRest(port=0, options={'rate_limits': False, 'latency': 10,
+                                                       'latency_dist': 'uniform'}).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.simulator.stop()
+
+    def client(self, **kwargs):
+        client = ClientTwtRest(Credentials(**CREDENTIALS), url_api=self.simulator.url_api, **kwargs)
+        self.addCleanup(client.handle_close)
+        clones = client.clones = []
+        clone = client.clone
+
+        def clone_recorded():
+            clones.append(clone())
+            return clones[-1]
+        client.clone = clone_recorded
+        return client
+
+    def requests(self, n):
+        return [('users/show', 'GET', {'user_id': 1000 + i}) for i in range(n)]
+
+    def test_ordered(self):
+        client = self.client()
+        results = list(client.request_many(self.requests(30), concurrency=8, ordered=True))
+        self.assertEqual([i[0] for i in results], list(range(30)))
+        self.assertEqual([i[1].data['id'] for i in results], [1000 + i for i in range(30)])
+        self.assertEqual(len(client.clones), 8)
+        self.assertTrue(all(i.handle is None for i in client.clones))      # closed when generator ends
+
+    def test_unordered(self):
+        client = self.client()
+        results = dict(client.request_many(self.requests(20), concurrency=4))
+        self.assertEqual(sorted(results), list(range(20)))
+        self.assertEqual(results[7].data['id'], 1007)
+
+    def test_clones_lazy(self):
+        client = self.client()
+        list(client.request_many(self.requests(2), concurrency=16))
+        self.assertEqual(len(client.clones), 2)
+
+    def test_errors_isolated(self):
+        client = self.client()
+        requests = self.requests(10)
+        requests[3] = ('users/show', 'GET', {'user_id': 1, 'p_error': 1, 'error_status': 404})
+        results = dict(client.request_many(requests, concurrency=4))
+        self.assertIsInstance(results.pop(3), ErrorRqHttpTwt)
+        self.assertEqual(sorted(i.data['id'] for i in results.values()), [1000 + i for i in range(10) if i != 3])
+
+    def test_lazy_consumption(self):
+        consumed = []
+
+        def requests():
+            for request in self.requests(100):
+                consumed.append(request)
+                yield request
+        client = self.client()
+        results = client.request_many(requests(), concurrency=5)
+        next(results)
+        self.assertTrue(len(consumed) <= 6, len(consumed))
+        results.close()                                                     # early close releases clones
+        self.assertTrue(all(i.handle is None for i in client.clones))
+
+    def test_cache(self):
+        cache = ResponseCache()
+        client = self.client(cache=cache)
+        requests = self.requests(10) + [('users/lookup', 'POST', {'user_id': '1,2'})]
+        list(client.request_many(requests, concurrency=4))
+        served = self.simulator.counters.requests
+        results = dict(client.request_many(requests, concurrency=4))
+        self.assertEqual(self.simulator.counters.requests, served + 1)     # only the POST
+        self.assertTrue(all(results[i].cached for i in range(10)))
+        self.assertEqual(results[5].data['id'], 1005)
+        self.assertFalse(results[10].cached)
+        self.assertEqual((cache.counters.hits, len(cache)), (10, 10))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+'''
+tests for connection sharing between clients (no network or credentials needed)
+
+to run: python -m twtPyCurl.tests.share -v
+'''
+import threading
+import unittest
+import pycurl
+from twtPyCurl.py import share as share_module
+from twtPyCurl.py.requests import Client
+from twtPyCurl.py.share import ConnectionShare, share_default
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:  # python 3
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+
+class HandleFake(object):
+    """reports connects as the number of connections a transfer made"""
+    def __init__(self, connects):
+        self.connects = connects
+
+    def getinfo(self, info):
+        assert info == pycurl.NUM_CONNECTS
+        return self.connects
+
+
+class Handler(BaseHTTPRequestHandler):
+    """keeps connections alive"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = b'{"ok":true}'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        self.share = ConnectionShare()
+        self.addCleanup(self.share.close)
+
+    def test_stats(self):
+        self.assertEqual(self.share.stats(), {})
+        for connects in (1, 0, 0, 0):
+            self.share.stats_update('https://api.twitter.com/1.1/users/show.json?user_id=1', HandleFake(connects))
+        self.share.stats_update('https://stream.twitter.com/1.1/statuses/sample.json', HandleFake(1))
+        stats = self.share.stats()
+        self.assertEqual(stats, {'api.twitter.com': {'requests': 4, 'connects': 1, 'reuse_ratio': 0.75},
+                                 'stream.twitter.com': {'requests': 1, 'connects': 1, 'reuse_ratio': 0.0}})
+        self.assertEqual(stats['api.twitter.com'].reuse_ratio, 0.75)
+
+    def test_stats_copy(self):
+        self.share.stats_update('http://h/a', HandleFake(1))
+        stats = self.share.stats()
+        stats['h'].requests = 100
+        self.assertEqual(self.share.stats()['h'].requests, 1)          # a snapshot not internal state
+
+    def test_reuse_ratio_clamped(self):
+        self.share.stats_update('http://h/a', HandleFake(2))            # i.e. a retry after a redirect
+        self.assertEqual(self.share.stats()['h'].reuse_ratio, 0)
+
+    def test_stats_reset(self):
+        self.share.stats_update('http://h/a', HandleFake(1))
+        self.share.stats_reset()
+        self.assertEqual(self.share.stats(), {})
+        self.share.stats_update('http://h/a', HandleFake(0))
+        self.assertEqual(self.share.stats()['h'].requests, 1)
+
+    def test_threads(self):
+        def update():
+            for _ in range(1000):
+                self.share.stats_update('http://h/a', HandleFake(1))
+        threads = [threading.Thread(target=update) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.share.stats()['h'], {'requests': 4000, 'connects': 4000, 'reuse_ratio': 0})
+
+    def test_shared(self):
+        self.assertEqual(self.share.shared[:2], ['dns', 'ssl_session'])
+        self.assertEqual(ConnectionShare(dns=False, ssl_session=False, connections=False).shared, [])
+
+
+class TestShareDefault(unittest.TestCase):
+
+    def test_process_wide(self):
+        rt = []
+        threads = [threading.Thread(target=lambda: rt.append(share_default())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(i is share_default() for i in rt))
+        self.assertEqual(len(share_module._SHARE_DEFAULT), 1)
+
+    def test_clients(self):
+        clients = [Client(share=True), Client(share=True)]
+        self.assertIs(clients[0].share, share_default())
+        self.assertIs(clients[0].share, clients[1].share)
+        self.assertIsNone(Client().share)
+
+
+class TestClients(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        cls.url = 'http://127.0.0.1:{}/1.1/test.json'.format(cls.server.server_address[1])
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.connections = set()
+        self.share = ConnectionShare()
+        self.addCleanup(self.share.close)                              # after clients handles are closed
+
+    def client(self):
+        client = Client(share=self.share)
+        self.addCleanup(client.handle_close)
+        return client
+
+    def test_stats(self):
+        client = self.client()
+        for _ in range(3):
+            self.assertEqual(client.request(self.url, 'GET').status_http, 200)
+        host = '127.0.0.1:{}'.format(self.server.server_address[1])
+        self.assertEqual(self.share.stats(), {host: {'requests': 3, 'connects': 1, 'reuse_ratio': 0.667}})
+
+    def test_connections_shared(self):
+        if 'connections' not in self.share.shared:
+            self.skipTest("connection cache sharing not supported by libcurl")
+        clients = [self.client() for _ in range(3)]
+        for client in clients:
+            client.request(self.url, 'GET')
+        self.assertEqual(len(self.server.connections), 1)              # clients reused the first connection
+        self.assertEqual(list(self.share.stats().values())[0].connects, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
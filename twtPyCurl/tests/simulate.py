@@ -0,0 +1,201 @@
+'''
+tests for stream clients against the stream simulator (no network or credentials needed, python 3.6+ only)
+
+to run: python -m twtPyCurl.tests.simulate -v
+'''
+import zlib
+import unittest
+from twtPyCurl.py.requests import ErrorRqHttp
+from twtPyCurl.twt.clients import ClientTwtStream, ErrorTwtStreamDisconnectReq
+from twtPyCurl.twt.simulate import Simulator, Corpus, ChunkedWriter
+
+
+class ClientStreamSim(ClientTwtStream):
+    """requests stream end points from the stream simulator, records tweets, messages and attempts,
+    stops after stop_after tweets if set"""
+    url_api = None
+    stop_after = None
+
+    def __init__(self, **kwargs):
+        super(ClientStreamSim, self).__init__(stats_every=0, **kwargs)
+        self.tweets = []
+        self.msgs = []
+        self.attempts = 0
+
+    def request_ep_prepare(self, end_point, test_server=False, parms={}):
+        super(ClientStreamSim, self).request_ep_prepare(end_point, test_server, parms)
+        return self.url_api.format(end_point.split('/', 1)[1])
+
+    def _before_perform(self):
+        self._last_req.subdomain = 'stream'
+        self.attempts += 1
+        super(ClientStreamSim, self)._before_perform()
+
+    def on_twitter_data(self, data):
+        self.tweets.append(data['id'])
+        if len(self.tweets) == self.stop_after:
+            self.request_abort_set(1001, 'enough')
+
+    def on_twitter_msg(self, msg_type, msg):
+        self.msgs.append(msg)
+
+    def wait_on_nw_error(self, current_try):
+        return self.wait_seconds(current_try, 0.01, 0.1, backoff_fun=self.backoff)
+
+    def wait_on_http_error(self, current_try):
+        return self.wait_seconds(current_try, 0.01, 0.1, backoff_fun=self.backoff)
+
+
+class WriterFake(object):
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    def writelines(self, lines):
+        for line in lines:
+            self.data += line
+
+
+def unchunked(data):
+    """:returns: a list of chunks of a chunked transfer encoded body"""
+    rt = []
+    while True:
+        head, data = data.split(b'\r\n', 1)
+        size = int(head, 16)
+        if size == 0:
+            return rt
+        rt.append(bytes(data[:size]))
+        data = data[size + 2:]
+
+
+class TestChunkedWriter(unittest.TestCase):
+    pieces = [b'{"a":1}\r\n', b'{"b":2}\r\n', b'{"c":3}\r\n']
+
+    def write(self, **kwargs):
+        writer = WriterFake()
+        body = ChunkedWriter(writer, **kwargs)
+        self.assertEqual(body.write(self.pieces), 27)
+        body.write(self.pieces)
+        body.close()
+        return unchunked(writer.data)
+
+    def test_plain(self):
+        self.assertEqual(self.write(), [b''.join(self.pieces)] * 2)
+
+    def test_chunk(self):
+        chunks = self.write(chunk=10)
+        self.assertEqual(b''.join(chunks), b''.join(self.pieces) * 2)
+        self.assertEqual([len(i) for i in chunks], [10] * 5 + [4])
+
+    def test_split(self):
+        chunks = self.write(split=True, seed=1)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), b''.join(self.pieces) * 2)
+
+    def test_gzip(self):
+        chunks = self.write(gzip=True)
+        self.assertEqual(zlib.decompress(b''.join(chunks), 31), b''.join(self.pieces) * 2)
+        decompressor = zlib.decompressobj(31)                   # each write is flushed to be decoded at once
+        self.assertEqual(decompressor.decompress(chunks[0]), b''.join(self.pieces))
+
+    def test_length_prefixed(self):
+        self.assertEqual(Corpus.length_prefixed(b'{"a":1}'), b'9\r\n{"a":1}\r\n')
+        self.assertEqual(Corpus.encode({'a': 1}, delimited=True), b'9\r\n{"a":1}\r\n')
+
+
+class TestSimulator(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.simulator = Simulator(port=0, corpus=Corpus(1000, synthetic_n=1000)).start()
+        cls.url_api = 'http://127.0.0.1:{}/1.1/{{}}.json'.format(cls.simulator.port)
+        cls.ids = cls.request(max_n=1000).tweets            # corpus order
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.simulator.stop()
+
+    @classmethod
+    def request(cls, end_point='stream/statuses/sample', method='GET', stop_after=None, **parms):
+        client = ClientStreamSim()
+        client.url_api = cls.url_api
+        client.stop_after = stop_after
+        try:
+            client.request_ep(end_point, method, **parms)
+        finally:
+            client.handle_close()
+        return client
+
+    def test_sample(self):
+        client = self.request(max_n=300)
+        self.assertEqual(client.tweets, self.ids[:300])
+        self.assertEqual(client.counters.t_data, 300)
+        self.assertEqual(client.response.status_http, 200)
+
+    def test_delimited_length(self):
+        client = self.request(max_n=1500, delimited='length')
+        self.assertEqual(client.framer.__class__.__name__, 'FramerLength')
+        self.assertEqual(client.tweets, self.ids + self.ids[:500])  # stream wraps around corpus
+
+    def test_filter(self):
+        self.assertEqual(self.request('stream/statuses/filter', 'POST', track='a', max_n=10).tweets, self.ids[:10])
+
+    def test_split(self):
+        for parms in ({'split': 1, 'messages': 3}, {'split': 1, 'chunk': 700}, {'chunk': 7},
+                      {'split': 1, 'messages': 5, 'delimited': 'length'}):
+            client = self.request(max_n=500, **parms)
+            self.assertEqual(client.tweets, self.ids[:500], parms)
+
+    def test_gzip(self):
+        client = self.request(max_n=500, messages=10)
+        self.assertEqual(client.response.headers.get('content-encoding'), 'gzip')
+        self.assertEqual(client.tweets, self.ids[:500])
+        client = self.request(max_n=500, gzip=0)
+        self.assertIsNone(client.response.headers.get('content-encoding'))
+        client = self.request(max_n=500, split=1, chunk=300, delimited='length')
+        self.assertEqual(client.tweets, self.ids[:500])             # gzip members span chunks
+
+    def test_limit_every(self):
+        client = self.request(max_n=500, limit_every=100, messages=7)
+        self.assertEqual(len(client.tweets), 500)
+        self.assertEqual((client.counters.t_msgs, client.counters.t_limit), (5, 5))
+
+    def test_keep_alive(self):
+        client = self.request(max_n=200, rate=1000, keep_alive=0.05)
+        self.assertEqual(client.tweets, self.ids[:200])            # blank lines are skipped
+
+    def test_disconnect(self):
+        with self.assertRaises(ErrorTwtStreamDisconnectReq) as cm:  # duplicate stream is not retried
+            self.request(disconnect_after=50, disconnect_code=2)
+        self.assertEqual(cm.exception.args[0], 2)
+
+    def test_disconnect_reconnect(self):
+        client = ClientStreamSim()
+        client.url_api = self.url_api
+        client.stop_after = 250
+        self.addCleanup(client.handle_close)
+        client.request_ep('stream/statuses/sample', 'GET', disconnect_after=100, disconnect_code=12)
+        self.assertEqual(client.tweets, (self.ids[:100] * 3)[:250])  # reconnected after twitter's disconnects
+        self.assertEqual(client.attempts, 3)
+        self.assertEqual([i['disconnect']['code'] for i in client.msgs], [12, 12])
+
+    def test_420(self):
+        with self.assertRaises(ErrorRqHttp) as cm:
+            self.request(error_every=1, error_status=420)
+        self.assertEqual(cm.exception.args[0], 420)
+
+    def test_5xx(self):
+        self.simulator.counters.requests_error = 0                  # every 3rd request gets a stream
+        client = self.request('stream/statuses/error', err_code=503, max_n=100)
+        self.assertEqual((client.attempts, client.tweets), (3, self.ids[:100]))
+
+    def test_5xx_exhausted(self):
+        with self.assertRaises(ErrorRqHttp) as cm:
+            self.request(error_every=1, error_status=500)
+        self.assertEqual(cm.exception.args[0], 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+'''
+:module: aio
+
+asyncio twitter clients (python 3.6+ only) see :mod:`~.py.aio`
+
+:Usage:
+    >>> from twtPyCurl.twt.aio import ClientTwtRestAio, ClientTwtStreamAio
+    >>> async def main():
+    ...     rest = ClientTwtRestAio(credentials)
+    ...     response = await rest.request_ep('users/show', parms={'screen_name': 'twitter'})
+    ...     users = await asyncio.gather(*[rest.get_user(i) for i in user_ids])    # batched lookups
+    ...     stream = ClientTwtStreamAio(credentials)
+    ...     async for tweet in stream.iter_ep('stream/statuses/filter', 'POST', track='news'):
+    ...         print(tweet['text'])
+'''
+import asyncio
+from twtPyCurl.py.requests import pycurl
+from twtPyCurl.py.aio import AioMixin
+from twtPyCurl.twt.clients import ClientTwtRest, ClientTwtStream
+
+_END = object()     # end of stream marker
+
+
+class ClientTwtRestAio(AioMixin, ClientTwtRest):
+    """asyncio :class:`~.ClientTwtRest`, request_ep returns an awaitable"""
+
+    async def request_ep(self, end_point, method='GET', parms={}, multipart=False):
+        """coroutine counterpart of :func:`~.ClientTwtRest.request_ep`"""
+        if end_point == "statuses/update":
+            parms = await self._request_ep_media_aio(parms)
+        return await self.request(self.request_ep_url(end_point), method, parms, multipart)
+
+    async def _request_ep_media_aio(self, parms_dict):
+        """see :func:`~.ClientTwtRest._request_ep_media`"""
+        media_parm_key = [i for i in ['media', 'media_data'] if i in parms_dict]
+        if media_parm_key:
+            media_parm_key = media_parm_key[0]
+            parms_dict = dict(parms_dict)
+            media = parms_dict.pop(media_parm_key)
+            if not isinstance(media, (list, tuple)):
+                media = [media]
+            media_ids = []
+            for m in media:
+                rt = await self.request_ep("media/upload", "POST", parms={media_parm_key: m}, multipart=True)
+                media_ids.append(rt.data['media_id_string'])
+            parms_dict['media_ids'] = ",".join(media_ids)
+        return parms_dict
+
+    async def lookup_aio(self, end_point, object_id):
+        """awaitable counterpart of :func:`~.ClientTwtRest.lookup` returns the object or None"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def on_done(lookup_future):      # called from batcher's thread
+            loop.call_soon_threadsafe(_future_copy, lookup_future, future)
+        self.lookup(end_point, object_id).add_done_callback(on_done)
+        return await future
+
+    async def get_user(self, user_id):
+        return await self.lookup_aio('users/lookup', user_id)
+
+    async def get_status(self, status_id):
+        return await self.lookup_aio('statuses/lookup', status_id)
+
+    async def get_friendship(self, user_id):
+        return await self.lookup_aio('friendships/lookup', user_id)
+
+
+def _future_copy(lookup_future, future):
+    if not future.cancelled():
+        if lookup_future.exception() is not None:
+            future.set_exception(lookup_future.exception())
+        else:
+            future.set_result(lookup_future.result())
+
+
+class ClientTwtStreamAio(AioMixin, ClientTwtStream):
+    """asyncio :class:`~.ClientTwtStream`
+
+    :param int queue_max: maximum number of tweets buffered by :func:`iter_ep` before pausing
+        the connection until consumer catches up (defaults to 10000), low speed limits (see
+        :func:`~.Client.curl_low_speed`) are lifted while paused so a slow consumer doesn't time the connection out
+    """
+    def __init__(self, credentials=None, queue_max=10000, **kwargs):
+        self.queue_max = queue_max
+        self._queue = None
+        self._paused = False
+        self._low_speed = None      # low speed limits lifted while paused
+        super(ClientTwtStreamAio, self).__init__(credentials, **kwargs)
+
+    def request_ep(self, end_point, method, test_server=False, **kwargs):
+        """coroutine (returns an awaitable) counterpart of :func:`~.ClientTwtStream.request_ep`
+        tweets are delivered to on_twitter_data as usual
+        """
+        url = self.request_ep_prepare(end_point, test_server, kwargs)
+        return self.request(url, method, kwargs)
+
+    async def iter_ep(self, end_point, method='GET', test_server=False, **kwargs):
+        """an asynchronous iterator over tweets of a stream end point, arguments as in :func:`request_ep`
+        messages are handled by on_twitter_msg as usual
+
+        :Raises:  request errors after all tweets received have been consumed
+        """
+        self._queue = queue = asyncio.Queue()
+        task = asyncio.ensure_future(self.request_ep(end_point, method, test_server, **kwargs))
+        task.add_done_callback(lambda t: queue.put_nowait(_END))
+        try:
+            while True:
+                if self._paused and queue.qsize() < self.queue_max // 2:
+                    self._resume()
+                tweet = await queue.get()
+                if tweet is _END:
+                    task.result()               # raises task's exception if any
+                    return
+                yield tweet
+        finally:
+            self._queue = None
+            if self._paused:
+                self._resume()
+            if not task.done():
+                task.cancel()
+
+    def on_twitter_data(self, data):
+        if self._queue is not None:
+            self._queue.put_nowait(data)
+            if self._queue.qsize() >= self.queue_max and not self._paused:
+                self._pause()                       # consumer is slow stop receiving
+
+    def _pause(self):
+        self._paused = True
+        self.handle.pause(pycurl.PAUSE_RECV)
+        asyncio.get_event_loop().call_soon(self._low_speed_lift)   # options can't be set from a curl callback
+
+    def _low_speed_lift(self):
+        if self._paused and self._low_speed is None and self.handle is not None:
+            self._low_speed = self.curl_low_speed
+            self.curl_low_speed = (self._low_speed[0], 0)      # 0 seconds disables low speed check
+
+    def _resume(self):
+        self._paused = False
+        if self._low_speed is not None:
+            self.curl_low_speed, self._low_speed = self._low_speed, None
+        if self.handle is not None:
+            self.handle.pause(pycurl.PAUSE_CONT)
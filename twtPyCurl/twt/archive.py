@@ -0,0 +1,484 @@
+'''
+:module: archive
+
+records stream data packets (raw frames) to disk without blocking the connection:
+curl thread only puts frames in a :class:`~.FrameQueue`, a background thread writes them in blocks to
+size or time rotated segment files and keeps an index of every frame, written as a sidecar file
+when a segment is closed so archives are seekable, :class:`ArchiveReader` memory maps segments and indexes
+and finds frames by binary search on the index touching only the relevant bytes
+
+segment files:
+    - compressed (.gz): a sequence of gzip members one per block (a valid multi member gzip file
+      i.e. zcat works), a block is its frames each followed by "\\r\\n"
+    - raw (.raw): frames each followed by "\\r\\n"
+
+index files (segment file name + '.idx', written as '.idx.tmp' and renamed when complete): :data:`INDEX_MAGIC`
+followed by :data:`INDEX_RECORD` records (id, timestamp_ms, block offset, block size, offset in block, frame size,
+kind) sorted by timestamp and id
+where id is tweet's id (of the deleted tweet for a delete notice, 0 if frame is not a tweet or delete
+i.e. a limit message), kind one of :data:`KIND_OTHER` :data:`KIND_TWEET` :data:`KIND_DELETE`,
+timestamp is derived from id (twitter's `snowflake <https://github.com/twitter/snowflake>`_ ids are time ordered)
+or is the time frame was received if id is 0. For raw segments block offset is frame's offset and block size 0.
+Since delete notices are indexed by the time of the deleted tweet segments overlap in time, the reader merges them.
+
+:Usage:
+    >>> from twtPyCurl.twt.archive import ArchiveWriter
+    >>> archive = ArchiveWriter('/data/sample', segment_bytes=2 ** 28, fsync='segment')
+    >>> client = ClientTwtStream(credentials, sink=archive)
+    >>> client.stream.statuses.sample()
+    >>> archive.metrics()
+    {'frames': 1250000, 'bytes_in': 3271458000, 'bytes_out': 512030114, 'segments': 12, 'bytes_per_sec': 5120431.1,
+     'flush_seconds_last': 0.004, 'flush_seconds_max': 0.091, 'depth': 210, ...}
+    >>> archive.close()
+
+    >>> from twtPyCurl.twt.archive import ArchiveReader
+    >>> reader = ArchiveReader('/data/sample')
+    >>> for tweet in reader.time_range(calendar.timegm((2016, 3, 1, 14, 0, 0)), calendar.timegm((2016, 3, 1, 14, 5, 0)),
+    ...                                decode=True):
+    ...     pass
+    >>> reader.get(704364154880229376)          # raw frame (a memoryview) or None
+    <memory at 0x7f0b5c1a7e88>
+'''
+import os
+import re
+import zlib
+import mmap
+import glob
+import heapq
+import struct
+import logging
+import threading
+from time import time, strftime, gmtime
+from collections import OrderedDict
+from twtPyCurl import _IS_PY2
+from twtPyCurl.py.utilities import DotDot
+from twtPyCurl.py.pipeline import FrameQueue
+from twtPyCurl.py.codec import codec_get
+from twtPyCurl.twt.samples import snowflake_timestamp_ms
+
+LOG = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'TWTIDX02'
+INDEX_RECORD = struct.Struct('<QQQIIIB')
+# id, timestamp_ms, block offset, block size (0 for raw segments), offset of frame in block, frame size, kind
+KIND_OTHER, KIND_TWEET, KIND_DELETE = 0, 1, 2
+MSG_PREFIXES = tuple([b'{"' + i + b'"' for i in (b'delete', b'scrub_geo', b'status_withheld', b'user_withheld',
+                                                   b'limit', b'disconnect', b'warning')])
+# leading keys of twitter messages (some of them include a status id)
+FRAME_SEPARATOR = b'\r\n'
+FSYNC_POLICIES = ('never', 'block', 'segment')     # or a number of seconds between fsyncs
+RE_ID = re.compile(br'"id":\s*(\d+)')     # first id in a tweet or delete message is status' id
+ID_SCAN_MAX = 256                         # bytes of a frame to scan for an id
+
+
+class ErrorArchive(Exception):
+    """Exceptions base"""
+
+
+def frame_id(frame):
+    """:returns: tweet id of a raw frame or 0 if frame is not a tweet or a delete message"""
+    m = RE_ID.search(frame, 0, ID_SCAN_MAX)
+    return int(m.group(1)) if m else 0
+
+
+def frame_kind(frame, tweet_id):
+    """:returns: kind of a raw frame with tweet_id (see :func:`frame_id`) for the index"""
+    if not tweet_id:
+        return KIND_OTHER
+    if frame.startswith(MSG_PREFIXES[0]):
+        return KIND_DELETE
+    return KIND_OTHER if frame.startswith(MSG_PREFIXES) else KIND_TWEET
+
+
+class ArchiveWriter(object):
+    """a stream sink (see :class:`~.ClientStream` sink argument) that writes frames to rotated segments
+
+    :param str directory: where to write segments (created if needed)
+    :param str prefix: prefix of segment file names
+    :param bool compress: True for gzip segments else raw ones
+    :param int compress_level: zlib compression level
+    :param int segment_bytes: rotate segment after that many bytes written
+    :param float segment_seconds: rotate segment after that many seconds (0 or None disables)
+    :param int block_frames: maximum frames in a block (a gzip member)
+    :param float block_seconds: maximum seconds frames wait in queue before they are written
+    :param fsync: one of :data:`FSYNC_POLICIES` or seconds between fsyncs
+    :param int maxsize: see :class:`~.FrameQueue`
+    :param str policy: see :class:`~.FrameQueue`, defaults to 'spill' so a slow disk never stalls curl's thread
+        ('block' would stall the connection, twitter disconnects stalled consumers)
+    :param str spill_dir: see :class:`~.FrameQueue`
+    """
+    def __init__(self, directory, prefix='stream', compress=True, compress_level=6, segment_bytes=2 ** 28,
+                 segment_seconds=3600, block_frames=1000, block_seconds=1.0, fsync='segment',
+                 maxsize=100000, policy='spill', spill_dir=None):
+        if fsync not in FSYNC_POLICIES and not isinstance(fsync, (int, float)):
+            raise ErrorArchive("fsync must be one of {} or seconds".format(", ".join(FSYNC_POLICIES)))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.prefix = prefix
+        self.compress = compress
+        self.compress_level = compress_level
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.block_frames = block_frames
+        self.block_seconds = block_seconds
+        self.fsync = fsync
+        self.queue = FrameQueue(maxsize, policy, spill_dir)
+        self._file = None
+        self._path = None
+        self._seq = 0
+        self._index = []            # index records of current segment
+        self._opened = 0            # time current segment was opened
+        self._fsynced = 0           # time of last fsync
+        self._rotate = False        # rotate asked
+        self.segments = []          # paths of closed segments
+        self.counters = DotDot({'frames': 0, 'bytes_in': 0, 'bytes_out': 0, 'blocks': 0, 'segments': 0,
+                                'fsyncs': 0, 'errors': 0, 'flush_seconds_last': 0.0, 'flush_seconds_max': 0.0,
+                                'flush_seconds_total': 0.0})
+        self._started = time()
+        self._thread = threading.Thread(target=self._run, name="ArchiveWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put_many(self, frames):
+        """queues frames to be written (called by curl thread)"""
+        self.queue.put_many(frames)
+
+    def put(self, frame):
+        self.queue.put_many((frame,))
+
+    def _run(self):
+        queue = self.queue
+        while True:
+            frames = queue.get_many(self.block_frames, self.block_seconds)
+            if self._rotate:
+                self._rotate = False
+                self._segment_close()
+            if frames:
+                try:
+                    self._write_block(frames)
+                except Exception:
+                    self.counters.errors += 1
+                    LOG.exception("archive write failed")
+            elif self._file is not None and self.segment_seconds and time() - self._opened >= self.segment_seconds:
+                self._segment_close()
+            if queue.closed and not len(queue):
+                break
+        self._segment_close()
+
+    def _segment_open(self):
+        now = time()
+        self._seq += 1
+        name = "{}-{}-{:04d}.{}".format(self.prefix, strftime("%Y%m%dT%H%M%S", gmtime(now)), self._seq,
+                                         'gz' if self.compress else 'raw')
+        self._path = os.path.join(self.directory, name)
+        self._file = open(self._path, 'wb')
+        self._opened = self._fsynced = now
+        self._index = []
+
+    def _segment_close(self):
+        if self._file is None:
+            return
+        self._index.sort()      # records are (timestamp, id, ...) while writing so they are sorted by time
+        self._do_fsync(self._file, self.fsync != 'never')
+        self._file.close()
+        self._file = None
+        path_tmp = self._path + '.idx.tmp'     # renamed when complete so readers never map a partial index
+        with open(path_tmp, 'wb') as fout:
+            fout.write(INDEX_MAGIC)
+            pack = INDEX_RECORD.pack
+            fout.write(b''.join([pack(rec[1], rec[0], *rec[2:]) for rec in self._index]))
+            self._do_fsync(fout, self.fsync != 'never')
+        os.rename(path_tmp, self._path + '.idx')
+        self.segments.append(self._path)
+        self.counters.segments += 1
+        self._index = []
+
+    def _do_fsync(self, fobj, condition=True):
+        fobj.flush()
+        if condition:
+            os.fsync(fobj.fileno())
+            self.counters.fsyncs += 1
+            self._fsynced = time()
+
+    def _write_block(self, frames):
+        dt_start = time()
+        if self._file is not None and ((self._file.tell() >= self.segment_bytes) or
+                                       (self.segment_seconds and dt_start - self._opened >= self.segment_seconds)):
+            self._segment_close()
+        if self._file is None:
+            self._segment_open()
+        offset = self._file.tell()
+        now_ms = int(dt_start * 1000)
+        records = []
+        pos = 0
+        for frame in frames:
+            tweet_id = frame_id(frame)
+            records.append((snowflake_timestamp_ms(tweet_id) if tweet_id else now_ms, tweet_id,
+                            offset, 0, pos, len(frame), frame_kind(frame, tweet_id)))
+            pos += len(frame) + 2
+        block = FRAME_SEPARATOR.join(frames) + FRAME_SEPARATOR
+        if self.compress:
+            compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, 31)     # 31: a gzip member
+            data = compressor.compress(block) + compressor.flush()
+            records = [rec[:3] + (len(data),) + rec[4:] for rec in records]
+        else:
+            data = block
+            records = [rec[:2] + (offset + rec[4], 0, 0) + rec[5:] for rec in records]
+        self._file.write(data)
+        self._index.extend(records)
+        if self.fsync == 'block':
+            self._do_fsync(self._file)
+        elif self.fsync not in FSYNC_POLICIES and dt_start - self._fsynced >= self.fsync:
+            self._do_fsync(self._file)
+        else:
+            self._file.flush()
+        cnt = self.counters
+        cnt.frames += len(frames)
+        cnt.bytes_in += len(block)
+        cnt.bytes_out += len(data)
+        cnt.blocks += 1
+        cnt.flush_seconds_last = time() - dt_start
+        cnt.flush_seconds_total += cnt.flush_seconds_last
+        if cnt.flush_seconds_last > cnt.flush_seconds_max:
+            cnt.flush_seconds_max = cnt.flush_seconds_last
+
+    def rotate(self):
+        """closes current segment (next block opens a new one) thread safe"""
+        self._rotate = True
+        self.queue.put_many(())     # wakes up writer
+
+    def metrics(self):
+        """:returns: a dictionary with counters, throughput, average flush latency and queue depth"""
+        rt = DotDot(self.counters)
+        elapsed = time() - self._started
+        rt.bytes_per_sec = rt.bytes_in / elapsed if elapsed else 0
+        rt.flush_seconds_avg = rt.flush_seconds_total / rt.blocks if rt.blocks else 0
+        queue_metrics = self.queue.metrics()
+        rt.depth = queue_metrics.depth
+        rt.dropped = queue_metrics.dropped
+        rt.blocked_seconds = queue_metrics.blocked_seconds
+        return rt
+
+    def close(self, timeout=None):
+        """writes queued frames, closes current segment and stops writer thread"""
+        self.queue.close()
+        self._thread.join(timeout)
+
+
+class ArchiveSegment(object):
+    """a segment file and its index both memory mapped
+
+    :param str path: segment's path (its index is path + '.idx')
+    :param int blocks_cached: decompressed blocks kept (least recently used are discarded), records of a time range
+        alternate between blocks when it includes delete notices (archived later than their tweets)
+    """
+    def __init__(self, path, blocks_cached=8):
+        self.path = path
+        self.compressed = path.endswith('.gz')
+        self._files = [open(path, 'rb'), open(path + '.idx', 'rb')]
+        self.data, self.index = [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) for f in self._files]
+        self._view = None
+        self._block = (None, None)      # (offset, decompressed data) of last block read
+        self._blocks = OrderedDict()    # {offset: decompressed data} least recently used first
+        self.blocks_cached = blocks_cached
+        if self.index[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.close()
+            raise ErrorArchive("{} is not an archive index (or of an other version)".format(path + '.idx'))
+        self._view = None if _IS_PY2 else memoryview(self.data)    # python 2 mmap has no memoryview
+        self.counters = DotDot({'blocks_read': 0, 'bytes_read': 0})
+
+    def __len__(self):
+        """:returns: number of frames"""
+        return (len(self.index) - len(INDEX_MAGIC)) // INDEX_RECORD.size
+
+    def record(self, n):
+        """:returns: n'th index record
+        (id, timestamp_ms, block offset, block size, offset in block, frame size, kind)
+        """
+        return INDEX_RECORD.unpack_from(self.index, len(INDEX_MAGIC) + n * INDEX_RECORD.size)
+
+    @property
+    def timestamp_first(self):
+        return self.record(0)[1]
+
+    @property
+    def timestamp_last(self):
+        return self.record(len(self) - 1)[1]
+
+    def bisect(self, timestamp_ms, tweet_id=0):
+        """:returns: position of first record >= (timestamp_ms, tweet_id)"""
+        lo, hi = 0, len(self)
+        key = (timestamp_ms, tweet_id)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            rec = self.record(mid)
+            if (rec[1], rec[0]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def frame(self, record):
+        """:returns: raw frame of an index record, a memoryview (zero copy) for raw segments in python 3"""
+        tweet_id, timestamp_ms, offset, size, pos, length, kind = record
+        if not self.compressed:
+            self.counters.bytes_read += length
+            return self.data[offset:offset + length] if self._view is None else self._view[offset:offset + length]
+        if self._block[0] != offset:        # most frames of a range are in consecutive records of same block
+            self._block = (offset, self._block_get(offset, size))
+        return memoryview(self._block[1])[pos:pos + length] if self._view is not None else \
+            self._block[1][pos:pos + length]
+
+    def _block_get(self, offset, size):
+        blocks = self._blocks
+        block = blocks.pop(offset, None)
+        if block is None:
+            block = zlib.decompress(self.data[offset:offset + size], 31)
+            self.counters.blocks_read += 1
+            self.counters.bytes_read += size
+            if len(blocks) >= self.blocks_cached:
+                blocks.popitem(last=False)
+        blocks[offset] = block
+        return block
+
+    def records(self, start=0, stop=None, tweets_only=False):
+        """yields index records start to stop (only of tweets if tweets_only)"""
+        for n in range(start, len(self) if stop is None else stop):
+            rec = self.record(n)
+            if not tweets_only or rec[6] == KIND_TWEET:
+                yield rec
+
+    def frames(self, start=0, stop=None, tweets_only=False):
+        """yields raw frames of records start to stop (only of tweets if tweets_only)"""
+        for rec in self.records(start, stop, tweets_only):
+            yield self.frame(rec)
+
+    def close(self):
+        """.. Warning:: frames (memoryviews) must not be in use, else mapping is left to garbage collector"""
+        try:
+            if self._view is not None:
+                self._view.release()
+                self._view = None
+            for obj in [self.data, self.index] + self._files:
+                obj.close()
+            self._block = (None, None)
+            self._blocks.clear()
+        except BufferError:
+            LOG.warning("segment {} is in use".format(self.path))
+
+
+class ArchiveReader(object):
+    """reads archives written by :class:`ArchiveWriter`, only segments with an index (closed ones) are read
+
+    :param str directory: archive's directory
+    :param str prefix: prefix of segment file names
+    :param codec: codec to decode frames with (see :func:`~.codec_get`) defaults to the one streams use
+    :param int blocks_cached: decompressed blocks kept per segment see :class:`ArchiveSegment`
+    """
+    def __init__(self, directory, prefix='stream', codec=None, blocks_cached=8):
+        self.directory = directory
+        self.prefix = prefix
+        self.blocks_cached = blocks_cached
+        self.codec = codec_get(codec)
+        try:            # decode views without a copy if codec's backend accepts them
+            self.codec.loads(memoryview(b'1'))
+            self._loads = self.codec.loads
+        except TypeError:
+            loads = self.codec.loads
+            self._loads = lambda frame: loads(frame if isinstance(frame, bytes) else frame.tobytes())
+        self.segments = []
+        self.refresh()
+
+    def refresh(self):
+        """opens any segments closed since last call"""
+        opened = set([seg.path for seg in self.segments])
+        for path in sorted(glob.glob(os.path.join(self.directory, self.prefix + '-*.idx'))):
+            path = path[:-4]
+            if path not in opened and os.path.exists(path) and os.path.getsize(path + '.idx') > len(INDEX_MAGIC):
+                self.segments.append(ArchiveSegment(path, self.blocks_cached))
+        self.segments.sort(key=lambda seg: seg.timestamp_first)
+
+    def __len__(self):
+        """:returns: number of frames in archive"""
+        return sum([len(seg) for seg in self.segments])
+
+    def _out(self, frames, decode):
+        if decode:
+            loads = self._loads
+            return (loads(frame) for frame in frames)
+        return frames
+
+    def __iter__(self):
+        """yields raw frames of all segments in time order"""
+        return self._merged([(seg, 0, len(seg)) for seg in self.segments], False)
+
+    def _merged(self, ranges, tweets_only):
+        """yields raw frames of (segment, start, stop) ranges (segments in timestamp_first order)
+        merged by (timestamp, id) if segments overlap in time (i.e. because of delete notices)
+        """
+        ranges = [i for i in ranges if i[1] < i[2]]
+        bounds = [(seg.record(start)[1], seg.record(stop - 1)[1]) for seg, start, stop in ranges]
+        if all([bounds[n][1] <= bounds[n + 1][0] for n in range(len(bounds) - 1)]):
+            for seg, start, stop in ranges:
+                for frame in seg.frames(start, stop, tweets_only):
+                    yield frame
+            return
+        iterables = [self._keyed(seg_n, seg.records(start, stop, tweets_only))
+                     for seg_n, (seg, start, stop) in enumerate(ranges)]
+        for _, _, seg_n, rec in heapq.merge(*iterables):
+            yield ranges[seg_n][0].frame(rec)
+
+    @staticmethod
+    def _keyed(seg_n, records):
+        for rec in records:
+            yield rec[1], rec[0], seg_n, rec
+
+    def _range(self, timestamp_from, timestamp_to, id_from=0, id_to=0, tweets_only=False):
+        ranges = []
+        for seg in self.segments:
+            if seg.timestamp_last < timestamp_from or seg.timestamp_first > timestamp_to:
+                continue
+            ranges.append((seg, seg.bisect(timestamp_from, id_from), seg.bisect(timestamp_to, id_to)))
+        return self._merged(ranges, tweets_only)
+
+    def time_range(self, seconds_from, seconds_to, decode=False):
+        """frames with timestamp in [seconds_from, seconds_to)
+
+        :param float seconds_from: epoch seconds
+        :param float seconds_to: epoch seconds
+        :param bool decode: if True yields decoded frames else raw ones (memoryviews where possible)
+        """
+        return self._out(self._range(int(seconds_from * 1000), int(seconds_to * 1000)), decode)
+
+    def id_range(self, id_from, id_to, decode=False):
+        """frames of tweets with id_from <= id < id_to (non tweet frames i.e. delete notices are excluded)"""
+        timestamps = snowflake_timestamp_ms(id_from), snowflake_timestamp_ms(id_to)
+        return self._out(self._range(timestamps[0], timestamps[1], id_from, id_to, True), decode)
+
+    def get(self, tweet_id, decode=False):
+        """:returns: raw (or decoded) frame of a tweet or None if not in archive (delete notices are skipped)"""
+        timestamp_ms = snowflake_timestamp_ms(tweet_id)
+        for seg in self.segments:
+            if seg.timestamp_first <= timestamp_ms <= seg.timestamp_last:
+                for n in range(seg.bisect(timestamp_ms, tweet_id), len(seg)):
+                    rec = seg.record(n)
+                    if rec[0] != tweet_id:
+                        break
+                    if rec[6] == KIND_TWEET:
+                        frame = seg.frame(rec)
+                        return self._loads(frame) if decode else frame
+        return None
+
+    def metrics(self):
+        """:returns: frames, segments, blocks decompressed and bytes read from segments"""
+        rt = DotDot({'frames': len(self), 'segments': len(self.segments), 'blocks_read': 0, 'bytes_read': 0})
+        for seg in self.segments:
+            rt.blocks_read += seg.counters.blocks_read
+            rt.bytes_read += seg.counters.bytes_read
+        return rt
+
+    def close(self):
+        for seg in self.segments:
+            seg.close()
+        self.segments = []
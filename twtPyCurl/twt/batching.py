@@ -0,0 +1,207 @@
+'''
+:module: batching
+
+coalesces single object lookups (from any thread) into batched requests to twitter's lookup end points
+(up to 100 ids per request), ids asked within a short window are deduplicated and sent together,
+results are fanned out to callers through :class:`LookupFuture` objects
+
+:Usage:
+    >>> client.get_user(783214)                              # blocking, batched with other threads' calls
+    {'id': 783214, 'screen_name': 'twitter', ...}
+    >>> futures = [client.lookup('statuses/lookup', i) for i in status_ids]     # a single request per 100 ids
+    >>> statuses = [f.result() for f in futures]             # None for ids not found
+'''
+import threading
+import logging
+from time import time
+from collections import OrderedDict
+from twtPyCurl.py.utilities import DotDot
+try:
+    from urllib import urlencode
+except ImportError:  # python 3
+    from urllib.parse import urlencode
+
+LOG = logging.getLogger(__name__)
+
+LOOKUPS = {
+    # {end_point: (request parameter, key of id in response objects)}
+    'users/lookup': ('user_id', 'id_str'),
+    'statuses/lookup': ('id', 'id_str'),
+    'friendships/lookup': ('user_id', 'id_str')}
+LOOKUPS_POST = ('users/lookup', 'statuses/lookup')     # lookups twitter also accepts as POST requests
+LOOKUP_IDS_MAX = 100
+QUERY_LENGTH_MAX = 2000         # requests with longer url encoded queries are POSTed if end point accepts POST
+
+
+class ErrorLookup(Exception):
+    """Exceptions base"""
+
+
+class ErrorLookupTimeout(ErrorLookup):
+    pass
+
+
+class LookupFuture(object):
+    """result of a lookup that will be available in the future, thread safe"""
+    __slots__ = ['_event', '_result', '_error', '_callbacks', '_lock']
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._error = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        """waits for and returns the result (None if object not found)
+
+        :raises: the exception request raised or ErrorLookupTimeout
+        """
+        if not self._event.wait(timeout):
+            raise ErrorLookupTimeout("lookup timed out")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def exception(self):
+        return self._error
+
+    def add_done_callback(self, fun):
+        """fun(future) is called (from batcher's thread) when result is available, or now if it is already"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fun)
+                return
+        fun(self)
+
+    def _set(self, result, error):
+        with self._lock:
+            self._result, self._error = result, error
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fun in callbacks:
+            try:
+                fun(self)
+            except Exception:
+                LOG.exception("lookup callback failed")
+
+    def set_result(self, result):
+        self._set(result, None)
+
+    def set_exception(self, error):
+        self._set(None, error)
+
+
+class LookupBatcher(object):
+    """batches lookups of an end point, a background thread sends pending ids when window expires
+    or LOOKUP_IDS_MAX ids are pending
+
+    :param ClientTwtRest client: client used for requests (clones of it actually see :func:`~.request_many`
+        kept while batcher lives)
+    :param str end_point: one of :data:`LOOKUPS` keys
+    :param float window: seconds to wait for more ids after first pending one
+    :param int concurrency: maximum concurrent requests when more than LOOKUP_IDS_MAX ids are pending
+    :param dict parms: additional request parameters i.e. {'include_entities': 'false'}
+    """
+    def __init__(self, client, end_point, window=0.05, concurrency=4, parms={}):
+        if end_point not in LOOKUPS:
+            raise ErrorLookup("{} is not a lookup end point".format(end_point))
+        self.client = client
+        self.end_point = end_point
+        self.parm_name, self.key = LOOKUPS[end_point]
+        self.window = window
+        self.concurrency = concurrency
+        self.parms = parms
+        self._pending = OrderedDict()       # {id_str: future} not sent yet
+        self._in_flight = {}                # {id_str: future} sent
+        self._first = None                  # time first pending id arrived
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._clients = []                  # clones of client reused by batch requests, closed by close
+        self.counters = DotDot({'lookups': 0, 'deduplicated': 0, 'requests': 0, 'errors': 0})
+
+    def get(self, object_id):
+        """:returns: a :class:`LookupFuture` for object_id"""
+        object_id = str(object_id)
+        with self._cond:
+            if self._closed:
+                raise ErrorLookup("batcher is closed")
+            self.counters.lookups += 1
+            future = self._pending.get(object_id) or self._in_flight.get(object_id)
+            if future is not None:
+                self.counters.deduplicated += 1
+                return future
+            future = self._pending[object_id] = LookupFuture()
+            if self._first is None:
+                self._first = time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="LookupBatcher")
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:       # closed
+                    return
+                deadline = self._first + self.window
+                while len(self._pending) < LOOKUP_IDS_MAX and not self._closed:
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending, self._first = self._pending, OrderedDict(), None
+                self._in_flight.update(batch)
+            self._send(batch)
+
+    def _send(self, batch):
+        ids = list(batch.keys())
+        chunks = [ids[i:i + LOOKUP_IDS_MAX] for i in range(0, len(ids), LOOKUP_IDS_MAX)]
+        requests = [self._request(dict(self.parms, **{self.parm_name: ",".join(chunk)})) for chunk in chunks]
+        self.counters.requests += len(requests)
+        try:
+            for index, rt in self.client.request_many(requests, self.concurrency, clients=self._clients):
+                if isinstance(rt, Exception):
+                    self.counters.errors += 1
+                    for object_id in chunks[index]:
+                        batch[object_id].set_exception(rt)
+                else:
+                    found = dict([(i[self.key], i) for i in rt.data])
+                    for object_id in chunks[index]:
+                        batch[object_id].set_result(found.get(object_id))
+        except Exception as err:
+            LOG.exception("lookup failed")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+        finally:
+            with self._cond:
+                for object_id in ids:
+                    del self._in_flight[object_id]
+
+    def _request(self, parms):
+        """:returns: (end point, method, parms) of a batch request, GET unless query is too long for a url
+        and end point accepts POST (friendships/lookup is GET only)
+        """
+        if self.end_point in LOOKUPS_POST and len(urlencode(parms)) > QUERY_LENGTH_MAX:
+            return self.end_point, 'POST', parms
+        return self.end_point, 'GET', parms
+
+    def close(self):
+        """sends any pending ids and stops background thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        for client in self._clients:
+            client.handle_close()
+        self._clients = []
@@ -0,0 +1,175 @@
+'''
+:module: cache
+
+a cache for idempotent twitter REST GET requests (see :class:`~.ClientTwtRest` cache argument)
+an in memory LRU tier with per end point TTLs, an optional SQLite persistent tier (can be shared by processes)
+and single flight coalescing: concurrent identical requests (from different threads) share a single network call.
+Cached values are raw response bodies so each hit returns a fresh decoded object.
+
+:Usage:
+    >>> from twtPyCurl.twt.cache import ResponseCache
+    >>> cache = ResponseCache(max_items=50000, path='/tmp/twt_cache.sqlite')
+    >>> client = ClientTwtRest(credentials, cache=cache)
+    >>> client.request_ep('users/show', parms={'screen_name': 'twitter'}).cached
+    False
+    >>> client.request_ep('users/show', parms={'screen_name': 'twitter'}).cached
+    True
+    >>> cache.counters
+    {'hits': 1, 'hits_disk': 0, 'misses': 1, 'coalesced': 0, 'evictions': 0, 'expired': 0}
+'''
+import sqlite3
+import threading
+from time import time
+from collections import OrderedDict
+from twtPyCurl.py.utilities import DotDot
+from twtPyCurl.twt.ratelimits import endpoint_family
+try:
+    from urllib import urlencode
+except ImportError:  # python 3
+    from urllib.parse import urlencode
+
+CACHE_TTLS = {
+    # {end point family (see :func:`~.endpoint_family`): seconds} only these end points are cached
+    '/users/show': 300, '/users/lookup': 300,
+    '/statuses/show': 3600, '/statuses/show/:id': 3600, '/statuses/lookup': 3600,
+    '/help/configuration': 86400, '/help/languages': 86400,
+    '/geo/search': 3600, '/geo/id/:place_id': 86400, '/geo/reverse_geocode': 3600,
+    '/trends/available': 3600, '/trends/place': 300}
+
+
+class ResponseCache(object):
+    """
+    :param int max_items: maximum number of items in memory, least recently used are evicted
+    :param dict ttls: {end point family: seconds} overrides :data:`CACHE_TTLS` items (0 disables caching)
+    :param str path: path of an SQLite database file for a persistent tier (None for memory only)
+    :param bool per_credentials: if True responses are cached per credentials (needed for end points
+        where response depends on authenticating user, i.e. users/show following field)
+    """
+    def __init__(self, max_items=10000, ttls={}, path=None, per_credentials=False):
+        self.max_items = max_items
+        self.ttls = dict(CACHE_TTLS, **ttls)
+        self.per_credentials = per_credentials
+        self._items = OrderedDict()     # {key: (expires, raw)} LRU order
+        self._in_flight = {}            # {key: threading.Event}
+        self._lock = threading.Lock()       # memory tier, never held during SQLite calls
+        self._db_lock = threading.Lock()    # SQLite tier
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires REAL, data BLOB)")
+            self._db.commit()
+        self.counters = DotDot({'hits': 0, 'hits_disk': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0,
+                                'expired': 0})
+
+    def __len__(self):
+        return len(self._items)
+
+    def ttl(self, url):
+        """:returns: seconds to keep a response of url, 0 if it should not be cached"""
+        return self.ttls.get(endpoint_family(url), 0)
+
+    def key(self, url, parms, credentials=None):
+        """:returns: cache key of a request"""
+        rt = "{}?{}".format(url, urlencode(sorted(parms.items())))
+        if self.per_credentials:
+            rt = "{}|{}".format(getattr(credentials, 'id_str', None), rt)
+        return rt
+
+    def get(self, key):
+        """:returns: raw response body or None if not cached (or expired)"""
+        now = time()
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is not None:
+                if item[0] > now:
+                    self._items[key] = item             # most recently used
+                    self.counters.hits += 1
+                    return item[1]
+                self.counters.expired += 1
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT expires, data FROM cache WHERE key=?", (key,)).fetchone() \
+                if self._db is not None else None
+        if row is None or row[0] <= now:
+            return None
+        raw = bytes(row[1])
+        with self._lock:
+            self.counters.hits_disk += 1
+            if key not in self._items:          # else it was put meanwhile, keep the newer
+                self._set(key, row[0], raw)
+        return raw
+
+    def put(self, key, raw, ttl):
+        """caches raw response body for ttl seconds"""
+        expires = time() + ttl
+        with self._lock:
+            self._items.pop(key, None)
+            self._set(key, expires, raw)
+        if self._db is not None:
+            with self._db_lock:
+                self._db_execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)", (key, expires, sqlite3.Binary(raw)))
+
+    def _set(self, key, expires, raw):
+        self._items[key] = (expires, raw)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+            self.counters.evictions += 1
+
+    def fetch(self, key, ttl, fun):
+        """gets a response body from cache or by calling fun, if an identical request is in flight
+        (from an other thread) it waits for it instead of calling fun
+
+        :param function fun: performs the request and returns (raw response body, cacheable) raw is cached
+            only if cacheable is True (i.e. an HTTP error body is returned but not cached)
+        :returns: (raw, fetched) fetched is True if fun was called
+        """
+        while True:
+            raw = self.get(key)
+            if raw is not None:
+                return raw, False
+            with self._lock:
+                event = self._in_flight.get(key)
+                if event is None:
+                    event = self._in_flight[key] = threading.Event()
+                    self.counters.misses += 1
+                    break
+                self.counters.coalesced += 1
+            event.wait()        # then try cache again, if leader failed we will make our own request
+        try:
+            raw, cacheable = fun()
+            if cacheable:
+                self.put(key, raw, ttl)
+            return raw, True
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            event.set()
+
+    def purge(self):
+        """removes expired items from memory and SQLite tiers"""
+        now = time()
+        with self._lock:
+            for key in [k for k, v in self._items.items() if v[0] <= now]:
+                del self._items[key]
+                self.counters.expired += 1
+        with self._db_lock:
+            self._db_execute("DELETE FROM cache WHERE expires <= ?", (now,))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        with self._db_lock:
+            self._db_execute("DELETE FROM cache")
+
+    def _db_execute(self, sql, parms=()):
+        """executes and commits a statement on SQLite tier if any (called with _db_lock held)"""
+        if self._db is not None:
+            self._db.execute(sql, parms)
+            self._db.commit()
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -3,10 +3,17 @@ module clients
 """
 
 import logging
+import re
+import threading
+from collections import deque
 from twtPyCurl.py.utilities import DotDot
 from twtPyCurl.twt.constants import TWT_URL_MEDIA_UPLOAD, TWT_URL_API_REST, TWT_URL_API_STREAM
-from twtPyCurl.py.requests import (simplejson, pycurl, Client, ClientStream,
+from twtPyCurl.py.requests import (pycurl, Client, ClientStream, Response, CredentialsPool,
                                    ErrorRq, ErrorRqCurl, ErrorRqHttp, format_header)
+from twtPyCurl.py.multi import ClientMulti
+from twtPyCurl.py.framing import FramerJSONArray, ErrorFrame
+from twtPyCurl.twt.pagination import pages, Prefetcher, PAGINATION_CURSOR, PAGINATION_MAX_ID
+from twtPyCurl.twt.batching import LookupBatcher
 from time import sleep
 from twtPyCurl.twt.endpoints import EndPointsRest, EndPointsStream
 
@@ -16,10 +23,39 @@ LOG = logging.getLogger(__name__)
 LOG.debug("loading module: " + __name__)
 
 
+TWT_STREAM_MSG_TYPES = frozenset([b'delete', b'limit', b'disconnect', b'warning', b'scrub_geo',
+                                  b'status_withheld', b'user_withheld'])
+# `see message types <https://dev.twitter.com/streaming/overview/messages-types>`_
+RE_LIMIT_TRACK = re.compile(br'"track":\s*(\d+)')
+
+
 def backoff(seconds):  # default backoff method
     return sleep(seconds)
 
 
+def msg_type_sniff(data):
+    """gets the leading key of a raw JSON object without decoding it
+
+    :param bytes data: a raw JSON object
+    :returns: the leading key i.e. b'limit' for b'{"limit":{"track":10}}' or None if it can't tell
+    """
+    if data[:2] == b'{"':
+        end = data.find(b'"', 2, 32)
+        if end != -1:
+            return data[2:end]
+    return None
+
+
+def twt_error_code(data):
+    """:returns: error code of a decoded twitter error response i.e. 89 for
+    {'errors': [{'message': 'Invalid or expired token.', 'code': 89}]} or None
+    """
+    try:
+        return data['errors'][0]['code']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
 class ErrorTwtStreamDisconnectReq(ErrorRq):
     def __init__(self, error_number, msg):
         LOG.error(msg)
@@ -51,15 +87,31 @@ class ClientTwtRest(Client):
      examples require a credentials.json in user's home directory see :class:`~.CredentialsProviderFile`
 
     :param Credentials credentials: an instance of :class:`~.Credentials`
+    :param RateLimits rate_limits: if specified requests are delayed to stay within rate limits
+        and retried on HTTP 429 (see :mod:`~.ratelimits`)
+    :param ResponseCache cache: if specified GET requests of cacheable end points are served from it
+        (see :mod:`~.cache`)
+    :param str url_api: format string of end points' urls i.e. 'http://127.0.0.1:8081/1.1/{}.json'
+        to direct requests to a :mod:`~.simulate_rest` server, None for twitter's
     :param dict kwargs: for acceptable kwargs see :class:`~.Client`
 
     :example:
         :ref:`check here <example-rest>`
     """
-    def __init__(self, credentials, **kwargs):
+    def __init__(self, credentials, rate_limits=None, cache=None, url_api=None, **kwargs):
         self._endpoints = EndPointsRest(parent=self)
         # composition with an endpoints object this allows to:
         # 1) call it using dot notation 2) validate endpoints
+        self.rate_limits = rate_limits
+        self.cache = cache
+        self.url_api = url_api
+        self._cache_raw = None          # raw body of last response when we keep a cache
+        self._cache_credentials = None  # credentials a cached request was keyed with (see _request_ep_cached)
+        self._items_framer = None       # a FramerJSONArray while request_ep_items is in progress
+        self._items = []                # raw items framer delivered but not yielded yet
+        self._items_error = None        # a framing error that aborted request_ep_items transfer
+        self.lookup_batchers = {}       # {end_point: LookupBatcher} see lookup
+        self._lookup_lock = threading.Lock()
         super(ClientTwtRest, self).__init__(credentials=credentials, **kwargs)
         self.api = self._endpoints
 
@@ -75,12 +127,302 @@ class ClientTwtRest(Client):
          .. Warning:: doesn't check end_point's validity will raise a twitter API error if not valid
 
         """
-        frmt_str = TWT_URL_MEDIA_UPLOAD if end_point == "media/upload" else TWT_URL_API_REST
         if end_point == "statuses/update":
             # parms['status'] = parms['status'].encode('utf-8')
             parms = self._request_ep_media(parms)  # check for media
+        url = self.request_ep_url(end_point)
+        if self.cache is not None and method == 'GET':
+            ttl = self.cache.ttl(url)
+            if ttl > 0:
+                return self._request_ep_cached(url, parms, ttl)
+        return self.request(url, method, parms, multipart)
+
+    def _request_ep_cached(self, url, parms, ttl):
+        """serves a GET request from cache, or performs it (once for all threads asking for it) and caches it
+        only successful responses are cached, when cache is per credentials request is keyed and performed with
+        credentials picked here, its response isn't cached if it was retried with other credentials
+        """
+        credentials = self.credentials_pick(url) if self.cache.per_credentials else None
+
+        def fetch():
+            self._cache_credentials = credentials
+            try:
+                self.request(url, 'GET', parms)
+            finally:
+                self._cache_credentials = None
+            ok = self.response.status_http < 300
+            if credentials is not None:
+                ok = ok and self._last_req.credentials is credentials
+            return self._cache_raw, ok
+        raw, fetched = self.cache.fetch(self.cache.key(url, parms, credentials), ttl, fetch)
+        if not fetched:
+            self.response.reset()
+            self._response_cached(self.response, raw)
+        return self.response
+
+    def _response_cached(self, response, raw):
+        """:returns: response (a reset one) set as a successful response with raw body from cache"""
+        response.status_http = 200
+        response.data = self.codec.loads(raw)
+        response.cached = True
+        return response
+
+    def request_start(self, url, method, parms={}, multipart=False):
+        """see :func:`~.Client.request_start`, if we keep rate_limits it reserves a request delaying it as needed"""
+        super(ClientTwtRest, self).request_start(url, method, parms, multipart)
+        if self._cache_credentials is not None:
+            self._last_req.credentials = self._cache_credentials
+        self._rate_limits_acquire()
+
+    def _rate_limits_key(self):
+        return self.rate_limits.key(self._last_req.credentials, self._last_req.parms[0])
+
+    def _rate_limits_acquire(self):
+        """reserves a request of current credentials and url delaying it as needed (if we keep rate_limits)"""
+        if self.rate_limits is not None:
+            delay = self.rate_limits.acquire(self._rate_limits_key())
+            if delay > 0:
+                self.backoff(delay)
+
+    def credentials_headroom(self, credentials, url):
+        """:returns: remaining requests of credentials for url (see :func:`~.Client.credentials_headroom`)"""
+        return 0 if self.rate_limits is None else self.rate_limits.headroom(self.rate_limits.key(credentials, url))
+
+    def request_ep_url(self, end_point):
+        """:returns: url of end_point"""
+        if self.url_api is not None:
+            return self.url_api.format(end_point)
+        frmt_str = TWT_URL_MEDIA_UPLOAD if end_point == "media/upload" else TWT_URL_API_REST
+        return frmt_str.format(end_point)
+
+    def request_many(self, requests, concurrency=10, ordered=False, clients=None):
+        """performs many requests concurrently from current thread using a :class:`~.ClientMulti`
+        each request is performed by a clone of this client so retries etc. work as in :func:`request_ep`,
+        clones are created as needed (up to concurrency) and closed when generator ends,
+        GET requests of cacheable end points are served from cache if we keep one (and cached when fetched)
+
+        :param iterable requests: (end_point, method, parms) tuples, it is consumed lazily
+        :param int concurrency: maximum number of requests in flight
+        :param bool ordered: if True results are yielded in input order else as soon as they complete
+        :param list clients: clones kept by caller to be reused between calls (i.e. by a :class:`~.LookupBatcher`)
+            clones created are appended to it and left open, caller must close them
+        :returns: a generator of (index, result) tuples, where index is request's position in requests
+            and result is a :class:`~.Response` or the Exception raised by the request
+            (an error doesn't affect other requests)
+
+        :Usage:
+            >>> ids = [[783214, 6253282], [2244994945]]
+            >>> reqs = (('users/lookup', 'GET', {'user_id': ','.join(map(str, i))}) for i in ids)
+            >>> for index, rt in client.request_many(reqs, concurrency=16):
+            ...     if isinstance(rt, Exception): print (index, rt)
+            ...     else: print (index, [i['screen_name'] for i in rt.data])
+
+         .. Warning:: media in statuses/update parameters are uploaded (blocking) before request is added
+        """
+        multi = ClientMulti()
+        done = deque()
+        multi.on_request_done = lambda client, error: done.append((client, error))
+        clones = [] if clients is None else clients     # created lazily up to concurrency
+        idle = list(clones)
+        in_flight = {}                          # {client: (index, cache key or None, credentials)}
+        results = {}                            # {index: result} waiting to be yielded
+        index_next = 0                          # next index to yield if ordered
+        requests = enumerate(requests)
+        exhausted = False
+        try:
+            while True:
+                while len(in_flight) < concurrency and not exhausted:
+                    try:
+                        index, (end_point, method, parms) = next(requests)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if end_point == "statuses/update":
+                        parms = self._request_ep_media(dict(parms))
+                    url = self.request_ep_url(end_point)
+                    key, credentials = None, None
+                    if self.cache is not None and method == 'GET' and self.cache.ttl(url) > 0:
+                        credentials = self.credentials_pick(url) if self.cache.per_credentials else None
+                        key = self.cache.key(url, parms, credentials)
+                        raw = self.cache.get(key)
+                        if raw is not None:
+                            results[index] = self._response_cached(Response(), raw)
+                            if len(results) >= concurrency:
+                                break           # yield some before consuming more requests
+                            continue
+                    if not idle:
+                        clones.append(self.clone())
+                        idle.append(clones[-1])
+                    client = idle.pop()
+                    client._cache_credentials = credentials
+                    in_flight[client] = (index, key, credentials)
+                    multi.add(client, url, method, parms)
+                if not in_flight and not results:
+                    break
+                if in_flight:
+                    multi.perform()
+                while done:
+                    client, error = done.popleft()
+                    index, key, credentials = in_flight.pop(client)
+                    client._cache_credentials = None
+                    if error is None and key is not None and client.response.status_http < 300 and \
+                            (credentials is None or client._last_req.credentials is credentials):
+                        self.cache.put(key, client._cache_raw, self.cache.ttl(client._last_req.parms[0]))
+                    results[index] = client.response if error is None else error
+                    client.response = Response()    # response is hot so client needs a new one
+                    idle.append(client)
+                if ordered:
+                    while index_next in results:
+                        yield index_next, results.pop(index_next)
+                        index_next += 1
+                else:
+                    for index in list(results):
+                        yield index, results.pop(index)
+        finally:
+            multi.close()
+            if clients is None:
+                for client in clones:
+                    client.handle_close()
+
+    def iter_ep(self, end_point, parms={}, prefetch=2, max_pages=None):
+        """iterates over items of a paginated end point (cursor or max_id based see :mod:`~.pagination`)
+
+        :param str end_point: end point i.e. 'followers/ids'
+        :param dict parms: parameters dictionary to pass to twitter
+        :param int prefetch: number of pages to fetch ahead in a background thread (by a clone of this client)
+            while caller consumes current page, 0 fetches next page only when current one is exhausted
+        :param int max_pages: maximum number of pages to fetch (None for all)
+        :returns: a generator of items (i.e. ids, users or tweets)
+        :raises: ErrorPagination if end point is not paginated and request errors
+
+        :Usage:
+            >>> for user_id in client.iter_ep('followers/ids', {'screen_name': 'twitter'}, prefetch=4):
+            ...     pass
+        """
+        if prefetch:
+            return iter(Prefetcher(self._pages_cloned(end_point, parms, max_pages), prefetch))
+        return (item for page in pages(self, end_point, parms, max_pages) for item in page)
+
+    def _pages_cloned(self, end_point, parms, max_pages):
+        """:func:`~.pages` fetched by a clone (created on first page) closed when generator is closed"""
+        clone = self.clone()
+        try:
+            for page in pages(clone, end_point, parms, max_pages):
+                yield page
+        finally:
+            clone.handle_close()
+
+    def request_ep_items(self, end_point, method='GET', parms={}, key=None):
+        """requests an end point with an array response and yields its items as they arrive, so processing
+        overlaps with download and only the unfinished item is kept in memory (see :class:`~.FramerJSONArray`)
+        transfer is driven by a CurlMulti in caller's thread, a retry is possible only before first item.
+        Response's data remain empty, non array parts of body (i.e. next_cursor) are not available
+
+        :param str end_point: end point i.e. 'statuses/lookup'
+        :param str method: request method
+        :param dict parms: parameters dictionary to pass to twitter
+        :param str key: key of array in response's object, defaults to the known one for paginated end points
+            (see :mod:`~.pagination`) else None for array responses
+        :returns: a generator of decoded items
 
-        return self.request(frmt_str.format(end_point), method, parms, multipart)
+        :Usage:
+            >>> for tweet in client.request_ep_items('statuses/user_timeline', parms={'count': 200}):
+            ...     pass
+        """
+        if key is None:
+            key = PAGINATION_CURSOR.get(end_point) or PAGINATION_MAX_ID.get(end_point)
+        loads = self.codec.loads
+        multi = pycurl.CurlMulti()
+        attached = False
+        self.request_start(self.request_ep_url(end_point), method, parms)
+        try:
+            retry = True
+            while retry:
+                self._items_framer = FramerJSONArray(key)
+                self._items = []
+                self._items_error = None
+                yielded = False
+                self.request_attempt()
+                multi.add_handle(self.handle)
+                attached = True
+                active = 1
+                while active:
+                    if multi.select(1.0) == -1:
+                        sleep(0.001)
+                    while True:
+                        ret, active = multi.perform()
+                        if ret != pycurl.E_CALL_MULTI_PERFORM:
+                            break
+                    items, self._items = self._items, []
+                    for item in items:
+                        yielded = True
+                        yield loads(item)
+                err = multi.info_read()[2]
+                err = pycurl.error(err[0][1], err[0][2]) if err else None
+                multi.remove_handle(self.handle)
+                attached = False
+                if self._items_error is not None:
+                    raise self._items_error
+                if err is not None and yielded:     # can't retry without yielding items twice
+                    raise ErrorRqCurl(err.args[0], err.args[1])
+                retry = self.request_attempt_end(err)
+        finally:
+            self._items_framer = None
+            if attached:
+                multi.remove_handle(self.handle)
+            multi.close()
+            self.request_finish()
+
+    def handle_on_write(self, data):
+        if self._items_framer is not None and (self.response.status_provisional or 0) < 300:
+            try:
+                self._items.extend(self._items_framer.feed(data))
+            except ErrorFrame as err:
+                self._items_error = err
+                return 0                # aborts transfer
+            return None
+        return super(ClientTwtRest, self).handle_on_write(data)
+
+    def lookup(self, end_point, object_id):
+        """looks up an object, lookups from any thread are coalesced in batched requests (see :mod:`~.batching`)
+
+        :param str end_point: one of users/lookup statuses/lookup friendships/lookup
+        :param object_id: object's id
+        :returns: a :class:`~.LookupFuture` its result is the object or None if not found
+        """
+        batcher = self.lookup_batchers.get(end_point)
+        if batcher is None:
+            with self._lookup_lock:
+                batcher = self.lookup_batchers.get(end_point)
+                if batcher is None:
+                    batcher = self.lookup_batchers[end_point] = LookupBatcher(self, end_point)
+        return batcher.get(object_id)
+
+    def get_user(self, user_id, timeout=None):
+        """:returns: a user object or None if not found (batched see :func:`lookup`)"""
+        return self.lookup('users/lookup', user_id).result(timeout)
+
+    def get_status(self, status_id, timeout=None):
+        """:returns: a status object or None if not found (batched see :func:`lookup`)"""
+        return self.lookup('statuses/lookup', status_id).result(timeout)
+
+    def get_friendship(self, user_id, timeout=None):
+        """:returns: relationship of authenticating user to user_id or None (batched see :func:`lookup`)"""
+        return self.lookup('friendships/lookup', user_id).result(timeout)
+
+    def clone(self):
+        """:returns: a new instance with same credentials and settings"""
+        return self.__class__(self.credentials, user_agent=self.user_agent, allow_retries=self.allow_retries,
+                              verbose=self.verbose, codec=self.codec, share=self.share, rate_limits=self.rate_limits,
+                              cache=self.cache, url_api=self.url_api)
+
+    def handle_close(self):
+        """closes lookup batchers (pending lookups are sent first) and handle"""
+        with self._lookup_lock:
+            batchers, self.lookup_batchers = self.lookup_batchers, {}
+        for batcher in batchers.values():
+            batcher.close()
+        super(ClientTwtRest, self).handle_close()
 
     def _request_ep_media(self, parms_dict):
         """this is a special case `see <https://dev.twitter.com/rest/reference/post/media/upload>`_
@@ -105,15 +447,33 @@ class ClientTwtRest(Client):
     def on_request_error_http(self, err):
         """we got an http error, if error < 500
         twitter's error message is in data i.e: {'errors': [{'message': 'Invalid or expired token.', 'code': 89}]}
+        on HTTP 429 (rate limit exceeded) it waits for rate limit window reset and retries if we keep rate_limits
+        on HTTP 401 or error code 89 credentials are revoked and if we use a :class:`~.CredentialsPool`
+        request is retried with other credentials
         """
+        if err == 429 and self.rate_limits is not None and self._state.retries_http < 4:
+            self.backoff(self.rate_limits.on_429(self._rate_limits_key(), self.response.headers))
+            return True
         if err < 500:
-            self.response.data = simplejson.loads(self.response.data)
+            data = self.response.decode(self.codec)
+            if isinstance(self.credentials, CredentialsPool) and (err == 401 or twt_error_code(data) == 89):
+                self.credentials.revoke(self._last_req.credentials)
+                if len(self.credentials) > 0 and self._state.retries_http < 4:
+                    self._last_req.credentials = self.credentials_pick(self._last_req.parms[0])
+                    self._rate_limits_acquire()         # retry counts against new credentials' limits
+                    return True
             raise ErrorRqHttpTwt(self.response)
         else:
             raise ErrorRqHttp(err, self.response)
 
     def on_request_end(self):
-        self.response.data = simplejson.loads(self.response.data)
+        if self.rate_limits is not None:
+            self.rate_limits.update(self._rate_limits_key(), self.response.headers)
+        if self._items_framer is not None and self.response.status_http < 300:
+            return                      # items were delivered by request_ep_items
+        if self.cache is not None:
+            self._cache_raw = self.response.data
+        self.response.decode(self.codec)
 
     def help(self, *args, **kwargs):
         """delegate help to be handled by endpoints object"""
@@ -151,6 +511,10 @@ class ClientTwtStream(ClientStream):
 
     :param Credentials credentials: an instance of :class:`~.Credentials`
     :param int stats_every: print statististics every n data packets defaults to 0 (disables statics)
+    :param list msgs_decode: twitter message types (i.e. 'delete', 'limit') to be decoded and passed to
+        :func:`on_twitter_msg` defaults to msgs_decode_default ('disconnect' is always decoded), other message
+        types are classified without decoding them, limit notices only update counters.t_limit
+        and delete notices only update counters.t_deletes
     :param dict kwargs: for acceptable kwargs see :class:`~.Client` and :class:`~.ClientStream`
 
     :example:
@@ -160,9 +524,12 @@ class ClientTwtStream(ClientStream):
     format_stream_stats = ClientStream.format_stream_stats + "{t_data:14,d}|{t_msgs:8,d}|"
     format_stream_stats_header = format_header(format_stream_stats)
     # ####################################################################################
+    msgs_decode_default = ('disconnect', 'warning', 'scrub_geo', 'status_withheld', 'user_withheld')
 
-    def __init__(self, credentials=None, stats_every=1, **kwargs):
+    def __init__(self, credentials=None, stats_every=1, msgs_decode=None, **kwargs):
         self._reset_retry()
+        self.msgs_decode = msgs_decode
+
         self._endpoints = EndPointsStream(parent=self)  # class composition with endpoints object
         # delegate to endpoints could be done automatically but that would be too hackish
         self.stream = self._endpoints.stream
@@ -170,7 +537,35 @@ class ClientTwtStream(ClientStream):
         self.userstream = self._endpoints.userstream
         self.name = kwargs.get('name')  # ancestor class will set it again but we need it now
         super(ClientTwtStream, self).__init__(credentials=credentials, stats_every=stats_every, **kwargs)
-        self.counters.update({'t_data': 0, 't_msgs': 0})
+        self.counters.update({'t_data': 0, 't_msgs': 0, 't_limit': 0, 't_deletes': 0})
+        self._counters_lock = threading.Lock()    # pipeline workers update counters concurrently
+
+    @property
+    def msgs_decode(self):
+        """
+        :returns: set of message types to be decoded
+        """
+        return self._msgs_decode
+
+    @msgs_decode.setter
+    def msgs_decode(self, msg_types=None):
+        """message types to decode and pass to :func:`on_twitter_msg`, None for msgs_decode_default
+        plus all message types if on_twitter_msg is overridden (by a descendant or on the instance)
+        """
+        self._msgs_decode_arg = msg_types
+        if msg_types is None:
+            msg_types = self.msgs_decode_default
+            if self._on_twitter_msg_overridden():
+                msg_types = TWT_STREAM_MSG_TYPES
+        msg_types = [i if isinstance(i, bytes) else i.encode('ascii') for i in msg_types]
+        self._msgs_decode = frozenset(msg_types) | frozenset([b'disconnect'])
+
+    def _on_twitter_msg_overridden(self):
+        return getattr(self.on_twitter_msg, '__func__', None) is not ClientTwtStream.__dict__['on_twitter_msg']
+
+    def on_request_start(self):
+        super(ClientTwtStream, self).on_request_start()
+        self.msgs_decode = self._msgs_decode_arg    # a handler may have been set after initialization
 
     def _handle_init_end(self):
         self.curl_low_speed = (1, 60)
@@ -183,27 +578,29 @@ class ClientTwtStream(ClientStream):
         remember! after 1st unsuccessful retry probably the error will be E_COULDNT_CONNECT
         """
         LOG.debug("on_request_error_curl:" + str(err))
-        if err[0] == pycurl.E_PARTIAL_FILE and self._state.retries_curl < 4:
+        if err.args[0] == pycurl.E_PARTIAL_FILE and self._state.retries_curl < 4:
             # err  (18, 'transfer closed with outstanding read data remaining')
             # usually happens in streams due to network/server temporary failure
             # possible remedy curl_setopt($curl, CURLOPT_HTTPHEADER, array('Expect:'))?
             if self.wait_on_nw_error(self._state.retries_curl) is not False:
-                self._log_retry("pycurl", err[0], err[1], self._state.retries_curl)
+                self._log_retry("pycurl", err.args[0], err.args[1], self._state.retries_curl)
                 return True
-        elif err[0] == pycurl.E_OPERATION_TIMEDOUT and err[1].startswith('Operation too slow'):
+        elif err.args[0] == pycurl.E_OPERATION_TIMEDOUT and err.args[1].startswith('Operation too slow'):
             # timed out as defined in LOW_SPEED_LIMIT LOW_SPEED_TIME
             # check the message too because err 28 can come also from Operation timed out after
             if self._state.retries_curl < 4 and self.wait_on_nw_error(self._state.retries_curl) is not False:
-                self._log_retry("curl", err[0], err[1], self._state.retries_curl)
+                self._log_retry("curl", err.args[0], err.args[1], self._state.retries_curl)
                 return True
-        elif err[0] == pycurl.E_COULDNT_CONNECT and self._state.retries_curl > 0 and self._state.retries_curl < 4:
+        elif err.args[0] == pycurl.E_COULDNT_CONNECT and self._state.retries_curl > 0 and self._state.retries_curl < 4:
             # we check retries_curl > 0  to make sure it is a reconnect attempt initiated by an other curl error
             if self.wait_on_nw_error(self._state.retries_curl) is not False:
-                self._log_retry("curl", err[0], err[1], self._state.retries_curl)
+                self._log_retry("curl", err.args[0], err.args[1], self._state.retries_curl)
                 return True
 
-        elif err[0] == pycurl.E_WRITE_ERROR and self._request_abort[0] is not None:
+        elif err.args[0] == pycurl.E_WRITE_ERROR and self._request_abort[0] is not None:
             code, msg = self.request_abort[1:]
+            if code == self.abort_frame_error:     # stream is corrupt, ClientStream raises ErrorRqCurl
+                return super(ClientTwtStream, self).on_request_error_curl(err)
             if code <= 12:  # https://dev.twitter.com/streaming/overview/messages-types
                 if code in [2, 4, 7]:               # danger duplicate stream or something
                     self._raise(ErrorTwtStreamDisconnectReq, code, msg)
@@ -219,7 +616,7 @@ class ClientTwtStream(ClientStream):
             elif code == 1001:    # by convention > 1000 comes from our side
                     return False  # disconnect gracefully
             raise self._raise(ErrorTwtStreamDisconnectReq, code, "we don't handle:" + str(msg))
-        self._raise(ErrorRqCurl, err[0], err[1])
+        self._raise(ErrorRqCurl, err.args[0], err.args[1])
 
     def on_request_error_http(self, err):
         """default error handling, for HTTP Errors override method for any special handling
@@ -239,7 +636,7 @@ class ClientTwtStream(ClientStream):
         LOG.debug(frmt.format(self.name, **locals()))
 
     @classmethod
-    def wait_seconds(cls, try_cnt, initial, maximum, tries_max=5, exponential=False):
+    def wait_seconds(cls, try_cnt, initial, maximum, tries_max=5, exponential=False, backoff_fun=backoff):
         '''see: https://dev.twitter.com/streaming/overview/connecting
 
         :Parameters:
@@ -247,45 +644,128 @@ class ClientTwtStream(ClientStream):
             - initial float (seconds or fraction)
             - maximum float (seconds or fraction)
             - exponential back off exponentially if True else linearly
+            - backoff_fun function to call with backoff value
 
         :Returns:
             False or backoff value
         '''
         if try_cnt <= tries_max:
             vl = min((initial ** try_cnt) if exponential else initial * try_cnt, maximum)
-            backoff(vl)
+            backoff_fun(vl)
             return vl
         else:
             return False
 
-    @classmethod
-    def wait_on_nw_error(cls, current_try):
-        return cls.wait_seconds(current_try, 0.25, 16)
+    def wait_on_nw_error(self, current_try):
+        return self.wait_seconds(current_try, 0.25, 16, backoff_fun=self.backoff)
 
-    @classmethod
-    def wait_on_http_error(cls, current_try):
-        return cls.wait_seconds(current_try, 5, 320, exponential=True)
+    def wait_on_http_error(self, current_try):
+        return self.wait_seconds(current_try, 5, 320, exponential=True, backoff_fun=self.backoff)
 
-    @classmethod
-    def wait_on_http_420(cls, current_try):
-        return cls.wait_seconds(current_try, 60, 600)
+    def wait_on_http_420(self, current_try):
+        return self.wait_seconds(current_try, 60, 600, backoff_fun=self.backoff)
 
     def on_data_default(self, data):
         """this is where actual stream data comes after chunks are merged,
         if we don't specify an on_data_cb function on class initialization
+        twitter messages are classified by their leading key so only statuses and
+        message types in msgs_decode are decoded
         """
         # LOG.debug("on_data_default " + str(data))
-        jdata = simplejson.loads(data)
         if self._last_req.subdomain == 'stream':  # it is a statuses stream
+            msg_type = msg_type_sniff(data)
+            if msg_type in TWT_STREAM_MSG_TYPES:
+                self.on_twitter_msg_raw(msg_type, data)
+                return
+            jdata = self.codec.loads(data)
             if jdata.get('source') is not None:   # it is a status (all statuses have source key sometimes can be '')
-                self.counters.t_data += 1
+                with self._counters_lock:
+                    self.counters.t_data += 1
                 self.on_twitter_data(jdata)
             else:
-                self.counters.t_msgs += 1
-                self.on_twitter_msg_base(jdata)   # then it is a message
+                self.on_twitter_msg_decoded(jdata)   # then it is a message
         else:
             pass
 
+    def on_data_batch_default(self, data_lst):
+        """batch mode counterpart of :func:`on_data_default` decodes and classifies a list of data packets in one pass
+        if we don't specify an on_data_batch_cb function on class initialization see :class:`~.ClientStream`
+        """
+        if self._last_req.subdomain != 'stream':
+            return
+        loads = self.codec.loads
+        on_twitter_data = self.on_twitter_data
+        t_data = 0
+        for data in data_lst:
+            msg_type = msg_type_sniff(data)
+            if msg_type in TWT_STREAM_MSG_TYPES:
+                self.on_twitter_msg_raw(msg_type, data)
+                continue
+            jdata = loads(data)
+            if jdata.get('source') is not None:
+                t_data += 1
+                on_twitter_data(jdata)
+            else:
+                self.on_twitter_msg_decoded(jdata)
+        with self._counters_lock:
+            self.counters.t_data += t_data
+
+    def on_data_decoded_batch(self, docs):
+        """classifies a list of documents already decoded by a :class:`~.DecodePool`"""
+        if self._last_req.subdomain != 'stream':
+            return
+        on_twitter_data = self.on_twitter_data
+        t_data = 0
+        for jdata in docs:
+            if jdata.get('source') is not None:
+                t_data += 1
+                on_twitter_data(jdata)
+            else:
+                self.on_twitter_msg_decoded(jdata)
+        with self._counters_lock:
+            self.counters.t_data += t_data
+
+    def on_twitter_msg_raw(self, msg_type, data):
+        """a twitter message classified by :func:`msg_type_sniff` but not decoded yet
+        limit and delete notices update counters, only message types in msgs_decode are decoded
+
+        :param bytes msg_type: message type i.e. b'limit'
+        :param bytes data: raw message
+        """
+        track = None
+        if msg_type == b'limit':
+            # limit track is the total number of undelivered tweets since connection
+            track = RE_LIMIT_TRACK.search(data)
+            track = None if track is None else int(track.group(1))
+        self._msg_count(msg_type, track)
+        if msg_type in self._msgs_decode:
+            self.on_twitter_msg_base(self.codec.loads(data))
+
+    def on_twitter_msg_decoded(self, msg):
+        """a decoded twitter message (one that could not be sniffed or was decoded by a :class:`~.DecodePool`)
+        counted and filtered as :func:`on_twitter_msg_raw` does, messages of unknown types are always passed on
+        """
+        msg_type = next(iter(msg), u'')
+        msg_type = msg_type.encode('ascii', 'replace') if not isinstance(msg_type, bytes) else msg_type
+        track = None
+        if msg_type == b'limit' and isinstance(msg['limit'], dict):
+            track = msg['limit'].get('track')
+            track = None if track is None else int(track)
+        self._msg_count(msg_type, track)
+        if msg_type in TWT_STREAM_MSG_TYPES and msg_type not in self._msgs_decode:
+            return
+        self.on_twitter_msg_base(msg)
+
+    def _msg_count(self, msg_type, track=None):
+        """updates message counters, limit track only grows during a connection
+        so the highest one wins when workers deliver notices out of order"""
+        with self._counters_lock:
+            self.counters.t_msgs += 1
+            if msg_type == b'delete':
+                self.counters.t_deletes += 1
+            elif track is not None and track > self.counters.t_limit:
+                self.counters.t_limit = track
+
     def on_twitter_data(self, data):
         """this is where actual twitter data comes unless you specify on_twitter_data_cb on
         class initialization, override in descendants or provide a on_twitter_data_cb
@@ -304,7 +784,7 @@ class ClientTwtStream(ClientStream):
         self.on_twitter_msg(msg_type, msg)
         if msg_type == 'disconnect':
             self.request_abort_set(msg[msg_type]['code'], msg[msg_type]['reason'])
-            LOG.debug('disconnect requested by twitter {:s}'.format(msg))
+            LOG.debug('disconnect requested by twitter {!s}'.format(msg))
 
     def on_twitter_msg(self, msg_type, msg):
         '''override it to handle twitter messages
@@ -317,7 +797,8 @@ class ClientTwtStream(ClientStream):
         :param str end_point: twitter REST end point sortcut ie 'stream/statuses/filter'
         :param str method: request method one of GET or POST (defaults to GET)
         :param bool test_server: if True channels request to test server
-        :param dict kwargs: parameters dictionary to pass to twitter
+        :param dict kwargs: parameters dictionary to pass to twitter,
+            if it includes delimited='length' a length delimited framer is used see :func:`~.ClientStream.framer_set`
 
         :return: an instance of :class:`~.Response`
 
@@ -328,16 +809,12 @@ class ClientTwtStream(ClientStream):
          .. Warning:: doesn't check end_point's validity will raise a twitter API error if not valid
 
         """
-        ep_lst = end_point.split("/")
-        url = TWT_URL_API_STREAM.format(ep_lst[0], "/".join(ep_lst[1:]))
-        if test_server:
-            '''modify url to send request to test server at port 8080'''
-            url = url.replace("https", 'http').replace('.com', '.com:8080')
+        url = self.request_ep_prepare(end_point, test_server, kwargs)
         self._state.retries_extra = 0   # see handle_on_headers (its reset to 0 by a successful connection)
         while self._state.retries_extra < 4:
             self._state.retries_extra += 1
             res = self.request(url, method, kwargs)
-            LOG.debug('request_ep end headers {:s} buffer=[{:s}]'.format(self.response.headers, self.resp_buffer))
+            LOG.debug('request_ep end headers {!s} buffer=[{!r}]'.format(self.response.headers, self.resp_buffer))
             if self.response.status_http == 200 and self.response.headers.get('connection') == 'close':
                 # sometimes it returns with http 200 but connection:close in headers
                 LOG.debug('retrying http 200 with connection closed {:d}'.format(self._state.retries_extra))
@@ -345,6 +822,19 @@ class ClientTwtStream(ClientStream):
             self._state.retries_extra = 99  # get out of here
         return res
 
+    def request_ep_prepare(self, end_point, test_server=False, parms={}):
+        """constructs url from end_point and sets framer according to parms (see :func:`request_ep`)
+
+        :returns: url
+        """
+        ep_lst = end_point.split("/")
+        url = TWT_URL_API_STREAM.format(ep_lst[0], "/".join(ep_lst[1:]))
+        if test_server:
+            '''modify url to send request to test server at port 8080'''
+            url = url.replace("https", 'http').replace('.com', '.com:8080')
+        self.framer_set(parms.get('delimited') == 'length')
+        return url
+
     def help(self, *args, **kwargs):
         """delegate help to endpoints
 
@@ -378,3 +868,29 @@ class ClientTwtStream(ClientStream):
 
     def _reset_retry(self):
         self._retry_counters = DotDot({'retries': 0, 'bo_err_420': 60, 'bo_err_http': 5})
+
+
+class StreamMultiplexer(ClientMulti):
+    """drives many :class:`ClientTwtStream` connections from a single thread (see :class:`~.ClientMulti`)
+    each stream keeps its own framing, counters and retry/backoff state, backoff waits don't block other streams
+
+    :Usage:
+        >>> mux = StreamMultiplexer()
+        >>> for credentials in credentials_lst:
+        ...     mux.add_ep(ClientTwtStream(credentials), "userstream/user", "GET", stringify_friend_ids=True)
+        >>> threading.Thread(target=mux.run, kwargs={'until_empty': False}).start()
+        >>> mux.add_ep(ClientTwtStream(credentials), "stream/statuses/filter", "POST", track="news")  # while running
+        >>> mux.remove(client)
+    """
+    def add_ep(self, client, end_point, method='GET', test_server=False, **kwargs):
+        """adds a stream request, arguments as in :func:`ClientTwtStream.request_ep`, thread safe
+
+        :returns: client
+        """
+        url = client.request_ep_prepare(end_point, test_server, kwargs)
+        self.add(client, url, method, kwargs)
+        return client
+
+    def on_request_done(self, client, error=None):
+        if error is not None:
+            LOG.error("stream disconnected {} {!r}".format(client._last_req.parms[0], error))
@@ -1,7 +1,7 @@
 '''classes to construct twitter end points
 '''
 
-import simplejson
+import json
 from twtPyCurl import _PATH_TO_DATA
 from twtPyCurl.twt.constants import TWT_URL_HELP_STREAM, TWT_URL_HELP_REST, TWT_URL_HELP_REST_REF
 from twtPyCurl.py.utilities import DotDot, AdHocTree
@@ -61,8 +61,8 @@ class EndPoints(object):
         dict_or_str = path if isinstance(path, dict) else cls.get_value(path)
         print (msg)
         if isinstance(dict_or_str, dict):
-            print (simplejson.dumps(dict_or_str if verbose else dict_or_str.keys(), sort_keys=True,
-                                    indent=4, separators=(',', ': '), namedtuple_as_object=False))
+            print (json.dumps(dict_or_str if verbose else list(dict_or_str.keys()), sort_keys=True,
+                              indent=4, separators=(',', ': ')))
         else:
             print (dict_or_str)
         return dict_or_str
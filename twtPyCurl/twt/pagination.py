@@ -0,0 +1,142 @@
+'''
+:module: pagination
+
+iterates over items of paginated twitter REST end points
+`(cursor or max_id based) <https://dev.twitter.com/overview/api/cursoring>`_ fetching next pages
+in a background thread while caller consumes current one
+
+:Usage:
+    >>> for user_id in client.iter_ep('followers/ids', {'screen_name': 'twitter', 'count': 5000}):
+    ...     pass
+    >>> for tweet in client.iter_ep('statuses/user_timeline', {'screen_name': 'twitter', 'count': 200}, prefetch=4):
+    ...     pass
+'''
+import threading
+try:
+    from Queue import Queue, Full, Empty
+except ImportError:  # python 3
+    from queue import Queue, Full, Empty
+
+PAGINATION_CURSOR = {
+    # cursor based end points {end_point: key of items in response}
+    'followers/ids': 'ids', 'followers/list': 'users',
+    'friends/ids': 'ids', 'friends/list': 'users',
+    'friendships/incoming': 'ids', 'friendships/outgoing': 'ids',
+    'lists/members': 'users', 'lists/subscribers': 'users',
+    'lists/memberships': 'lists', 'lists/ownerships': 'lists', 'lists/subscriptions': 'lists',
+    'blocks/ids': 'ids', 'blocks/list': 'users',
+    'mutes/users/ids': 'ids', 'mutes/users/list': 'users',
+    'statuses/retweeters/ids': 'ids'}
+PAGINATION_MAX_ID = {
+    # max_id based end points {end_point: key of items in response or None if response is a list of items}
+    'statuses/user_timeline': None, 'statuses/home_timeline': None, 'statuses/mentions_timeline': None,
+    'statuses/retweets_of_me': None, 'favorites/list': None, 'lists/statuses': None,
+    'direct_messages': None, 'direct_messages/sent': None,
+    'search/tweets': 'statuses'}
+
+
+class ErrorPagination(Exception):
+    """Exceptions base"""
+
+
+def pagination_style(end_point):
+    """:returns: 'cursor', 'max_id' or None if end point is not paginated (or not known)"""
+    if end_point in PAGINATION_CURSOR:
+        return 'cursor'
+    if end_point in PAGINATION_MAX_ID:
+        return 'max_id'
+    return None
+
+
+def pages(client, end_point, parms={}, max_pages=None):
+    """a generator of pages (lists of items) of a paginated end point, each page is fetched when asked for
+
+    :param ClientTwtRest client: client to use
+    :param str end_point: a paginated end point (see :data:`PAGINATION_CURSOR` :data:`PAGINATION_MAX_ID`)
+    :param dict parms: request parameters
+    :param int max_pages: maximum number of pages to fetch (None for all)
+    :raises: ErrorPagination if end point is not paginated and request errors
+    """
+    style = pagination_style(end_point)
+    if style is None:
+        raise ErrorPagination("end point {} is not paginated".format(end_point))
+    parms = dict(parms)
+    cnt = 0
+    while max_pages is None or cnt < max_pages:
+        cnt += 1
+        data = client.request_ep(end_point, 'GET', parms).data
+        if style == 'cursor':
+            yield data[PAGINATION_CURSOR[end_point]]
+            cursor = data.get('next_cursor', 0)
+            if not cursor:
+                return
+            parms['cursor'] = cursor
+        else:
+            key = PAGINATION_MAX_ID[end_point]
+            items = data if key is None else data[key]
+            if not items:
+                return
+            yield items
+            parms['max_id'] = min([i['id'] for i in items]) - 1
+
+
+class Prefetcher(threading.Thread):
+    """fetches pages in a background thread, up to prefetch pages are kept waiting for the consumer
+
+    :param pages_gen: a generator of pages (see :func:`pages`) closed by the thread when fetching ends
+        (exhausted, failed or stopped) so it can release its resources i.e. a client of its own
+    :param int prefetch: maximum number of pages fetched ahead
+    """
+    _END = object()
+
+    def __init__(self, pages_gen, prefetch=2):
+        super(Prefetcher, self).__init__(name="Prefetcher")
+        self.daemon = True
+        self.pages = pages_gen
+        self.queue = Queue(maxsize=prefetch)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            for page in self.pages:
+                if not self._put(page):
+                    return
+        except Exception as err:
+            self._put(err)
+        else:
+            self._put(self._END)
+        finally:
+            if hasattr(self.pages, 'close'):
+                self.pages.close()
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except Full:
+                pass
+        return False
+
+    def __iter__(self):
+        """yields items of pages"""
+        self.start()
+        try:
+            while True:
+                page = self.queue.get()
+                if page is self._END:
+                    return
+                if isinstance(page, Exception):
+                    raise page
+                for item in page:
+                    yield item
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop_event.set()
+        try:
+            while True:
+                self.queue.get_nowait()
+        except Empty:
+            pass
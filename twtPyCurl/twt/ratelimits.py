@@ -0,0 +1,174 @@
+'''
+:module: ratelimits
+
+keeps track of twitter REST `rate limits <https://dev.twitter.com/rest/public/rate-limiting>`_
+per (credentials, end point family) so requests are delayed to go out just under the limit
+instead of failing with HTTP 429.
+Buckets are seeded from application/rate_limit_status and updated from x-rate-limit-* headers of every response.
+
+:Usage:
+    >>> from twtPyCurl.twt.ratelimits import RateLimits
+    >>> limits = RateLimits(pace=True)
+    >>> client = ClientTwtRest(credentials, rate_limits=limits)
+    >>> limits.seed(client)                                       # optional
+    >>> for index, rt in client.request_many(reqs, concurrency=16):   # requests are delayed as needed
+    ...     pass
+    >>> limits.buckets()[(credentials.id_str, '/users/lookup')]
+    {'limit': 900, 'remaining': 712, 'reset': 1434122345}
+'''
+import re
+import threading
+from time import time
+from twtPyCurl.py.utilities import DotDot
+try:
+    from urlparse import urlparse
+except ImportError:  # python 3
+    from urllib.parse import urlparse
+
+WINDOW_SECONDS = 15 * 60        # twitter's rate limit window
+RE_URL_PATH = re.compile(r'^/1\.1(/.*?)(?:\.json)?$')
+RE_PATH_ID = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_family(url):
+    """:returns: rate limit family (as in rate_limit_status resources) of a request url
+    i.e. '/statuses/show/:id' for https://api.twitter.com/1.1/statuses/show/123.json
+    """
+    path = urlparse(url).path
+    match = RE_URL_PATH.match(path)
+    if match is not None:
+        path = match.group(1)
+    return RE_PATH_ID.sub('/:id', path)
+
+
+class RateBucket(object):
+    """rate limit state of an end point family for a set of credentials
+
+    :param int limit: requests allowed per window
+    :param int remaining: requests remaining in current window (negative when requests are queued to later windows)
+    :param float reset: epoch seconds when current window resets
+    :param float window: window length in seconds
+    """
+    __slots__ = ['limit', 'remaining', 'reset', 'window', 'last']
+
+    def __init__(self, limit, remaining, reset, window=WINDOW_SECONDS):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.window = window
+        self.last = 0               # last time a request was let through
+
+    def acquire(self, now, pace=False):
+        """reserves a request, when current window is exhausted the request is queued to the first later window
+        with a free slot (the bucket is never refilled on a reservation, headers of responses are the source of truth)
+
+        :param float now: current epoch seconds
+        :param bool pace: spread remaining requests evenly over remaining window
+        :returns: seconds the request must be delayed (0 for no delay)
+        """
+        if now >= self.reset:       # new window(s) (till headers tell us otherwise) requests queued to them carry over
+            windows = int((now - self.reset) // self.window) + 1
+            self.remaining = min(self.limit, min(self.remaining, 0) + windows * self.limit)
+            self.reset += windows * self.window
+        if self.remaining > 0:
+            start = max(now, self.last + float(self.reset - self.last) / self.remaining) if pace else now
+            self.last = start
+        else:                       # + 1 for clock skew
+            start = self.reset + 1 + (-self.remaining // max(self.limit, 1)) * self.window
+        self.remaining -= 1
+        return start - now
+
+    def as_dict(self):
+        return DotDot({'limit': self.limit, 'remaining': self.remaining, 'reset': self.reset})
+
+
+class RateLimits(object):
+    """rate limit buckets keyed by (credentials id_str, end point family), thread safe
+
+    :param bool pace: if True requests are spread evenly over the window, else they go out as fast
+        as possible until limit is reached
+    :param float window: rate limit window in seconds (headers tell when a window resets but not its length)
+    """
+    def __init__(self, pace=False, window=WINDOW_SECONDS):
+        self.pace = pace
+        self.window = window
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.counters = DotDot({'delayed': 0, 'delayed_seconds': 0, 'http_429': 0})
+
+    @staticmethod
+    def key(credentials, url):
+        """:returns: bucket key of a request"""
+        return (getattr(credentials, 'id_str', None), endpoint_family(url))
+
+    def seed(self, client):
+        """seeds buckets from application/rate_limit_status for client's credentials
+        (for a :class:`~.CredentialsPool` call it once per credentials in pool)
+        """
+        resources = client.request_ep('application/rate_limit_status').data['resources']
+        cred = getattr(client._last_req.credentials, 'id_str', None)
+        with self._lock:
+            for family in resources.values():
+                for path, vl in family.items():
+                    self._buckets[(cred, path)] = RateBucket(vl['limit'], vl['remaining'], vl['reset'],
+                                                                self.window)
+
+    def acquire(self, key):
+        """reserves a request
+
+        :returns: seconds to delay the request (0 if bucket is unknown)
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0
+            rt = bucket.acquire(time(), self.pace)
+            if rt > 0:
+                self.counters.delayed += 1
+                self.counters.delayed_seconds += rt
+            return rt
+
+    def headroom(self, key):
+        """:returns: requests remaining in current window (infinite if bucket is unknown)"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return float('inf')
+            return bucket.limit + min(bucket.remaining, 0) if time() >= bucket.reset else bucket.remaining
+
+    def update(self, key, headers):
+        """updates a bucket from response headers, does nothing if headers don't include rate limits
+
+        :returns: the bucket or None
+        """
+        try:
+            limit = int(headers['x-rate-limit-limit'])
+            remaining = int(headers['x-rate-limit-remaining'])
+            reset = int(headers['x-rate-limit-reset'])
+        except (KeyError, ValueError, TypeError):
+            return None
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = RateBucket(limit, remaining, reset, self.window)
+            elif reset >= bucket.reset:     # else a late response of a window that is over
+                # acquire already counted requests still in flight so keep the lower remaining of same window
+                if reset != bucket.reset or remaining < bucket.remaining:
+                    bucket.remaining = remaining
+                bucket.limit, bucket.reset = limit, reset
+            return bucket
+
+    def on_429(self, key, headers):
+        """:returns: seconds to wait before retrying a request that got HTTP 429"""
+        bucket = self.update(key, headers)
+        with self._lock:
+            self.counters.http_429 += 1
+            if bucket is None:
+                return self.window
+            bucket.remaining = min(bucket.remaining, 0)
+            return max(bucket.reset + 1 - time(), 1)
+
+    def buckets(self):
+        """:returns: a dictionary {key: {'limit', 'remaining', 'reset'}}"""
+        with self._lock:
+            return dict([(k, v.as_dict()) for k, v in self._buckets.items()])
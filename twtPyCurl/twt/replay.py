@@ -0,0 +1,261 @@
+'''
+:module: replay
+
+replays recorded streams (archives see :mod:`~.archive` or JSON lines files) through a stream client
+without a network: frames are re-chunked with a chunk size distribution and fed to client's
+:func:`~.ClientStream.handle_on_write` so they follow the exact framing -> on_data -> decoding path of a live
+stream, at real time speed (as recorded), N times that speed or as fast as possible.
+Throughput and per stage timings are reported so consumers can be benchmarked offline and repeatably.
+
+:Usage:
+    >>> from twtPyCurl.twt.replay import Replayer, Chunker
+    >>> client = MyClientTwtStream(stats_every=0)
+    >>> report = Replayer(client, '/data/sample', speed=None, chunker=Chunker('lognormal', size=4096)).run()
+    >>> report
+    {'frames': 1250000, 'chunks': 402113, 'bytes': 3271458000, 'seconds': 21.3, 'frames_per_sec': 58685.4,
+     'mb_per_sec': 146.4, 'seconds_source': 2.1, 'seconds_write': 19.1, 'seconds_on_data': 17.4,
+     'seconds_framing': 1.7, 'seconds_sleep': 0.0, 'seconds_drain': 0.0, 'lag_max': 0.0}
+
+    $ python -m twtPyCurl.twt.replay /data/sample -speed 10 -chunks lognormal -size 4096
+'''
+import os
+import gzip
+import argparse
+from math import log
+from random import Random
+from time import sleep
+from timeit import default_timer as timer
+from twtPyCurl.py.utilities import DotDot
+from twtPyCurl.twt.constants import TWT_URL_API_STREAM
+from twtPyCurl.twt.archive import ArchiveReader, frame_id
+from twtPyCurl.twt.samples import snowflake_timestamp_ms
+try:
+    from urlparse import urlparse
+except ImportError:  # python 3
+    from urllib.parse import urlparse
+
+CHUNK_SIZE_MAX = 16384      # libcurl's CURL_MAX_WRITE_SIZE a write call back never gets more
+DISTRIBUTIONS = ('frames', 'fixed', 'uniform', 'lognormal')
+# frames: a chunk per frame, fixed: chunks of size, uniform: sizes in [1, 2 * size],
+# lognormal: sizes with median size (close to what a socket delivers under load)
+URL_REPLAY = TWT_URL_API_STREAM.format('stream', 'statuses/sample')
+
+
+class ErrorReplay(Exception):
+    """Exceptions base"""
+
+
+def frames_jsonl(path):
+    """yields frames of a JSON lines file (gzip compressed if path ends with .gz)"""
+    with (gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')) as fin:
+        for line in fin:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def frames_archive(reader, close=False):
+    """yields frames of an :class:`~.ArchiveReader` as bytes, closes reader when done if close is True"""
+    try:
+        for frame in reader:
+            yield bytes(frame)
+    finally:
+        if close:
+            reader.close()
+
+
+def frames_source(source):
+    """
+    :param source: an archive directory, a JSON lines file, an :class:`~.ArchiveReader` or an iterable of frames
+    :returns: an iterable of frames (bytes)
+    """
+    if isinstance(source, str):
+        if os.path.isdir(source):
+            return frames_archive(ArchiveReader(source), close=True)
+        return frames_jsonl(source)
+    if isinstance(source, ArchiveReader):
+        return frames_archive(source)
+    return source
+
+
+class Chunker(object):
+    """splits a stream of frames to chunks
+
+    :param str distribution: one of :data:`DISTRIBUTIONS`
+    :param int size: chunk size (median for lognormal) capped at :data:`CHUNK_SIZE_MAX`
+    :param float sigma: sigma of lognormal distribution
+    :param int seed: random seed so chunks are repeatable
+    :param bytes separator: appended to each frame
+    """
+    def __init__(self, distribution='lognormal', size=4096, sigma=1.0, seed=0, separator=b'\r\n'):
+        if distribution not in DISTRIBUTIONS:
+            raise ErrorReplay("distribution must be one of {}".format(", ".join(DISTRIBUTIONS)))
+        self.distribution = distribution
+        self.size = min(size, CHUNK_SIZE_MAX)
+        self.sigma = sigma
+        self.seed = seed
+        self.separator = separator
+
+    def sizes(self):
+        """yields chunk sizes"""
+        rnd = Random(self.seed)
+        if self.distribution == 'fixed':
+            while True:
+                yield self.size
+        elif self.distribution == 'uniform':
+            while True:
+                yield min(rnd.randint(1, 2 * self.size), CHUNK_SIZE_MAX)
+        else:
+            mu = log(self.size)
+            while True:
+                yield max(1, min(int(rnd.lognormvariate(mu, self.sigma)), CHUNK_SIZE_MAX))
+
+    def chunks(self, frames, timestamps=False):
+        """yields (chunk, timestamp) timestamp is (epoch milliseconds) of the newest tweet with data in chunk
+        derived from tweet ids if timestamps is True else None
+        """
+        sep = self.separator
+        timestamp = None
+        if self.distribution == 'frames':
+            for frame in frames:
+                if timestamps:
+                    tweet_id = frame_id(frame)
+                    timestamp = snowflake_timestamp_ms(tweet_id) if tweet_id else timestamp
+                yield frame + sep, timestamp
+            return
+        sizes = self.sizes()
+        size = next(sizes)
+        buf = bytearray()
+        for frame in frames:
+            if timestamps:
+                tweet_id = frame_id(frame)
+                timestamp = snowflake_timestamp_ms(tweet_id) if tweet_id else timestamp
+            buf += frame
+            buf += sep
+            if len(buf) >= size:
+                start = 0
+                while len(buf) - start >= size:
+                    yield bytes(buf[start:start + size]), timestamp
+                    start += size
+                    size = next(sizes)
+                del buf[:start]
+        if buf:
+            yield bytes(buf), timestamp
+
+
+class Replayer(object):
+    """feeds a recorded stream to a :class:`~.ClientStream` (usually a :class:`~.ClientTwtStream`)
+
+    :param client: a stream client, its pipeline or batch mode are honored
+    :param source: see :func:`frames_source`
+    :param float speed: None or 0 as fast as possible, 1 real time (as recorded), N times real time
+    :param Chunker chunker: defaults to Chunker()
+    :param str url: request url client sees (i.e. for subdomain checks)
+    """
+    def __init__(self, client, source, speed=None, chunker=None, url=URL_REPLAY):
+        self.client = client
+        self.source = source
+        self.speed = speed
+        self.chunker = chunker or Chunker()
+        self.url = url
+
+    def _timed(self, fun, acc):
+        def timed(*args):
+            t_start = timer()
+            try:
+                return fun(*args)
+            finally:
+                acc[0] += timer() - t_start
+        return timed
+
+    def run(self):
+        """replays source
+
+        :returns: a report dictionary, seconds_on_data includes decoding and consumer's processing
+            (measured in worker threads if client has a pipeline), seconds_framing is the rest of
+            seconds_write, seconds_source is reading and chunking source, seconds_drain waiting for
+            pipeline to process queued frames and lag_max the maximum delay behind schedule in real time modes
+        """
+        client = self.client
+        on_data_acc = [0.0]
+        # wrap the entry point data are delivered to, an instance attribute (pipelines pick it on start)
+        if client.pipeline is not None and client.pipeline.decodes:
+            wrapped = 'on_data_decoded_batch'
+        else:
+            wrapped = 'on_data' if client.batch_size is None else 'on_data_batch'
+        wrapped_original = client.__dict__.get(wrapped)
+        setattr(client, wrapped, self._timed(getattr(client, wrapped), on_data_acc))
+        rt = DotDot({'frames': 0, 'chunks': 0, 'bytes': 0, 'seconds': 0.0, 'seconds_write': 0.0,
+                     'seconds_sleep': 0.0, 'seconds_drain': 0.0, 'lag_max': 0.0, 'aborted': None})
+        handle_on_write = client.handle_on_write
+        speed = self.speed
+        base = None                 # (timestamp of first tweet, time it was replayed)
+        t_start = timer()
+        client.request_start(self.url, 'GET', {})
+        try:
+            client._last_req.subdomain = urlparse(self.url).netloc.split('.')[0]
+            client.request_abort_set(None)
+            client.response.reset()
+            client.response.status_provisional = 200
+            for chunk, timestamp in self.chunker.chunks(frames_source(self.source), timestamps=bool(speed)):
+                if speed and timestamp is not None:
+                    if base is None:
+                        base = (timestamp, timer())
+                    delay = base[1] + (timestamp - base[0]) / 1000.0 / speed - timer()
+                    if delay > 0:
+                        sleep(delay)
+                        rt.seconds_sleep += delay
+                    elif -delay > rt.lag_max:
+                        rt.lag_max = -delay
+                t_write = timer()
+                abort = handle_on_write(chunk)
+                rt.seconds_write += timer() - t_write
+                rt.chunks += 1
+                rt.bytes += len(chunk)
+                if abort is not None:
+                    rt.aborted = client._request_abort
+                    break
+            if hasattr(client, 'batch_flush'):
+                client.batch_flush()
+        finally:
+            t_drain = timer()
+            client.request_finish()
+            rt.seconds_drain = timer() - t_drain
+            if wrapped_original is None:
+                delattr(client, wrapped)
+            else:
+                setattr(client, wrapped, wrapped_original)
+        rt.seconds = timer() - t_start
+        rt.frames = client.counters.data
+        rt.frames_per_sec = rt.frames / rt.seconds if rt.seconds else 0
+        rt.mb_per_sec = rt.bytes / rt.seconds / 2 ** 20 if rt.seconds else 0
+        rt.seconds_on_data = on_data_acc[0]
+        rt.seconds_framing = max(0.0, rt.seconds_write - (0 if client.pipeline else on_data_acc[0]))
+        rt.seconds_source = max(0.0, rt.seconds - rt.seconds_write - rt.seconds_sleep - rt.seconds_drain)
+        return rt
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="replay a recorded stream through a ClientTwtStream")
+    parser.add_argument('source', help='archive directory or JSON lines file (.gz ok)')
+    parser.add_argument('-speed', default=0, type=float, help='0 as fast as possible, 1 real time, N times real time')
+    parser.add_argument('-chunks', default='lognormal', choices=DISTRIBUTIONS, help='chunk size distribution')
+    parser.add_argument('-size', default=4096, type=int, help='chunk size (median for lognormal)')
+    parser.add_argument('-seed', default=0, type=int, help='random seed')
+    parser.add_argument('-batch_size', default=None, type=int, help='client batch mode see ClientStream')
+    parser.add_argument('-workers', default=0, type=int, help='client pipeline workers 0 for no pipeline')
+    return parser.parse_args()
+
+
+def main():
+    from twtPyCurl.twt.clients import ClientTwtStream
+    from twtPyCurl.py.pipeline import Pipeline
+    args = parse_args()
+    client = ClientTwtStream(stats_every=0, batch_size=args.batch_size,
+                             pipeline=Pipeline(args.workers) if args.workers else None)
+    replayer = Replayer(client, args.source, args.speed, Chunker(args.chunks, args.size, seed=args.seed))
+    for key, value in sorted(replayer.run().items()):
+        print ("{:16s}{}".format(key, value))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+'''
+:module: samples
+
+sample tweets used by simulators and benchmarks,
+loaded from twt_data/tweets_sample_10000.json.gz (a JSON array of tweets) if present
+else synthesized with realistic structure and sizes
+'''
+import gzip
+from os import path
+from random import Random
+from datetime import datetime
+from twtPyCurl import _PATH_TO_DATA
+from twtPyCurl.py.codec import CODEC
+
+PATH_TWEETS_SAMPLE = _PATH_TO_DATA + "tweets_sample_10000.json.gz"
+TWT_EPOCH_MS = 1288834974657        # twitter snowflake epoch
+FMT_TWT_DT = "%a %b %d %H:%M:%S +0000 %Y"
+_WORDS = ("the quick brown fox jumps over lazy dog news breaking iphone ipad laptop music game love "
+          "today happy world live video photo follow watch new best time day night good people").split()
+_SOURCES = ('<a href="http://twitter.com/download/iphone" rel="nofollow">Twitter for iPhone</a>',
+            '<a href="http://twitter.com/download/android" rel="nofollow">Twitter for Android</a>',
+            '<a href="http://twitter.com" rel="nofollow">Twitter Web Client</a>')
+_LANGS = ('en', 'en', 'en', 'es', 'ja', 'pt', 'ar', 'el', 'ru')
+
+
+def snowflake_id(timestamp_ms, sequence=0):
+    """:returns: a twitter snowflake id for a timestamp (milliseconds since unix epoch)"""
+    return ((timestamp_ms - TWT_EPOCH_MS) << 22) + (sequence & 0x3fffff)
+
+
+def snowflake_timestamp_ms(snowflake):
+    """:returns: timestamp (milliseconds since unix epoch) of a twitter snowflake id"""
+    return (snowflake >> 22) + TWT_EPOCH_MS
+
+
+def user_synthetic(rnd, user_id):
+    """:returns: a synthetic twitter user object"""
+    screen_name = "{}_{}".format(rnd.choice(_WORDS), user_id % 100000)
+    return {
+        'id': user_id, 'id_str': str(user_id), 'name': screen_name.title(), 'screen_name': screen_name,
+        'location': rnd.choice(['', 'Athens, Greece', 'New York', 'London, UK', 'Tokyo']),
+        'url': None, 'description': " ".join(rnd.choice(_WORDS) for i in range(rnd.randint(0, 20))),
+        'protected': False, 'verified': rnd.random() < 0.01,
+        'followers_count': rnd.randint(0, 100000), 'friends_count': rnd.randint(0, 5000),
+        'listed_count': rnd.randint(0, 100), 'favourites_count': rnd.randint(0, 10000),
+        'statuses_count': rnd.randint(1, 100000), 'created_at': 'Mon Jun 01 10:00:00 +0000 2009',
+        'utc_offset': None, 'time_zone': None, 'geo_enabled': False, 'lang': rnd.choice(_LANGS),
+        'contributors_enabled': False, 'is_translator': False,
+        'profile_background_color': 'C0DEED', 'profile_background_tile': False,
+        'profile_background_image_url': 'http://abs.twimg.com/images/themes/theme1/bg.png',
+        'profile_background_image_url_https': 'https://abs.twimg.com/images/themes/theme1/bg.png',
+        'profile_image_url': 'http://pbs.twimg.com/profile_images/{}/photo_normal.jpg'.format(user_id),
+        'profile_image_url_https': 'https://pbs.twimg.com/profile_images/{}/photo_normal.jpg'.format(user_id),
+        'profile_link_color': '0084B4', 'profile_sidebar_border_color': 'C0DEED',
+        'profile_sidebar_fill_color': 'DDEEF6', 'profile_text_color': '333333',
+        'profile_use_background_image': True, 'default_profile': True, 'default_profile_image': False,
+        'following': None, 'follow_request_sent': None, 'notifications': None}
+
+
+def tweet_synthetic(rnd, timestamp_ms, sequence=0):
+    """:returns: a synthetic tweet (status) object"""
+    tweet_id = snowflake_id(timestamp_ms, sequence)
+    words = [rnd.choice(_WORDS) for i in range(rnd.randint(3, 20))]
+    hashtags = [rnd.choice(_WORDS) for i in range(rnd.randint(0, 2))]
+    text = " ".join(words + ["#" + i for i in hashtags])[:140]
+    return {
+        'created_at': datetime.utcfromtimestamp(timestamp_ms / 1000.0).strftime(FMT_TWT_DT),
+        'id': tweet_id, 'id_str': str(tweet_id), 'text': text, 'source': rnd.choice(_SOURCES),
+        'truncated': False, 'in_reply_to_status_id': None, 'in_reply_to_status_id_str': None,
+        'in_reply_to_user_id': None, 'in_reply_to_user_id_str': None, 'in_reply_to_screen_name': None,
+        'user': user_synthetic(rnd, rnd.randint(10 ** 6, 10 ** 10)),
+        'geo': None, 'coordinates': None, 'place': None, 'contributors': None,
+        'retweet_count': 0, 'favorite_count': 0,
+        'entities': {'hashtags': [{'text': i, 'indices': [0, len(i) + 1]} for i in hashtags],
+                     'trends': [], 'urls': [], 'user_mentions': [], 'symbols': []},
+        'favorited': False, 'retweeted': False, 'possibly_sensitive': False,
+        'filter_level': 'low', 'lang': rnd.choice(_LANGS), 'timestamp_ms': str(timestamp_ms)}
+
+
+def tweets_sample(max_n=None, synthetic_n=1000, seed=0):
+    """
+    :param int max_n: maximum number of tweets to return (None for all)
+    :param int synthetic_n: number of tweets to synthesize if sample file is not available
+    :param int seed: random seed for synthetic tweets (same seed same tweets)
+    :returns: a list of tweets (dictionaries)
+    """
+    if path.isfile(PATH_TWEETS_SAMPLE):
+        with gzip.open(PATH_TWEETS_SAMPLE, 'rb') as fin:
+            rt = CODEC.loads(fin.read())
+        return rt[:max_n]
+    rnd = Random(seed)
+    timestamp_ms = 1433548949000
+    rt = []
+    for cnt in range(synthetic_n if max_n is None else min(max_n, synthetic_n)):
+        timestamp_ms += rnd.randint(0, 20)
+        rt.append(tweet_synthetic(rnd, timestamp_ms, cnt))
+    return rt
+
+
+def tweets_sample_encoded(max_n=None, codec=CODEC, **kwargs):
+    """:returns: a list of encoded tweets (bytes) see :func:`tweets_sample`"""
+    rt = [codec.dumps(doc) for doc in tweets_sample(max_n, **kwargs)]
+    return [i if isinstance(i, bytes) else i.encode('utf-8') for i in rt]
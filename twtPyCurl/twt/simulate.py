@@ -1,298 +1,493 @@
-"""
-to test the client
-write an entry in your /etc/hosts file
-127.0.0.1 stream.twitter.com
-run python -m twtPyCurl.twt.simulate
-
-
-installation:
-    sudo apt-get install libev-dev required by bjoern # https://github.com/jonashaag/bjoern/wiki/Installation
-    pip install gevent bottle bjoern
-"""
-# see http://stackoverflow.com/questions/25347176/scaling-bjoern-to-multiple-servers
-
-from twtPyCurl import _IS_PY3
-
-if _IS_PY3:
-        print ("this module is not compatible with python versions 3X")
-        exit()
-try:
-    from gevent import monkey
-    monkey.patch_all()                   # needed by Bottle for stream server
-    from bottle import route, request, response, app
-    import bjoern
-except ImportError:
-    print ("this module requires gevent & bottle install those:>>> pip install gevent bottle bjoern")
-    exit()
-
-from datetime import datetime
-import simplejson
+'''
+:module: simulate
+
+a dependency free (python 3.6+ asyncio) simulator of twitter's stream API to test and benchmark stream clients
+without a network or credentials. Sample tweets (see :func:`~.tweets_sample`) are encoded once to a single
+buffer all connections stream slices of, so a process serves many concurrent clients, with `-processes N`
+N processes share the port (SO_REUSEPORT) so the simulator is never the bottleneck of a benchmark.
+
+routes: /1.1/statuses/sample.json (GET), filter.json (POST), firehose.json (GET) and error.json (GET or POST
+responds with http status err_code parameter except every 3rd request that gets a stream)
+
+stream options (see :data:`OPTIONS`) default to command line arguments and can be overridden per request
+by query or form parameters with same names i.e. `sample.json?messages=10&rate=5000&delimited=length`
+
+:Usage:
+    to test the client write an entry in your /etc/hosts file: 127.0.0.1 stream.twitter.com
+
+    $ python -m twtPyCurl.twt.simulate -port 8080 -processes 4 -limit_every 1000
+    >>> client.stream.statuses.filter.test(track="foo")     # see :func:`~.ClientTwtStream.request_ep`
+
+    or in a background thread of a test or benchmark
+    >>> simulator = Simulator(port=0).start()
+    >>> url = 'http://127.0.0.1:{}/1.1/statuses/sample.json?max_n=100000'.format(simulator.port)
+    >>> simulator.stop()
+'''
+import os
+import zlib
+import socket
+import asyncio
 import argparse
-import weakref
-import gzip
-from random import randint
-from gevent.pywsgi import WSGIServer
-from gevent import sleep, Greenlet, pool, joinall
-from twtPyCurl import _PATH_TO_DATA
+import threading
+import multiprocessing
+from time import time
+from random import Random
+from http.client import responses
+from urllib.parse import urlsplit, parse_qsl
+from timeit import default_timer as timer
+from twtPyCurl.py.codec import CODEC
 from twtPyCurl.py.utilities import DotDot, seconds_to_DHMS, format_header
-
-GL_STREAM_DELAY = 0       # Default stream delay between data (seconds)
-GL_REPORT_EVERY = 1
-DATA_SEPARATOR = "\r\n"
-GL_ERRORS_EVERY = 0
-ERROR_CNT = 0
-
-MSG_DISCONNECT = {
-    "disconnect": {
-        "code": 1,
-        "stream_name": "sample",
-        "reason": ""
-        }
-    }
-
-
-class TweetsSampler():
-    tweets_sample = None
-    format_stats = "|{client:6d}|{DHMS:12s}|{total_cnt:14,d}|{current_cnt:14,d}|{avg_per_sec:12,.2f}|{inst:4}|"
-    format_stats_header = format_header(format_stats)
-    instances = weakref.WeakSet()
-    cls_dt_start = datetime.utcnow()
-    cls_clients = 0
-    stats_idle = DotDot({'client': -1, 'total_cnt': -1, 'current_cnt': -1, 'avg_per_sec': -1})
-
-    def __init__(self, max_n=None):
-        self._init_sample()
-        TweetsSampler.cls_clients += 1
-        self.cl_number = TweetsSampler.cls_clients
-        self.max_n = max_n
-        self.cnt = 0
-        self.cnt_last = 0
-        self.dt_start = datetime.utcnow()
-        self.instances.add(self)
-        self.stats = DotDot({'client': self.cl_number, 'inst': '**'})
-
-    def __iter__(self):
-        return self
-
-    @classmethod
-    def _init_sample(cls):
-        """initializes tweets_sample class variable with tweets from data
-        we do it here on first instance creation to avoid side effects on sphinx documentation
-        """
-        if cls.tweets_sample is None:
-            with gzip.open(_PATH_TO_DATA + "tweets_sample_10000.json.gz", 'rb') as fin:
-                cls.tweets_sample = simplejson.load(fin)
-            for i in range(0, len(cls.tweets_sample)):
-                cls.tweets_sample[i]['_aux'] = {'SeqGlobal': i}
-            cls.tweets_sample = [simplejson.dumps(doc) for doc in cls.tweets_sample]
-            cls.tweets_sample_len = len(cls.tweets_sample)
+from twtPyCurl.twt.samples import tweets_sample_encoded
+
+SEPARATOR = b'\r\n'
+ROUTES = {                      # path: (stream name, methods)
+    '/1.1/statuses/sample.json': ('sample', ('GET',)),
+    '/1.1/statuses/filter.json': ('filter', ('POST',)),
+    '/1.1/statuses/firehose.json': ('firehose', ('GET',)),
+    '/1.1/statuses/error.json': ('error', ('GET', 'POST'))}
+REASONS = dict(responses)
+REASONS[420] = 'Enhance Your Calm'     # twitter's rate limited (stream connections)
+OPTIONS = (                     # name, default, help
+    ('messages', 1, 'messages per write (http chunk)'),
+    ('chunk', 0, 'if > 0 writes of chunk bytes regardless of message boundaries'),
+    ('split', False, 'split each write at a random point so messages span writes'),
+    ('delimited', '', "'length' precedes messages with their length as twitter's delimited=length"),
+    ('gzip', True, 'gzip content encoding if client accepts it'),
+    ('keep_alive', 30.0, 'seconds between keep alive newlines 0 for never'),
+    ('rate', 0.0, 'target messages per second 0 for as fast as possible'),
+    ('max_n', 0, 'end stream after N messages 0 for never'),
+    ('limit_every', 0, 'inject a limit notice every N messages 0 for never'),
+    ('disconnect_after', 0, 'send a disconnect message and close after N messages 0 for never'),
+    ('disconnect_code', 1, 'code of disconnect messages'),
+    ('error_every', 0, 'respond to every Nth stream request with error_status 0 for never'),
+    ('error_status', 503, 'http status of injected errors i.e. 420, 500, 503'),
+    ('connections_max', 0, 'respond 420 to connections over N 0 for unlimited'),
+    ('seed', 0, 'random seed of split points'))
+YIELD_EVERY = 16                # writes between yields to event loop when client keeps up
+
+
+class ErrorSimulate(Exception):
+    """Exceptions base"""
+
+
+def option_value(default, value):
+    """:returns: value (a query string) converted to type of default"""
+    if isinstance(default, bool):
+        return value.lower() in ('1', 'true', 'yes', 't')
+    return type(default)(value)
+
+
+class Corpus(object):
+    """tweets encoded once to single buffers, message n is data[offsets[n]:offsets[n + 1]]
+
+    :param int max_n: maximum number of tweets (None for all in sample)
+    :param int synthetic_n: tweets to synthesize if sample file is not available see :func:`~.tweets_sample`
+    """
+    def __init__(self, max_n=None, synthetic_n=10000):
+        frames = tweets_sample_encoded(max_n, synthetic_n=synthetic_n)
+        # both encodings are built up front so they are shared by forked processes
+        self.buffers = {False: self._join([i + SEPARATOR for i in frames]),
+                        True: self._join([self.length_prefixed(i) for i in frames])}
+
+    @staticmethod
+    def length_prefixed(frame):
+        """:returns: frame preceded by its length (which includes trailing separator)"""
+        return b'%d\r\n%s\r\n' % (len(frame) + 2, frame)
+
+    @staticmethod
+    def _join(frames):
+        offsets = [0]
+        for frame in frames:
+            offsets.append(offsets[-1] + len(frame))
+        return b''.join(frames), offsets
+
+    def __len__(self):
+        return len(self.buffers[False][1]) - 1
+
+    def buffer(self, delimited=False):
+        """:returns: (data, offsets) messages are separated by \\r\\n or preceded by their length if delimited"""
+        return self.buffers[delimited]
 
     @classmethod
-    def report(cls):
-        print cls.format_stats_header
-        while True:
-            dt_now = datetime.utcnow()
-            tmp = (dt_now - cls.cls_dt_start).total_seconds()
-            num_of_instances = len(cls.instances)
-            if num_of_instances == 0:
-                cls.stats_idle.DHMS = seconds_to_DHMS(tmp)
-                cls.stats_idle.inst =str("%2d" % (num_of_instances))
-                print cls.format_stats.format(**cls.stats_idle)
-            else:
-                for inst in list(cls.instances):
-                    inst.report_stats()
-                    sleep(0.01)
-                    del inst
-            sleep(GL_REPORT_EVERY - (num_of_instances * 0.01))
-
-    def next(self):
-        while self.max_n is None or self.cnt < self.max_n:
-            self.cnt += 1
-            return (self.cnt, self.tweets_sample[self.cnt % self.tweets_sample_len])
-        raise StopIteration()
-
-    def report_stats(self):
-        #format_stats = "|{client:6s}|{DHMS:12s}|{total_cnt:15,d}|{current_cnt:14,d}|{avg_per_sec:12,.2f}|"
-        if self.cnt > 0:
-            dt_now = datetime.utcnow()
-            tmp = (dt_now - self.dt_start).total_seconds()
-            self.stats.DHMS = seconds_to_DHMS(tmp)
-            self.stats.avg_per_sec =  self.cnt / tmp
-            self.stats.total_cnt = self.cnt
-            self.stats.current_cnt = self.cnt-self.cnt_last
-            print self.format_stats.format(**self.stats)
-            self.cnt_last = self.cnt
-
-    def yield_tweets(self, max_n=None):
-        format_yield = "%s" + DATA_SEPARATOR
-        self.cnt = 0
-        self.dt_start = datetime.utcnow()
-        while max_n is None or self.cnt < self.max_n:
-            self.cnt += 1
-            yield format_yield % self.tweets_sample[self.cnt % self.tweets_sample_len], self.cnt
-
-
-class Clients(object):
-    def __init__(self):
-        self.clients = []
-        self.clients_records = []
-
-    def add_client(self, client_obj):
-        self.on_client_new(str(client_obj))
-        self.clients.append(weakref.ref(client_obj, self.client_removed))
-        self.clients_records.append(client_obj.record)
-
-    def client_removed(self, client_obj):
-        # print "client removed", str(client_obj())
-        self.clients.remove(client_obj)
-        live = [i()['id'] for i in self.clients if i()]
-        removed_lst = [i for i in self.clients_records if i['id'] not in live]
-        for i in removed_lst:
-            self.clients_records.remove(i)
-        self.on_client_removed(removed_lst)
-
-    def on_client_new(self, client_str):
-        # print "client added", client_str
-        pass
-
-    def on_client_removed(self, removed_lst):
-        # print "removed_lst " * 5, removed_lst
-        pass
-
-
-class ServerClient(object):
-    def __init__(self, request, response):
-        idApp = str(request["bottle.app"]) .split(" ")[-1][:-1]
-        idSes = str(request["wsgi.input"]) .split(" ")[-1][:-1]
-        self.id = "%s_%s" % (idApp, idSes)
-        # self.tweets_sample = tweets_sample
-        self.record = {'id': self.id, 'REMOTE_ADDR': request['REMOTE_ADDR'],
-                       'PATH_INFO': request['PATH_INFO']}
-        self.REMOTE_ADDR = request['REMOTE_ADDR']
-        self.PATH_INFO = request['PATH_INFO']
-        self.dt_start = datetime.utcnow()
-        self.dt_end = None
-
-    def __str__(self):
-        return str(self.record)
-
-    def __repr__(self):
-        return '<%s: %s>' % (self.__class__.__name__, str(self.id))
-
-CLIENTS = Clients()
-
-
-def stream(request, response):
-    response.content_type = 'application/json'
-    response.status = '200 OK'
-    tweets_sample = TweetsSampler()
-    sc = ServerClient(request, response)
-    CLIENTS.add_client(sc)
-    for data, cnt in tweets_sample.yield_tweets(max_n=None):
-        if GL_ERRORS_EVERY:
-            rnd1 = randint(1, GL_ERRORS_EVERY)
-            if rnd1 == 1:  # handle disconnect messages
-                rnd2 = randint(1, 12)  # https://dev.twitter.com/streaming/overview/messages-types
-                MSG_DISCONNECT['disconnect']['code'] = rnd2
-                yield simplejson.dumps(MSG_DISCONNECT) + DATA_SEPARATOR
-            if rnd1 == 2:
-                rnd2 = randint(500, 504)
-                response.status = rnd2
-            else:
-                yield data
-        else:
-            if cnt % 100 == 0:  # simulate keep_alives
-                yield ''
-            yield data
-        sleep(GL_STREAM_DELAY)
-
-
-@route('/1.1/statuses/sample.json', method=['GET'])
-def stream_sample():
-    return stream(request, response)
-
+    def encode(cls, doc, delimited=False):
+        """:returns: a message (i.e. a limit notice) encoded as messages in buffer"""
+        frame = CODEC.dumps(doc)
+        frame = frame if isinstance(frame, bytes) else frame.encode('utf-8')
+        return cls.length_prefixed(frame) if delimited else frame + SEPARATOR
 
-@route('/1.1/statuses/filter.json', method=['POST'])
-def stream_filter():
-    return stream(request, response)
 
+class ChunkedWriter(object):
+    """writes a body with chunked transfer encoding, re chunked, split and gzip compressed as configured
 
-@route('/1.1/statuses/firehose.json', method=['GET'])
-def stream_firehose():
-    return stream(request, response)
+    :param writer: an asyncio StreamWriter
+    :param int chunk: if > 0 data are written in chunks of this size (before compression)
+    :param bool split: splits each write in two at a random point
+    :param bool gzip: compress data
+    :param int seed: random seed of split points
+    """
+    def __init__(self, writer, chunk=0, split=False, gzip=False, seed=0):
+        self.writer = writer
+        self.chunk = chunk
+        self.split = split
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+        self.rnd = Random(seed)
+        self.pending = bytearray()
+
+    def _write_chunk(self, pieces, size):
+        if size:
+            self.writer.writelines([b'%x\r\n' % size] + pieces + [SEPARATOR])
+
+    def _write_data(self, data, flush=zlib.Z_SYNC_FLUSH):
+        parts = [data]
+        if self.split and len(data) > 1:
+            pos = self.rnd.randint(1, len(data) - 1)
+            parts = [data[:pos], data[pos:]]
+        for part in parts:
+            if self.compressor is not None:
+                part = self.compressor.compress(part) + self.compressor.flush(flush)
+            self._write_chunk([part], len(part))
+
+    def write(self, pieces):
+        """writes a list of bytes like objects (memoryview slices of corpus)
+
+        :returns: number of bytes written (before compression)
+        """
+        size = sum(len(i) for i in pieces)
+        if not (self.chunk > 0 or self.split or self.compressor):
+            self._write_chunk(pieces, size)     # as is (zero copy)
+            return size
+        if self.chunk <= 0:
+            self._write_data(b''.join(pieces))
+            return size
+        pending = self.pending
+        for piece in pieces:
+            pending += piece
+        start = 0
+        while len(pending) - start >= self.chunk:
+            self._write_data(bytes(pending[start:start + self.chunk]))
+            start += self.chunk
+        del pending[:start]
+        return size
+
+    def close(self):
+        """writes any pending data and terminating chunk"""
+        if self.pending:
+            self._write_data(bytes(self.pending))
+            del self.pending[:]
+        if self.compressor is not None:
+            tail = self.compressor.flush(zlib.Z_FINISH)
+            self._write_chunk([tail], len(tail))
+        self.writer.write(b'0\r\n\r\n')
+
+
+class Simulator(object):
+    """stream API simulator see module's doc
+
+    :param str host: host name or ip to listen to
+    :param int port: port number 0 for any free port (see attribute port after :func:`start`)
+    :param Corpus corpus: defaults to :func:`corpus_default`
+    :param dict options: overrides defaults of options_table (:data:`OPTIONS`)
+    :param float report: print statistics every N seconds 0 for never
+    :param bool reuse_port: allows many processes to listen to same port
+    """
+    format_stats = "|{pid:7d}|{DHMS:12s}|{clients:8d}|{messages:14,d}|{msgs_per_sec:12,.0f}|" \
+                   "{mb_per_sec:10,.2f}|{errors:8d}|"
+    options_table = OPTIONS
+
+    def __init__(self, host='127.0.0.1', port=8080, corpus=None, options={}, report=0, reuse_port=False):
+        if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise ErrorSimulate("SO_REUSEPORT is not supported on this platform")
+        self.host = host
+        self.port = port
+        self.corpus = corpus if corpus is not None else self.corpus_default()
+        self.options = DotDot([(name, default) for name, default, _ in self.options_table])
+        self.options.update(options)
+        self.report = report
+        self.reuse_port = reuse_port
+        self.counters = DotDot({'connections': 0, 'requests': 0, 'requests_error': 0, 'errors': 0,
+                                'messages': 0, 'bytes': 0})
+        self.clients = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self._tasks = set()
+
+    def corpus_default(self):
+        return Corpus()
+
+    def request_options(self, parms):
+        """:returns: options with defaults overridden by request parameters"""
+        rt = DotDot(self.options)
+        for key, value in parms.items():
+            if key in rt:
+                try:
+                    rt[key] = option_value(self.options[key], value)
+                except ValueError:
+                    pass
+        return rt
+
+    def _on_connect(self, reader, writer):
+        task = self.loop.create_task(self.handle(reader, writer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def handle(self, reader, writer):
+        """serves a connection, requests follow each other while :func:`respond` returns True (keep alive)"""
+        self.counters.connections += 1
+        self.clients += 1
+        try:
+            keep_alive = True
+            while keep_alive:
+                request = await self.read_request(reader, writer)
+                keep_alive = await self.respond(writer, *request)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def read_request(self, reader, writer):
+        """:returns: (method, path, headers, parms) parms include query and url encoded form parameters"""
+        head = await reader.readuntil(SEPARATOR * 2)
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = dict((key.strip().lower(), value.strip())
+                       for key, value in (line.split(':', 1) for line in lines[1:] if ':' in line))
+        url = urlsplit(target)
+        parms = dict(parse_qsl(url.query, keep_blank_values=True))
+        if 'content-length' in headers:
+            if headers.get('expect', '').lower() == '100-continue':
+                writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            body = await reader.readexactly(int(headers['content-length']))
+            parms.update(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+        return method, url.path, headers, parms
+
+    def write_head(self, writer, status, headers):
+        lines = ['HTTP/1.1 {:d} {}'.format(status, REASONS.get(status, 'Unknown'))]
+        lines.extend('{}: {}'.format(key, value) for key, value in headers)
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+    def write_error(self, writer, status, message=None, code=None, headers=[], close=True):
+        """writes an error response in twitter's errors format"""
+        self.counters.errors += 1
+        body = Corpus.encode({'errors': [{'code': code or status, 'message': message or REASONS.get(status, '')}]})
+        headers = [('Content-Type', 'application/json'), ('Content-Length', len(body))] + list(headers)
+        self.write_head(writer, status, headers + [('Connection', 'close')] if close else headers)
+        writer.write(body)
+
+    async def respond(self, writer, method, path, headers, parms):
+        """:returns: True to keep connection alive for next request"""
+        route = ROUTES.get(path)
+        if route is None:
+            return self.write_error(writer, 404)
+        name, methods = route
+        if method not in methods:
+            return self.write_error(writer, 405)
+        opts = self.request_options(parms)
+        if name == 'error':
+            self.counters.requests_error += 1
+            if self.counters.requests_error % 3 != 0:
+                return self.write_error(writer, int(parms.get('err_code', 200)))
+        else:
+            self.counters.requests += 1
+            if opts.error_every and self.counters.requests % opts.error_every == 0:
+                return self.write_error(writer, opts.error_status)
+        if opts.connections_max and self.clients > opts.connections_max:
+            return self.write_error(writer, 420, 'Exceeded connection limit for user')
+        await self.stream(writer, name, opts, opts.gzip and 'gzip' in headers.get('accept-encoding', ''))
+
+    async def stream(self, writer, name, opts, gzip=False):
+        """streams corpus messages (repeatedly) as configured by opts"""
+        delimited = opts.delimited == 'length'
+        data, offsets = self.corpus.buffer(delimited)
+        view = memoryview(data)
+        count = len(offsets) - 1
+        headers = [('Content-Type', 'application/json'), ('Transfer-Encoding', 'chunked')]
+        if gzip:
+            headers.append(('Content-Encoding', 'gzip'))
+        self.write_head(writer, 200, headers)
+        body = ChunkedWriter(writer, opts.chunk, opts.split, gzip, opts.seed)
+        if opts.chunk > 0:      # enough messages per write to fill a chunk
+            per_write = max(1, opts.chunk * count // len(data) + 1)
+        else:
+            per_write = max(1, opts.messages)
+        per_write = min(per_write, count)
+        end_after = min([i for i in (opts.max_n, opts.disconnect_after) if i > 0] or [0])
+        idx = sent = writes = 0
+        t_start = t_keep_alive = timer()
+        counters = self.counters
+        while True:
+            n = per_write if not end_after else min(per_write, end_after - sent)
+            pieces = []
+            if opts.keep_alive and timer() - t_keep_alive >= opts.keep_alive:
+                pieces.append(SEPARATOR)
+                t_keep_alive = timer()
+            stop = idx + n
+            if stop <= count:
+                pieces.append(view[offsets[idx]:offsets[stop]])
+            else:
+                stop -= count
+                pieces.extend((view[offsets[idx]:], view[:offsets[stop]]))
+            idx = stop % count
+            sent += n
+            if opts.limit_every and sent // opts.limit_every > (sent - n) // opts.limit_every:
+                pieces.append(self.corpus.encode(
+                    {'limit': {'track': sent // opts.limit_every, 'timestamp_ms': str(int(time() * 1000))}},
+                    delimited))
+            ended = end_after and sent >= end_after
+            if ended and opts.disconnect_after and sent >= opts.disconnect_after:
+                pieces.append(self.corpus.encode(
+                    {'disconnect': {'code': opts.disconnect_code, 'stream_name': name,
+                                    'reason': 'simulated disconnect'}}, delimited))
+            counters.bytes += body.write(pieces)
+            counters.messages += n
+            if ended:
+                break
+            writes += 1
+            if opts.rate:
+                delay = t_start + sent / opts.rate - timer()
+                if delay > 0.001:
+                    await asyncio.sleep(delay)
+            elif writes % YIELD_EVERY == 0:
+                await asyncio.sleep(0)      # drain does not yield while client keeps up
+            await writer.drain()
+            if writer.transport.is_closing():
+                return
+        body.close()
+
+    def _listen(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(
+            self._on_connect, self.host, self.port, reuse_port=self.reuse_port or None))
+        self.port = self.server.sockets[0].getsockname()[1]
+        if self.report:
+            self._tasks.add(self.loop.create_task(self.report_loop()))
+
+    def _close(self):
+        self.server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            self.loop.run_until_complete(asyncio.gather(*self._tasks, return_exceptions=True))
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.close()
+
+    def run(self, ready=None):
+        """serves until interrupted
+
+        :param ready: a callable called with port number once listening (i.e. a queue's put)
+        """
+        self._listen()
+        if ready is not None:
+            ready(self.port)
+        try:
+            self.loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._close()
+
+    def start(self):
+        """serves in a background (daemon) thread
+
+        :returns: self once listening
+        """
+        ready = threading.Event()
+        errors = []
+
+        def target():
+            try:
+                self._listen()
+            except Exception as e:
+                errors.append(e)
+                return
+            finally:
+                ready.set()
+            self.loop.run_forever()
+            self._close()
+        self.thread = threading.Thread(target=target, name='simulate')
+        self.thread.daemon = True
+        self.thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
 
+    def stop(self):
+        """stops a server started by :func:`start`"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
 
-@route('/1.1/statuses/error.json', method=['GET', 'POST'])
-def error_http():
-    """ simulates http errors """
-    global ERROR_CNT
-    ERROR_CNT += 1
-    if ERROR_CNT % 3 == 0:
-        return stream(request, response)
-    else:
-        print ("SERVER ERROR_CNT:{:2d}".format(ERROR_CNT))
-        response.status = int(request.query.get("err_code", 200))
-        return simplejson.dumps({'http_error': response.status}) + DATA_SEPARATOR
+    async def report_loop(self):
+        """prints statistics every self.report seconds while there are clients or messages were sent"""
+        t_start = t_last = timer()
+        messages_last = bytes_last = 0
+        while True:
+            await asyncio.sleep(self.report)
+            t_now = timer()
+            counters = self.counters
+            if self.clients or counters.messages != messages_last:
+                print (self.format_stats.format(
+                    pid=os.getpid(), DHMS=seconds_to_DHMS(t_now - t_start), clients=self.clients,
+                    messages=counters.messages, errors=counters.errors,
+                    msgs_per_sec=(counters.messages - messages_last) / (t_now - t_last),
+                    mb_per_sec=(counters.bytes - bytes_last) / (t_now - t_last) / 2 ** 20))
+            t_last, messages_last, bytes_last = t_now, counters.messages, counters.bytes
+
+
+def add_options(parser, options_table):
+    """adds an argument per option of options_table (see :data:`OPTIONS`) to an argparse parser"""
+    for name, default, help_str in options_table:
+        if isinstance(default, bool):
+            parser.add_argument('-' + name, default=default, type=lambda v: option_value(True, v),
+                                help=help_str + ' (1 or 0)')
+        else:
+            parser.add_argument('-' + name, default=default, type=type(default), help=help_str)
 
-@route('/')
-def catch_all():
-    print ("catch_all")
-    return "catch_all"
 
+def serve(factory, processes=1, report=True):
+    """serves until interrupted
 
-def simple_stream_appl(environ, start_response):
-    """simple pure gevent WSGIServer stream server
-    kind of test to see if it's more efficient than bottle over bjoern
-    TL;DR results show just a marginal improvement
+    :param factory: a callable(reuse_port) that returns a :class:`Simulator`
+    :param int processes: if > 1 so many processes (forked after factory's shared data were built) share the port
+    :param bool report: print a header for statistics
     """
-    status = '200 OK'
-    headers = [
-        ('Content-Type', 'application/json')
-    ]
-    start_response(status, headers)
-    print ("streaming starting")
-    for data in TweetsSampler().yield_tweets(max_n=None):
-        yield data
-        sleep(GL_STREAM_DELAY)
+    if report:
+        print (format_header(Simulator.format_stats))
+    if processes <= 1:
+        return factory(False).run()
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=factory(True).run) for _ in range(processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
 
 
 def parse_args():
-    parser = argparse.ArgumentParser(description="set up server")
-    parser.add_argument('-server',  default='gevent',   choices=['WSGIServer', 'gevent', 'bjoern'],
-                        help='use bottle or gevent WSGIServer(only for Streaming)')
-    parser.add_argument('-host',    default='0.0.0.0',
-                        help='host name or ip defaults to:0.0.0.0')
-    parser.add_argument("-port",    default=8080, type=int,
-                        help='port number defaults to 8080')
-    parser.add_argument("-delay",   default=0, type=float,
-                        help='delay in seconds between data i.e:0.001, defaults to 0')
-    parser.add_argument("-errors_every", default=0, type=int,
-                        help='simulate possible errors inject errors every N tweets 0=never')
-    parser.add_argument("-debug",   default=False, action="store_true",
-                        help='debug (engages bottle catchall')
-    parser.add_argument("-report",  default=1, type=int, help='report every N seconds')
+    parser = argparse.ArgumentParser(description="twitter stream API simulator")
+    parser.add_argument('-host', default='0.0.0.0', help='host name or ip defaults to:0.0.0.0')
+    parser.add_argument('-port', default=8080, type=int, help='port number defaults to 8080')
+    parser.add_argument('-processes', default=1, type=int, help='processes sharing port (SO_REUSEPORT)')
+    parser.add_argument('-tweets', default=10000, type=int, help='number of tweets in corpus')
+    parser.add_argument('-report', default=1, type=float, help='report every N seconds 0 for never')
+    add_options(parser, OPTIONS)
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
-    print "starting server", vars(args)
-    global GL_STREAM_DELAY
-    global GL_REPORT_EVERY
-    global GL_ERRORS_EVERY
-    GL_STREAM_DELAY = args.delay
-    GL_REPORT_EVERY = args.report
-    GL_ERRORS_EVERY = args.errors_every
-    if args.server == 'WSGIServer':
-        server = WSGIServer((args.host, args.port), simple_stream_appl, spawn=pool.Pool(100))
-        server = Greenlet.spawn(server.serve_forever)
-    else:
-        appl = app()
-        if args.debug:
-            appl.catchall = False
-        server = Greenlet.spawn(appl.run, host=args.host, port=args.port, server=args.server)
-    report = Greenlet.spawn(TweetsSampler.report)
-    joinall([report, server])
+    print ("starting server {}".format(vars(args)))
+    options = dict((name, getattr(args, name)) for name, _, _ in OPTIONS)
+    corpus = Corpus(args.tweets, synthetic_n=args.tweets)       # before fork so processes share it
+    serve(lambda reuse_port: Simulator(args.host, args.port, corpus, options, args.report, reuse_port),
+          args.processes, args.report)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,431 @@
+'''
+:module: simulate_rest
+
+a dependency free (python 3.6+ asyncio) simulator of twitter's REST API (end points of twt_endpoints_rest.txt)
+to test and load test :class:`~.ClientTwtRest` (batching, caching, concurrency, rate limits) without a network.
+Responses are synthetic but realistically sized (built of sample tweets and users see :mod:`~.samples`),
+paginated end points honor cursor, count, max_id and since_id, GET requests are rate limited per credentials
+and end point family with x-rate-limit-* headers and 15 minutes windows (429 code 88 when exhausted).
+Latency, 429s, 5xx and twitter error bodies can be injected.
+Options (see :data:`OPTIONS`) default to command line arguments and can be overridden per request
+by query or form parameters with same names as in :mod:`~.simulate` (on which the server is built).
+
+:Usage:
+    $ python -m twtPyCurl.twt.simulate_rest -port 8081 -latency 80 -p_5xx 0.01 -window 60
+
+    >>> client = ClientTwtRest(credentials, url_api='http://127.0.0.1:8081/1.1/{}.json')
+    >>> client.request_ep('users/show', parms={'screen_name': 'twitter'}).data['screen_name']
+    'twitter'
+
+    or in a background thread of a test or benchmark
+    >>> simulator = SimulatorRest(port=0, options={'latency': 20}).start()
+    >>> client = ClientTwtRest(credentials, url_api=simulator.url_api)
+    >>> simulator.stop()
+
+.. Note:: with -processes N each process keeps its own rate limit windows
+'''
+import re
+import json
+import zlib
+import asyncio
+import argparse
+from time import time
+from random import Random
+from datetime import datetime
+from twtPyCurl import _PATH_TO_DATA
+from twtPyCurl.py.codec import CODEC
+from twtPyCurl.twt.samples import tweets_sample, user_synthetic, snowflake_id, snowflake_timestamp_ms, FMT_TWT_DT
+from twtPyCurl.twt.pagination import PAGINATION_CURSOR, PAGINATION_MAX_ID
+from twtPyCurl.twt.batching import LOOKUPS, LOOKUPS_POST, LOOKUP_IDS_MAX
+from twtPyCurl.twt.simulate import Simulator, add_options, serve
+
+PATH_ENDPOINTS = _PATH_TO_DATA + "twt_endpoints_rest.txt"
+RE_URL_PATH = re.compile(r'^/1\.1/(.+?)(?:\.json)?$')
+RE_OAUTH_TOKEN = re.compile(r'oauth_token="([^"]*)"')
+RE_OAUTH_CONSUMER = re.compile(r'oauth_consumer_key="([^"]*)"')
+WINDOW_SECONDS = 15 * 60
+RATE_LIMIT_DEFAULT = 15         # GET end points not in RATE_LIMITS
+RATE_LIMITS = {
+    # requests per window per user of GET end point families (POST end points are not rate limited)
+    '/application/rate_limit_status': 180, '/search/tweets': 180,
+    '/statuses/user_timeline': 900, '/statuses/home_timeline': 15, '/statuses/mentions_timeline': 75,
+    '/statuses/retweets_of_me': 75, '/statuses/show/:id': 900, '/statuses/lookup': 900,
+    '/statuses/retweets/:id': 75, '/statuses/retweeters/ids': 75, '/statuses/oembed': 180,
+    '/users/lookup': 900, '/users/show': 900, '/users/search': 900,
+    '/friends/ids': 15, '/friends/list': 15, '/followers/ids': 15, '/followers/list': 15,
+    '/friendships/show': 180, '/friendships/lookup': 15, '/favorites/list': 75,
+    '/lists/statuses': 900, '/lists/members': 900, '/lists/list': 15, '/account/verify_credentials': 75,
+    '/help/configuration': 15, '/help/languages': 15, '/trends/place': 75}
+TWT_ERRORS = {
+    # http status: (twitter error code, message) of injected errors
+    401: (89, 'Invalid or expired token.'), 403: (187, 'Status is a duplicate.'),
+    404: (34, 'Sorry, that page does not exist.'), 429: (88, 'Rate limit exceeded'),
+    500: (131, 'Internal error'), 502: (131, 'Internal error'), 503: (130, 'Over capacity'),
+    504: (131, 'Internal error')}
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+OPTIONS = (                     # name, default, help
+    ('gzip', True, 'gzip content encoding if client accepts it'),
+    ('latency', 0.0, 'response latency in milliseconds (median for lognormal) 0 for none'),
+    ('latency_dist', 'lognormal', 'latency distribution one of: ' + ', '.join(LATENCY_DISTRIBUTIONS)),
+    ('latency_sigma', 0.5, 'sigma of lognormal latency'),
+    ('rate_limits', True, 'enforce rate limits of GET end points'),
+    ('limit', 0, 'requests per window of all GET end points 0 for twitter\'s (see RATE_LIMITS)'),
+    ('window', float(WINDOW_SECONDS), 'rate limit window in seconds'),
+    ('p_429', 0.0, 'probability of an injected 429 (rate limit exceeded)'),
+    ('p_5xx', 0.0, 'probability of an injected 500, 502, 503 or 504'),
+    ('p_error', 0.0, 'probability of an injected error_status with a twitter error body'),
+    ('error_status', 401, 'http status of injected errors one of: 401, 403, 404'),
+    ('seed', 0, 'random seed of latencies and injected errors'))
+STEP_ID = 60000 << 22           # id distance of consecutive tweets in timelines (a minute)
+USER_ID_BASE = 10 ** 6          # user ids of collections are USER_ID_BASE + USER_ID_STEP * position
+USER_ID_STEP = 37
+
+
+def endpoints_rest(path=PATH_ENDPOINTS):
+    """:returns: a dictionary {end point (i.e. 'statuses/show/:id'): (regular expression, method)}
+    regular expressions capture path parameters i.e. id
+    """
+    rt = {}
+    with open(path) as fin:
+        for line in fin:
+            fields = line.split()
+            if len(fields) < 2 or fields[0].startswith('#'):
+                continue
+            end_point = fields[1].replace('.json', '')
+            rt[end_point] = (re.compile('^' + re.sub(r':(\w+)', r'(?P<\1>[^/]+)', end_point) + '$'), fields[0])
+    return rt
+
+
+def ids_parm(value):
+    """:returns: a list of ids (str) of a comma separated parameter"""
+    return [i.strip() for i in value.split(',') if i.strip()][:LOOKUP_IDS_MAX] if value else []
+
+
+def count_parm(parms, default, maximum):
+    try:
+        return max(1, min(int(parms.get('count', default)), maximum))
+    except ValueError:
+        return default
+
+
+class Payloads(object):
+    """synthetic payloads of REST responses built of pools of sample tweets and users
+
+    :param int pool_n: number of distinct tweets and users payloads are built of
+    :param int timeline_n: tweets of timelines and search results (twitter serves up to 3200 of a user's tweets)
+    :param int cursor_n: items of cursor paginated collections i.e. followers/ids
+    :param int seed: random seed of synthetic users
+    """
+    def __init__(self, pool_n=1000, timeline_n=3200, cursor_n=20000, seed=0):
+        self.tweets = tweets_sample(pool_n, synthetic_n=pool_n, seed=seed)
+        rnd = Random(seed)
+        self.users = [user_synthetic(rnd, USER_ID_BASE + i) for i in range(pool_n)]
+        self.timeline_n = timeline_n
+        self.cursor_n = cursor_n
+        self.id_newest = snowflake_id(int(time()) // 60 * 60000)   # of timelines
+        with open(_PATH_TO_DATA + "help_configuration.json") as fin:
+            self.configuration = json.load(fin)
+        self.handlers = {
+            'help/configuration': lambda parms: self.configuration,
+            'help/languages': lambda parms: [{'code': 'en', 'name': 'English', 'status': 'production'},
+                                             {'code': 'el', 'name': 'Greek', 'status': 'production'}],
+            'statuses/retweets/:id': lambda parms: self.timeline(parms, 20, 100),
+            'users/search': lambda parms: self.collection(parms, 'users', 20, 20)[0],
+            'friendships/show': self.relationship,
+            'media/upload': lambda parms: {'media_id': 710511363345354753, 'media_id_string': '710511363345354753',
+                                           'size': 11065, 'expires_after_secs': 86400,
+                                           'image': {'image_type': 'image/jpeg', 'w': 800, 'h': 320}}}
+
+    def tweet(self, tweet_id, position=0):
+        rt = dict(self.tweets[position % len(self.tweets)])
+        timestamp_ms = snowflake_timestamp_ms(tweet_id)
+        rt['id'], rt['id_str'], rt['timestamp_ms'] = tweet_id, str(tweet_id), str(timestamp_ms)
+        rt['created_at'] = datetime.utcfromtimestamp(timestamp_ms / 1000.0).strftime(FMT_TWT_DT)
+        return rt
+
+    def user(self, user_id=None, screen_name=None):
+        if user_id is None:
+            user_id = USER_ID_BASE + zlib.crc32((screen_name or '').lower().encode('utf-8')) % 10 ** 9
+        user_id = int(user_id)
+        rt = dict(self.users[user_id % len(self.users)])
+        rt['id'], rt['id_str'] = user_id, str(user_id)
+        if screen_name:
+            rt['screen_name'] = screen_name
+        return rt
+
+    def user_parms(self, parms):
+        """:returns: user of user_id or screen_name parameters"""
+        return self.user(parms.get('user_id') or None, parms.get('screen_name') or 'twitter')
+
+    def timeline(self, parms, count_default=20, count_max=200):
+        """:returns: a page of a timeline (newest first) honoring count, max_id and since_id"""
+        count = count_parm(parms, count_default, count_max)
+        position = 0
+        if parms.get('max_id'):
+            position = max(0, -(-(self.id_newest - int(parms['max_id'])) // STEP_ID))
+        since_id = int(parms.get('since_id') or 0)
+        rt = []
+        for position in range(position, min(position + count, self.timeline_n)):
+            tweet_id = self.id_newest - position * STEP_ID
+            if tweet_id <= since_id:
+                break
+            rt.append(self.tweet(tweet_id, position))
+        return rt
+
+    def search(self, parms):
+        statuses = self.timeline(parms, 15, 100)
+        metadata = {'completed_in': 0.035, 'count': len(statuses), 'query': parms.get('q', ''),
+                    'max_id': statuses[0]['id'] if statuses else 0, 'since_id': int(parms.get('since_id') or 0)}
+        if statuses:
+            metadata['next_results'] = '?max_id={}&q={}&count={}'.format(
+                statuses[-1]['id'] - 1, parms.get('q', ''), len(statuses))
+        return {'statuses': statuses, 'search_metadata': metadata}
+
+    def list_object(self, list_id, parms={}):
+        return {'id': list_id, 'id_str': str(list_id), 'name': parms.get('name', 'list {}'.format(list_id)),
+                'slug': parms.get('slug', 'list-{}'.format(list_id)), 'mode': 'public', 'description': '',
+                'member_count': self.cursor_n, 'subscriber_count': 10, 'created_at': 'Mon Jun 01 10:00:00 +0000 2009',
+                'uri': '/twitter/lists/{}'.format(list_id), 'following': False, 'user': self.user_parms(parms)}
+
+    def collection(self, parms, kind, count_default, count_max):
+        """:returns: (items, next_cursor, previous_cursor) of a cursor paginated collection"""
+        count = count_parm(parms, count_default, count_max)
+        cursor = parms.get('cursor', '-1')
+        position = 0 if cursor in ('-1', '') else max(0, int(cursor))
+        stop = min(position + count, self.cursor_n)
+        ids = [USER_ID_BASE + USER_ID_STEP * i for i in range(position, stop)]
+        if kind == 'users':
+            items = [self.user(i) for i in ids]
+        elif kind == 'lists':
+            items = [self.list_object(i) for i in ids]
+        else:
+            items = ids
+        return items, stop if stop < self.cursor_n else 0, -position
+
+    def cursored(self, parms, key):
+        if key == 'ids':
+            items, cursor_next, cursor_previous = self.collection(parms, key, 5000, 5000)
+        else:
+            items, cursor_next, cursor_previous = self.collection(parms, key, 20, 200)
+        return {key: items, 'next_cursor': cursor_next, 'next_cursor_str': str(cursor_next),
+                'previous_cursor': cursor_previous, 'previous_cursor_str': str(cursor_previous)}
+
+    def lookup(self, end_point, parms):
+        parm_name = LOOKUPS[end_point][0]
+        if end_point == 'statuses/lookup':
+            return [self.tweet(int(i), int(i)) for i in ids_parm(parms.get(parm_name))]
+        users = [self.user(i) for i in ids_parm(parms.get(parm_name))] + \
+                [self.user(None, i) for i in ids_parm(parms.get('screen_name'))]
+        if end_point == 'users/lookup':
+            return users
+        return [{'name': i['name'], 'screen_name': i['screen_name'], 'id': i['id'], 'id_str': i['id_str'],
+                 'connections': ['following']} for i in users]
+
+    def relationship(self, parms):
+        source = self.user(parms.get('source_id') or None, parms.get('source_screen_name') or 'source')
+        target = self.user(parms.get('target_id') or None, parms.get('target_screen_name') or 'target')
+        flags = {'following': True, 'followed_by': False, 'following_received': None, 'following_requested': None}
+        return {'relationship': {
+            'source': dict(flags, id=source['id'], id_str=source['id_str'], screen_name=source['screen_name'],
+                           blocking=None, muting=None, marked_spam=None, all_replies=None, want_retweets=None,
+                           notifications_enabled=None, can_dm=True),
+            'target': dict(flags, id=target['id'], id_str=target['id_str'], screen_name=target['screen_name'])}}
+
+    def payload(self, end_point, parms):
+        """:returns: response object of a request to end_point (a template as in twt_endpoints_rest.txt)"""
+        handler = self.handlers.get(end_point)
+        if handler is not None:
+            return handler(parms)
+        if end_point in LOOKUPS:
+            return self.lookup(end_point, parms)
+        if end_point in PAGINATION_CURSOR:
+            return self.cursored(parms, PAGINATION_CURSOR[end_point])
+        if end_point == 'search/tweets':
+            return self.search(parms)
+        if end_point in PAGINATION_MAX_ID:
+            return self.timeline(parms)
+        family = end_point.split('/')[0]
+        if family in ('statuses', 'favorites'):
+            tweet_id = int(parms.get('id') or self.id_newest)
+            rt = self.tweet(tweet_id, tweet_id)
+            if 'status' in parms:
+                rt['text'] = parms['status']
+            return rt
+        if family == 'lists':
+            return [self.list_object(i) for i in range(1, 4)] if end_point == 'lists/list' else \
+                self.list_object(int(parms.get('list_id') or 1), parms)
+        if family in ('users', 'account', 'blocks', 'mutes', 'friendships'):
+            return self.user_parms(parms)
+        return {}
+
+
+class SimulatorRest(Simulator):
+    """REST API simulator see module's doc and :class:`~.simulate.Simulator` for parameters,
+    each response counts as a message in statistics
+    """
+    options_table = OPTIONS
+
+    def __init__(self, host='127.0.0.1', port=8081, corpus=None, options={}, report=0, reuse_port=False):
+        super(SimulatorRest, self).__init__(host, port, corpus, options, report, reuse_port)
+        self.endpoints = endpoints_rest()
+        self.buckets = {}       # {(credentials, family): [remaining, reset]}
+        self.rnd = Random(self.options.seed)
+        self.counters.update({'limited': 0, 'injected': 0})
+
+    def corpus_default(self):
+        return Payloads()
+
+    @property
+    def url_api(self):
+        """:returns: url format string for :class:`~.ClientTwtRest` url_api"""
+        return 'http://{}:{}/1.1/{{}}.json'.format(self.host, self.port)
+
+    def route(self, path):
+        """:returns: (end point, path parameters) of a request's path or (None, None)"""
+        match = RE_URL_PATH.match(path)
+        if match is None:
+            return None, None
+        end_point = match.group(1)
+        if end_point in self.endpoints:
+            return end_point, {}
+        for end_point_tmpl, (regex, _) in self.endpoints.items():
+            match = regex.match(end_point) if ':' in end_point_tmpl else None
+            if match is not None:
+                return end_point_tmpl, match.groupdict()
+        return None, None
+
+    @staticmethod
+    def credentials_key(headers):
+        """:returns: who a request counts against (access token, consumer key or bearer token)"""
+        authorization = headers.get('authorization', '')
+        match = RE_OAUTH_TOKEN.search(authorization) or RE_OAUTH_CONSUMER.search(authorization)
+        if match is not None:
+            return match.group(1)
+        return authorization[7:] if authorization.startswith('Bearer ') else None
+
+    def rate_limit(self, key, family, opts):
+        """counts a request
+
+        :returns: (limit, remaining, reset) remaining is -1 if limit is exceeded
+        """
+        now = time()
+        limit = opts.limit or RATE_LIMITS.get(family, RATE_LIMIT_DEFAULT)
+        bucket = self.buckets.get((key, family))
+        if bucket is None or now >= bucket[1]:
+            bucket = self.buckets[(key, family)] = [limit, now + opts.window]
+        bucket[0] = max(-1, bucket[0] - 1)
+        return limit, bucket[0], int(bucket[1])
+
+    def rate_limit_status(self, key, opts):
+        now = time()
+        resources = {}
+        for end_point, (_, method) in self.endpoints.items():
+            if method != 'GET':
+                continue
+            family = '/' + end_point
+            limit = opts.limit or RATE_LIMITS.get(family, RATE_LIMIT_DEFAULT)
+            remaining, reset = self.buckets.get((key, family), (limit, now + opts.window))
+            if now >= reset:
+                remaining, reset = limit, now + opts.window
+            resources.setdefault(end_point.split('/')[0], {})[family] = {
+                'limit': limit, 'remaining': max(0, remaining), 'reset': int(reset)}
+        return {'rate_limit_context': {'access_token': key}, 'resources': resources}
+
+    def latency(self, opts):
+        """:returns: seconds of a response's latency"""
+        if opts.latency <= 0:
+            return 0
+        if opts.latency_dist == 'fixed':
+            rt = opts.latency
+        elif opts.latency_dist == 'uniform':
+            rt = self.rnd.uniform(0, 2 * opts.latency)
+        else:
+            rt = self.rnd.lognormvariate(0, opts.latency_sigma) * opts.latency
+        return rt / 1000.0
+
+    def write_response(self, writer, doc, headers, gzip, close):
+        body = CODEC.dumps(doc)
+        body = body if isinstance(body, bytes) else body.encode('utf-8')
+        headers = [('Content-Type', 'application/json;charset=utf-8')] + headers
+        if gzip:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            body = compressor.compress(body) + compressor.flush()
+            headers.append(('Content-Encoding', 'gzip'))
+        headers.append(('Content-Length', len(body)))
+        self.write_head(writer, 200, headers + [('Connection', 'close')] if close else headers)
+        writer.write(body)
+        self.counters.messages += 1
+        self.counters.bytes += len(body)
+
+    def write_twt_error(self, writer, status, headers, close):
+        code, message = TWT_ERRORS[status]
+        self.write_error(writer, status, message, code, headers, close)
+
+    async def respond(self, writer, method, path, headers, parms):
+        close = headers.get('connection', '').lower() == 'close'
+        end_point, path_parms = self.route(path)
+        if end_point is None or method not in (self.endpoints[end_point][1],
+                                               'POST' if end_point in LOOKUPS_POST else None):
+            self.write_twt_error(writer, 404, [], close)
+            return not close
+        parms.update(path_parms)
+        self.counters.requests += 1
+        opts = self.request_options(parms)
+        delay = self.latency(opts)
+        if delay:
+            await asyncio.sleep(delay)
+        key = self.credentials_key(headers)
+        limit_headers = []
+        if self.endpoints[end_point][1] == 'GET' and opts.rate_limits:    # lookups count even if POSTed
+            limit, remaining, reset = self.rate_limit(key, '/' + end_point, opts)
+            limit_headers = [('x-rate-limit-limit', limit), ('x-rate-limit-remaining', max(0, remaining)),
+                             ('x-rate-limit-reset', reset)]
+            if remaining < 0:
+                self.counters.limited += 1
+                self.write_twt_error(writer, 429, limit_headers, close)
+                return not close
+        dice = self.rnd.random() if opts.p_429 or opts.p_5xx or opts.p_error else 1
+        if dice < opts.p_429 + opts.p_5xx + opts.p_error:
+            self.counters.injected += 1
+            if dice < opts.p_429:
+                status = 429
+                if limit_headers:
+                    limit_headers[1] = ('x-rate-limit-remaining', 0)
+            elif dice < opts.p_429 + opts.p_5xx:
+                status, limit_headers = self.rnd.choice((500, 502, 503, 504)), []
+            else:
+                status = opts.error_status if opts.error_status in TWT_ERRORS else 401
+            self.write_twt_error(writer, status, limit_headers, close)
+            return not close
+        if end_point == 'application/rate_limit_status':
+            doc = self.rate_limit_status(key, opts)
+        else:
+            doc = self.corpus.payload(end_point, parms)
+        self.write_response(writer, doc, limit_headers, opts.gzip and 'gzip' in headers.get('accept-encoding', ''),
+                            close)
+        return not close
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="twitter REST API simulator")
+    parser.add_argument('-host', default='0.0.0.0', help='host name or ip defaults to:0.0.0.0')
+    parser.add_argument('-port', default=8081, type=int, help='port number defaults to 8081')
+    parser.add_argument('-processes', default=1, type=int, help='processes sharing port (SO_REUSEPORT)')
+    parser.add_argument('-pool', default=1000, type=int, help='number of distinct tweets and users')
+    parser.add_argument('-timeline_n', default=3200, type=int, help='tweets of timelines and searches')
+    parser.add_argument('-cursor_n', default=20000, type=int, help='items of cursored collections')
+    parser.add_argument('-report', default=1, type=float, help='report every N seconds 0 for never')
+    add_options(parser, OPTIONS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print ("starting server {}".format(vars(args)))
+    options = dict((name, getattr(args, name)) for name, _, _ in OPTIONS)
+    payloads = Payloads(args.pool, args.timeline_n, args.cursor_n)     # before fork so processes share it
+    serve(lambda reuse_port: SimulatorRest(args.host, args.port, payloads, options, args.report, reuse_port),
+          args.processes, args.report)
+
+if __name__ == "__main__":
+    main()